@@ -0,0 +1,165 @@
+# ── Standard library ────────────────────────────────────────────
+import os          # Cache directory + env-var configuration
+import json        # Cached detections are stored as JSON
+import hashlib     # Content addressing (page pixels + prompt + model)
+import tempfile    # Atomic writes (write temp file, then rename)
+import threading   # Counters/index are shared by request threads
+from collections import OrderedDict
+
+from ai.metrics import Counter
+
+CACHE_ENABLED = os.environ.get("DOCSANCT_CACHE", "1") == "1"
+CACHE_DIR = os.environ.get(
+    "DOCSANCT_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "docsanct", "detections"),
+)
+CACHE_MAX_BYTES = int(os.environ.get("DOCSANCT_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+# Part of every key; bumped whenever what an entry holds changes, so old
+# entries are simply never looked up again (2: detections before label filtering)
+KEY_VERSION = 2
+
+CACHE_EVENTS = Counter(
+    "docsanct_detection_cache_events_total", "Detection cache lookups and evictions.", ["event"])
+
+
+def _image_digest(img):
+    # Hash what the model actually sees: mode, size and raw pixels. Metadata
+    # and file encoding don't matter, so re-saved copies still hit.
+    h = hashlib.sha256()
+    h.update(f"{img.mode}:{img.size[0]}x{img.size[1]}:".encode())
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+
+def detection_key(msgs, model_id):
+    """
+    Content address for one detection request: every image's pixels, every
+    text part of the prompt (in order) and the model ID.
+    """
+    h = hashlib.sha256()
+    h.update(f"v{KEY_VERSION}:model:{model_id}\n".encode())
+    for msg in msgs:
+        h.update(f"role:{msg.get('role', '')}\n".encode())
+        content = msg.get("content", [])
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        for part in content:
+            if part.get("type") == "image":
+                image = part.get("image")
+                ref = _image_digest(image) if hasattr(image, "tobytes") else str(image)
+                h.update(f"image:{ref}\n".encode())
+            else:
+                h.update(f"text:{part.get('text', '')}\n".encode())
+    return h.hexdigest()
+
+
+class DetectionCache:
+    """
+    Persistent detection cache on local disk: one small JSON file per key,
+    evicted least-recently-used once the directory exceeds *max_bytes*.
+    Recency survives restarts through file mtimes (touched on every hit).
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index = OrderedDict()   # key -> size in bytes, oldest first
+        self._total_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_index(self):
+        entries = []
+        for fname in os.listdir(self.cache_dir):
+            if not fname.endswith(".json"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, fname))
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, fname[:-len(".json")], st.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+    def get(self, key):
+        """Cached detections for *key*, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                detections = json.load(f)
+            os.utime(path)   # mark as recently used for the next restart
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+                self._forget(key)
+            CACHE_EVENTS.labels("miss").inc()
+            return None
+        CACHE_EVENTS.labels("hit").inc()
+        with self._lock:
+            self.hits += 1
+            if key in self._index:
+                self._index.move_to_end(key)
+        return detections
+
+    def put(self, key, detections):
+        payload = json.dumps(detections).encode()
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, self._path(key))
+        with self._lock:
+            self._forget(key)
+            self._index[key] = len(payload)
+            self._total_bytes += len(payload)
+            self._evict()
+
+    def _forget(self, key):
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            CACHE_EVENTS.labels("eviction").inc()
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_detection_cache():
+    """The process-wide cache, or None when disabled with DOCSANCT_CACHE=0."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = DetectionCache()
+        return _cache
@@ -0,0 +1,450 @@
+# ── Standard library ────────────────────────────────────────────
+import os          # Env-var configuration
+import copy        # Per-call copies of cached prompt-prefix KV
+import json        # Serialise stub detections into a model-like reply
+import hashlib     # Stub cache IDs: digest of the canned detections
+import inspect     # Feature-detect transformers forward() arguments
+import logging     # Load / device tracing
+import threading   # Guard lazy, one-time model loading
+from collections import OrderedDict
+
+from ai.metrics import GENERATED_TOKENS, GENERATION_STOPS, TOKENS_SAVED
+from ai.quantize import QUANTIZE, QUANTIZE_VISION, load_quantized
+
+# Heavy dependencies (torch, transformers, qwen_vl_utils) are imported inside
+# the backend that needs them, so importing this module - and everything that
+# imports it (batch processing, the FastAPI app) - stays cheap.
+
+logger = logging.getLogger(__name__)
+
+MODEL_ID = os.environ.get("DOCSANCT_MODEL_ID", "Qwen/Qwen2.5-VL-3B-Instruct")
+DEFAULT_BACKEND = os.environ.get("DOCSANCT_BACKEND", "qwen")
+
+# Keep the KV cache of the text before the first image (system prompt and
+# user-turn header) and prefill only the rest of each prompt. Off by default:
+# turn it on only once benchmarks/bench_prefix_cache.py has shown identical
+# greedy outputs with and without it for the deployed model and transformers
+PREFIX_CACHE_ENABLED = os.environ.get("DOCSANCT_PREFIX_CACHE", "0") == "1"
+PREFIX_CACHE_SIZE = int(os.environ.get("DOCSANCT_PREFIX_CACHE_SIZE", "4"))   # prompt variants kept
+
+
+class DetectorBackend:
+    """
+    Turns Qwen-style chat messages into the detector's raw text reply.
+
+    Subclasses implement `_load` (one-time setup) and `_generate`, and may
+    override `_generate_batch` when they can batch natively. Loading is lazy: it happens on the first `generate` call, or up front via `warmup`.
+    """
+
+    name = "base"
+
+    def __init__(self, model_id=MODEL_ID):
+        self.model_id = model_id
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    @property
+    def cache_id(self):
+        """Identifies the detector's outputs in the detection cache."""
+        return self.model_id
+
+    def load(self):
+        # Double-checked so concurrent first requests only load once
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+                    self._loaded = True
+        return self
+
+    def warmup(self):
+        """Load the backend now instead of on the first request."""
+        return self.load()
+
+    def generate(self, msgs, max_new_tokens=1000, budget=None):
+        return self.generate_batch([msgs], max_new_tokens, None if budget is None else [budget])[0]
+
+    def generate_batch(self, msgs_list, max_new_tokens=1000, budgets=None):
+        """
+        Raw replies for several conversations, in the same order.
+        *budgets*, if given, holds a per-conversation token limit (capped at
+        *max_new_tokens*); backends that can stop rows individually honour it.
+        """
+        self.load()
+        if not msgs_list:
+            return []
+        if budgets is None:
+            budgets = [max_new_tokens] * len(msgs_list)
+        budgets = [min(max_new_tokens, max(1, int(budget))) for budget in budgets]
+        return self._generate_batch(msgs_list, max_new_tokens, budgets)
+
+    def _load(self):
+        pass
+
+    def _generate(self, msgs, max_new_tokens):
+        raise NotImplementedError
+
+    def _generate_batch(self, msgs_list, max_new_tokens, budgets):
+        # Backends without native batching just run the conversations in turn
+        return [self._generate(msgs, budget) for msgs, budget in zip(msgs_list, budgets)]
+
+
+class JsonCompletionTracker:
+    """
+    Bracket balance over streamed text. Complete as soon as a top-level
+    JSON array closes; brackets inside string literals don't count, and
+    neither does anything before the first bracket (such as the ```json
+    fence). A top-level object is not an end: the model may reply with
+    several bare objects in a row, so those replies run to EOS or the budget.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.top = None      # opening bracket of the current top-level value
+        self.in_string = False
+        self.escape = False
+        self.complete = False
+
+    def feed(self, text):
+        for ch in text:
+            if self.complete:
+                break
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"' and self.depth:
+                self.in_string = True
+            elif ch in "[{":
+                if not self.depth:
+                    self.top = ch
+                self.depth += 1
+            elif ch in "]}" and self.depth:
+                self.depth -= 1
+                self.complete = self.depth == 0 and self.top == "["
+        return self.complete
+
+
+def _json_stopping_criteria(tokenizer, budgets):
+    """
+    transformers StoppingCriteria ending each row once its JSON reply is
+    complete ("json_complete") or it has used its token budget ("budget").
+    Built on demand so importing this module doesn't import transformers.
+    """
+    import torch
+    from transformers import StoppingCriteria
+
+    class JsonStoppingCriteria(StoppingCriteria):
+        def __init__(self):
+            self.trackers = [JsonCompletionTracker() for _ in budgets]
+            self.reasons = [None] * len(budgets)
+            self.steps = 0
+            self._token_text = {}
+
+        def _text(self, token_id):
+            # Brackets are single ASCII characters, so decoding one token at
+            # a time is enough; decoded pieces are memoised per token ID
+            text = self._token_text.get(token_id)
+            if text is None:
+                text = self._token_text[token_id] = tokenizer.decode([token_id])
+            return text
+
+        def __call__(self, input_ids, scores, **kwargs):
+            self.steps += 1
+            for row, token_id in enumerate(input_ids[:, -1].tolist()):
+                if self.reasons[row] is not None:
+                    continue
+                if self.trackers[row].feed(self._text(token_id)):
+                    self.reasons[row] = "json_complete"
+                elif self.steps >= budgets[row]:
+                    self.reasons[row] = "budget"
+            return torch.tensor([reason is not None for reason in self.reasons], device=input_ids.device)
+
+    return JsonStoppingCriteria()
+
+
+class QwenVLBackend(DetectorBackend):
+    """Qwen2.5-VL loaded through transformers on first use."""
+
+    name = "qwen"
+
+    def __init__(self, model_id=MODEL_ID, quantize=None, quantize_vision=None):
+        super().__init__(model_id)
+        # Quantized CPU mode (see ai/quantize.py); default $DOCSANCT_QUANTIZE
+        # and $DOCSANCT_QUANTIZE_VISION
+        self.quantize = QUANTIZE if quantize is None else quantize
+        self.quantize_vision = QUANTIZE_VISION if quantize_vision is None else quantize_vision
+        self.model = None
+        self.processor = None
+        self._prefix_caches = OrderedDict()   # prefix text -> (token IDs, KV cache)
+        self._prefix_lock = threading.Lock()
+
+    def _load(self):
+        from transformers import (
+            Qwen2_5_VLForConditionalGeneration,  # Multimodal LLM (image+text)
+            AutoProcessor,                       # Paired tokenizer/feature‑extractor
+        )
+        if self.quantize:
+            # int8 kernels are CPU-only: load FP32 onto the CPU (on a cache
+            # miss) and convert, or reuse the cached conversion
+            self.model = load_quantized(
+                self.model_id, self.quantize,
+                lambda: Qwen2_5_VLForConditionalGeneration.from_pretrained(self.model_id, torch_dtype="float32"),
+                self.quantize_vision,
+            )
+        else:
+            self.model = Qwen2_5_VLForConditionalGeneration.from_pretrained(
+                self.model_id,
+                torch_dtype="auto",     # automatically uses FP16 on GPU, FP32 on CPU
+                device_map="auto"       # dispatches layers to the available device(s)
+            )
+        self.processor = AutoProcessor.from_pretrained(self.model_id)
+        # Decoder-only generation must be left-padded when batching, so that
+        # every prompt ends exactly where its generated tokens begin.
+        self.processor.tokenizer.padding_side = "left"
+        logger.info("Model loaded on: %s%s", self.model.device, f" ({self.quantize})" if self.quantize else "")
+
+    @property
+    def cache_id(self):
+        # Quantized replies can differ from FP32 ones, and quantizing the
+        # vision tower changes them again: keep each variant's entries apart
+        if not self.quantize:
+            return self.model_id
+        return f"{self.model_id}:{self.quantize}" + (":vision" if self.quantize_vision else "")
+
+    def warmup(self):
+        # Besides loading weights, run one tiny generation so the first real
+        # request doesn't pay for lazy kernel/graph initialisation.
+        from PIL import Image
+        self.load()
+        msgs = [{
+            "role": "user",
+            "content": [
+                {"type": "image", "image": Image.new("RGB", (56, 56), "white")},
+                {"type": "text", "text": "Reply with []"},
+            ],
+        }]
+        self._generate(msgs, max_new_tokens=1)
+        return self
+
+    def _generate(self, msgs, max_new_tokens):
+        return self._generate_batch([msgs], max_new_tokens, [max_new_tokens])[0]
+
+    def _generate_batch(self, msgs_list, max_new_tokens, budgets):
+        import torch
+        from transformers import StoppingCriteriaList
+        from qwen_vl_utils import process_vision_info  # Post‑process Qwen outputs
+
+        # Build the full textual prompt that Qwen-VL expects, one per conversation
+        text_prompts = [
+            self.processor.apply_chat_template(
+                msgs,
+                tokenize=False,
+                add_generation_prompt=True
+            )
+            for msgs in msgs_list
+        ]
+        # Extract vision-modalities from every conversation (in order) and
+        # convert them to model-ready tensors
+        image_inputs, video_inputs = process_vision_info(msgs_list)
+
+        # ── Pack text + vision into model-ready tensors ──────────────────────────
+        inputs = self.processor(
+            text=text_prompts,       # N-element batch of chat prompt strings
+            images=image_inputs,     # list of raw PIL images (pre-processed inside processor)
+            videos=video_inputs,     # list of raw video clips (if any)
+            padding=True,            # left-pad sequences so the batch forms one tensor
+            return_tensors="pt",     # return a dict of PyTorch tensors (input_ids, pixel_values, …)
+        ).to(self.model.device)      # move every tensor—text & vision—to the model’s GPU/CPU
+
+        # ── Run inference (no gradients, pure generation) ───────────────────────
+        # Each row stops at its closing JSON bracket or its own budget rather
+        # than decoding up to max_new_tokens; the call returns once every row
+        # has stopped
+        stopping = _json_stopping_criteria(self.processor.tokenizer, budgets)
+        with torch.no_grad():
+            generated_ids = None
+            if PREFIX_CACHE_ENABLED:
+                try:
+                    generated_ids = self._generate_with_prefix_cache(
+                        text_prompts, inputs, max_new_tokens=max(budgets),
+                        stopping_criteria=StoppingCriteriaList([stopping]),
+                    )
+                except Exception:
+                    logger.warning("Prompt-prefix cache failed; prefilling the full prompt", exc_info=True)
+                    stopping = _json_stopping_criteria(self.processor.tokenizer, budgets)
+                    generated_ids = None
+            if generated_ids is None:
+                generated_ids = self.model.generate(
+                    **inputs,
+                    max_new_tokens=max(budgets),
+                    stopping_criteria=StoppingCriteriaList([stopping]),
+                )
+        # With left padding all prompts share the same length, so slicing at
+        # the input width leaves exactly the new tokens of each row
+        new_ids = generated_ids[:, inputs.input_ids.shape[-1]:]
+        outputs = self.processor.batch_decode(
+            new_ids,
+            skip_special_tokens=False
+        )
+        pad_token_id = self.processor.tokenizer.pad_token_id
+        for row, reason, budget in zip(new_ids, stopping.reasons, budgets):
+            tokens = int((row != pad_token_id).sum()) if pad_token_id is not None else len(row)
+            GENERATED_TOKENS.labels(self.name).observe(tokens)
+            if reason is None:
+                reason = "length" if tokens >= budget else "eos"
+            # Decode steps not spent relative to the caller's max_new_tokens
+            GENERATION_STOPS.labels(self.name, reason).inc()
+            TOKENS_SAVED.labels(self.name, reason).inc(max(0, max_new_tokens - tokens))
+        # Rows that finished early are right-filled with pad tokens
+        pad_token = self.processor.tokenizer.pad_token
+        if pad_token:
+            outputs = [out.replace(pad_token, "") for out in outputs]
+        return outputs
+
+    def _prefix_cache(self, prefix_text):
+        """(token IDs, KV cache) for *prefix_text*, computed once per prompt variant."""
+        from transformers import DynamicCache
+        with self._prefix_lock:
+            entry = self._prefix_caches.get(prefix_text)
+            if entry is not None:
+                self._prefix_caches.move_to_end(prefix_text)
+                return entry
+        prefix_ids = self.processor.tokenizer(
+            prefix_text, add_special_tokens=False, return_tensors="pt"
+        ).input_ids.to(self.model.device)
+        # Text-only prefix: its rotary positions are plain 0..P-1, the same
+        # as inside any full prompt that starts with it
+        cache = self.model(input_ids=prefix_ids, past_key_values=DynamicCache(), use_cache=True,
+                           **self._logits_to_keep()).past_key_values
+        with self._prefix_lock:
+            self._prefix_caches[prefix_text] = (prefix_ids, cache)
+            while len(self._prefix_caches) > PREFIX_CACHE_SIZE:
+                self._prefix_caches.popitem(last=False)
+        return prefix_ids, cache
+
+    def _logits_to_keep(self):
+        # Prefill only needs the KV cache, not full-vocabulary logits for
+        # every prompt token (the argument was renamed across versions)
+        params = inspect.signature(self.model.forward).parameters
+        for name in ("logits_to_keep", "num_logits_to_keep"):
+            if name in params:
+                return {name: 1}
+        return {}
+
+    def _generate_with_prefix_cache(self, text_prompts, inputs, **generate_kwargs):
+        """
+        generate() with the shared prompt prefix served from cache: copy its
+        KV, prefill the rest of each prompt (image included) up to the last
+        token, then let generate() continue from there. Returns None when the
+        batch doesn't fit (no image, differing prefixes, or padded rows -
+        left padding would shift the prefix's positions per row).
+        """
+        import torch
+        marker = "<|vision_start|>"
+        if not all(marker in prompt for prompt in text_prompts):
+            return None
+        prefix_texts = {prompt[:prompt.index(marker)] for prompt in text_prompts}
+        input_ids, attention_mask = inputs.input_ids, inputs.attention_mask
+        if len(prefix_texts) != 1 or not bool(attention_mask.all()):
+            return None
+        prefix_ids, prefix_cache = self._prefix_cache(prefix_texts.pop())
+        rows, prefix_len, total_len = input_ids.shape[0], prefix_ids.shape[-1], input_ids.shape[-1]
+        if prefix_len >= total_len - 1 or not torch.equal(input_ids[:, :prefix_len], prefix_ids.expand(rows, -1)):
+            return None
+
+        cache = copy.deepcopy(prefix_cache)
+        if rows > 1:
+            cache.batch_repeat_interleave(rows)
+        # Multimodal rotary positions for the whole prompt; the suffix
+        # prefill takes its slice, and decoding continues from rope_deltas
+        model = getattr(self.model, "model", self.model)
+        get_rope_index = getattr(self.model, "get_rope_index", None) or model.get_rope_index
+        position_ids, rope_deltas = get_rope_index(
+            input_ids=input_ids, image_grid_thw=inputs.get("image_grid_thw"), attention_mask=attention_mask
+        )
+        end = total_len - 1
+        self.model(
+            input_ids=input_ids[:, prefix_len:end],
+            pixel_values=inputs.get("pixel_values"),
+            image_grid_thw=inputs.get("image_grid_thw"),
+            attention_mask=attention_mask[:, :end],
+            position_ids=position_ids[:, :, prefix_len:end],
+            past_key_values=cache,
+            cache_position=torch.arange(prefix_len, end, device=input_ids.device),
+            use_cache=True,
+            **self._logits_to_keep(),
+        )
+        for owner in {id(self.model): self.model, id(model): model}.values():
+            if hasattr(owner, "rope_deltas"):
+                owner.rope_deltas = rope_deltas
+        # generate() sees a cache covering all but the last prompt token, so
+        # it only feeds that token (and skips the vision inputs) before decoding
+        return self.model.generate(
+            input_ids=input_ids, attention_mask=attention_mask, past_key_values=cache, **generate_kwargs
+        )
+
+
+class StubBackend(DetectorBackend):
+    """
+    Deterministic stand-in for the VLM: always replies with the same
+    detections, wrapped the way Qwen wraps them. No torch, no weights.
+    """
+
+    name = "stub"
+
+    def __init__(self, detections=None, model_id="stub"):
+        super().__init__(model_id)
+        self.detections = list(detections or [])
+
+    @property
+    def cache_id(self):
+        # Stubs with different canned boxes must not share cache entries
+        digest = hashlib.sha256(json.dumps(self.detections, sort_keys=True).encode()).hexdigest()
+        return f"{self.model_id}:{digest[:16]}"
+
+    def _generate(self, msgs, max_new_tokens):
+        return "```json\n" + json.dumps(self.detections) + "\n```<|im_end|>"
+
+
+BACKENDS = {
+    QwenVLBackend.name: QwenVLBackend,
+    StubBackend.name: StubBackend,
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_backend(name=None):
+    """
+    Return the process-wide backend instance for *name* (default:
+    $DOCSANCT_BACKEND, else "qwen"). Instances are created on first request
+    and do not load any weights until used or warmed up.
+    """
+    name = (name or DEFAULT_BACKEND).lower()
+    with _instances_lock:
+        if name not in _instances:
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown detector backend: {name!r} (choose from {sorted(BACKENDS)})")
+            _instances[name] = BACKENDS[name]()
+        return _instances[name]
+
+
+def set_backend(backend, name=None):
+    """Register a ready-made backend instance, e.g. a configured StubBackend."""
+    with _instances_lock:
+        _instances[(name or backend.name).lower()] = backend
+    return backend
+
+
+def warmup(name=None):
+    """Explicitly load (and prime) the selected backend."""
+    return get_backend(name).warmup()
@@ -0,0 +1,222 @@
+# ── Standard library ────────────────────────────────────────────
+import os          # Env-var configuration
+import time        # Batch deadlines and queue-wait timing
+import logging     # Scheduler tracing
+import threading   # Worker thread + condition shared with request threads
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+from ai.detector_backend import DetectorBackend, get_backend
+from ai.metrics import Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# One scheduler owns the detector and feeds it micro-batches collected from
+# every in-flight request. A batch is sent once it holds SCHEDULER_MAX_BATCH
+# conversations or its oldest one has waited SCHEDULER_MAX_WAIT_MS, whichever
+# comes first; conversations are taken round-robin across tenants, so a large
+# job can't hold back a small one queued behind it.
+SCHEDULER_ENABLED = os.environ.get("DOCSANCT_SCHEDULER", "1") == "1"
+SCHEDULER_MAX_BATCH = int(os.environ.get("DOCSANCT_SCHEDULER_MAX_BATCH", os.environ.get("DOCSANCT_VLM_BATCH_SIZE", "4")))
+SCHEDULER_MAX_WAIT_MS = float(os.environ.get("DOCSANCT_SCHEDULER_MAX_WAIT_MS", "20"))
+
+DEFAULT_TENANT = "default"
+
+SCHEDULER_BATCH_SIZE = Histogram(
+    "docsanct_scheduler_batch_size", "Conversations per micro-batch sent to the detector.",
+    buckets=(1, 2, 4, 8, 16, 32, 64))
+SCHEDULER_QUEUE_SECONDS = Histogram(
+    "docsanct_scheduler_queue_seconds", "Time a conversation waited in the scheduler before its batch started.",
+    buckets=(0.001, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+SCHEDULER_QUEUE_DEPTH = Gauge(
+    "docsanct_scheduler_queue_depth", "Conversations waiting in the inference scheduler.")
+
+
+class _Request:
+    __slots__ = ("msgs", "max_new_tokens", "budget", "future", "enqueued")
+
+    def __init__(self, msgs, max_new_tokens, budget):
+        self.msgs = msgs
+        self.max_new_tokens = max_new_tokens
+        self.budget = budget
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+class InferenceScheduler:
+    """
+    Collects detection requests from many threads into micro-batches for one
+    *backend*, run on a single worker thread. `submit` returns a Future for
+    the raw reply; `backend_for(tenant)` wraps the scheduler as a detector
+    backend, so the existing pipeline (inference_batch, tiling, the cache)
+    goes through it unchanged.
+    """
+
+    def __init__(self, backend, max_batch_size=SCHEDULER_MAX_BATCH, max_wait_ms=SCHEDULER_MAX_WAIT_MS):
+        self.backend = backend
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._tenants = OrderedDict()   # tenant -> deque of _Request; the front tenant is served next
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="inference-scheduler", daemon=True)
+                self._thread.start()
+        return self
+
+    def close(self):
+        """Stop after the batch in progress; requests still queued fail."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            leftover = [request for queue in self._tenants.values() for request in queue]
+            self._tenants.clear()
+            self._pending = 0
+        for request in leftover:
+            request.future.set_exception(RuntimeError("Inference scheduler closed"))
+
+    def depth(self):
+        return self._pending
+
+    def submit(self, msgs, max_new_tokens=1000, budget=None, tenant=DEFAULT_TENANT):
+        """Queue one conversation; the Future resolves to the backend's raw reply."""
+        request = _Request(msgs, max_new_tokens, max_new_tokens if budget is None else min(budget, max_new_tokens))
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Inference scheduler closed")
+            self._tenants.setdefault(tenant, deque()).append(request)
+            self._pending += 1
+            self._cond.notify_all()
+        self.start()
+        return request.future
+
+    def backend_for(self, tenant=DEFAULT_TENANT):
+        return ScheduledBackend(self, tenant)
+
+    def _take_batch(self):
+        # Round-robin: one conversation from the front tenant, which then
+        # moves to the back, until the batch is full or nothing is left
+        batch = []
+        while self._tenants and len(batch) < self.max_batch_size:
+            tenant, queue = next(iter(self._tenants.items()))
+            batch.append(queue.popleft())
+            if queue:
+                self._tenants.move_to_end(tenant)
+            else:
+                del self._tenants[tenant]
+        self._pending -= len(batch)
+        return batch
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            # Hold the batch open until it is full or its oldest request has
+            # waited max_wait
+            deadline = min(queue[0].enqueued for queue in self._tenants.values()) + self.max_wait if self._pending else 0
+            while not self._closed and self._pending < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return None if self._closed else self._take_batch()
+
+    def _worker(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            now = time.monotonic()
+            for request in batch:
+                SCHEDULER_QUEUE_SECONDS.observe(now - request.enqueued)
+            SCHEDULER_BATCH_SIZE.observe(len(batch))
+            try:
+                replies = self._generate(batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    logger.exception("Detector call failed")
+                    batch[0].future.set_exception(e)
+                    continue
+                # One bad conversation (or tenant) mustn't fail the others it
+                # happened to share a batch with: retry each on its own
+                logger.warning("Detector batch of %d failed; retrying its conversations one by one",
+                               len(batch), exc_info=True)
+                for request in batch:
+                    try:
+                        request.future.set_result(self._generate([request])[0])
+                    except Exception as e:
+                        logger.exception("Detector call failed")
+                        request.future.set_exception(e)
+                continue
+            for request, reply in zip(batch, replies):
+                request.future.set_result(reply)
+
+    def _generate(self, batch):
+        return self.backend.generate_batch(
+            [request.msgs for request in batch],
+            max_new_tokens=max(request.max_new_tokens for request in batch),
+            budgets=[request.budget for request in batch],
+        )
+
+
+class ScheduledBackend(DetectorBackend):
+    """A tenant's view of an InferenceScheduler, usable wherever a backend is."""
+
+    def __init__(self, scheduler, tenant=DEFAULT_TENANT):
+        super().__init__(scheduler.backend.model_id)
+        self.scheduler = scheduler
+        self.tenant = tenant
+        self.name = scheduler.backend.name
+
+    @property
+    def loaded(self):
+        return self.scheduler.backend.loaded
+
+    @property
+    def cache_id(self):
+        return self.scheduler.backend.cache_id
+
+    def load(self):
+        self.scheduler.backend.load()
+        return self
+
+    def warmup(self):
+        self.scheduler.backend.warmup()
+        return self
+
+    def _generate_batch(self, msgs_list, max_new_tokens, budgets):
+        # All conversations are queued before waiting on any, so they can
+        # share a batch with each other and with other tenants' work
+        futures = [self.scheduler.submit(msgs, max_new_tokens, budget, self.tenant)
+                   for msgs, budget in zip(msgs_list, budgets)]
+        return [future.result() for future in futures]
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """The process-wide scheduler around get_backend(), or None when disabled with DOCSANCT_SCHEDULER=0."""
+    global _scheduler
+    if not SCHEDULER_ENABLED:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = InferenceScheduler(get_backend())
+            SCHEDULER_QUEUE_DEPTH.set_function(_scheduler.depth)
+        return _scheduler
+
+
+def scheduled_backend(tenant=DEFAULT_TENANT):
+    """Backend for one tenant's requests: through the shared scheduler, or the plain backend when it is off."""
+    scheduler = get_scheduler()
+    return scheduler.backend_for(tenant) if scheduler else get_backend()
@@ -0,0 +1,224 @@
+# ── Standard library ────────────────────────────────────────────
+import time        # Stage timers
+import math        # +Inf bucket / value formatting
+import threading   # Metrics are updated from request and worker threads
+from contextlib import contextmanager
+
+# Minimal in-process metrics in the Prometheus text exposition format
+# (version 0.0.4), served by the FastAPI app at /metrics. Counters, gauges
+# and histograms with labels; no client library needed.
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._function = None
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        values = tuple(str(v) for v in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        with self._lock:
+            child = self._children.get(values)
+            if child is None:
+                child = self._children[values] = self._new_child()
+            return child
+
+    def set_function(self, fn):
+        """Read the (unlabelled) value from *fn* at scrape time instead."""
+        self._function = fn
+
+    def _default(self):
+        # Unlabelled metrics are used directly, as their own single child
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels {self.labelnames}; call .labels() first")
+        return self.labels()
+
+    def _samples(self):
+        if self._function is not None:
+            return [(self.name, (), (), self._function())]
+        with self._lock:
+            children = list(self._children.items())
+        samples = []
+        for values, child in children:
+            samples.extend(child.samples(self.name, values))
+        return samples
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for name, values, extra, value in self._samples():
+            lines.append(f"{name}{_format_labels(self.labelnames, values, extra)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self.value = float(value)
+
+    def samples(self, name, values):
+        return [(name, values, (), self.value)]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self, name, values):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            samples.append((f"{name}_bucket", values, (("le", _format_value(bound)),), cumulative))
+        samples.append((f"{name}_count", values, (), cumulative))
+        samples.append((f"{name}_sum", values, (), total))
+        return samples
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+def render_metrics():
+    """All registered metrics as one Prometheus text exposition."""
+    with _registry_lock:
+        metrics = list(_registry)
+    return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ── Pipeline metrics ───────────────────────────────────────────
+STAGE_SECONDS = Histogram(
+    "docsanct_stage_seconds", "Wall time per pipeline stage call.", ["stage"])
+FILE_SECONDS = Histogram(
+    "docsanct_file_seconds", "Wall time to redact one uploaded file.", ["kind"])
+FILES_PROCESSED = Counter(
+    "docsanct_files_processed_total", "Files run through the redaction pipeline.", ["kind", "status"])
+PAGES_PROCESSED = Counter(
+    "docsanct_pages_processed_total", "Pages redacted, by the tier that decided their boxes.", ["tier"])
+GENERATED_TOKENS = Histogram(
+    "docsanct_generated_tokens", "New tokens generated per conversation by the detector.", ["backend"],
+    buckets=(8, 16, 32, 64, 128, 256, 512, 1000, 2000))
+GENERATION_STOPS = Counter(
+    "docsanct_generation_stops_total",
+    "Detector generations by why they stopped: json_complete, budget, eos or length.", ["backend", "reason"])
+TOKENS_SAVED = Counter(
+    "docsanct_generation_tokens_saved_total",
+    "Decode steps not spent relative to max_new_tokens, by stopping reason.", ["backend", "reason"])
+BUDGET_RETRIES = Counter(
+    "docsanct_generation_budget_retries_total",
+    "Pages whose reply was cut off by the adaptive token budget and regenerated in full.")
+VLM_TILES = Counter(
+    "docsanct_vlm_tiles_total", "Tiles sent to the detector for pages split by DOCSANCT_TILE_SIZE.")
+REQUEST_SECONDS = Histogram(
+    "docsanct_request_seconds", "Wall time per API request, including streaming the response.", ["endpoint"])
+JOB_QUEUE_DEPTH = Gauge(
+    "docsanct_job_queue_depth", "Redaction jobs waiting for a worker.")
+
+
+def stage_timer(stage):
+    """Context manager recording one `docsanct_stage_seconds` observation."""
+    return STAGE_SECONDS.labels(stage).time()
@@ -0,0 +1,86 @@
+# ── Standard library ────────────────────────────────────────────
+import os          # Env-var configuration
+
+# ── Numerical computing ─────────────────────────────────────────
+import numpy as np  # Colour check on a sample of the page
+from PIL import Image
+
+from ai.metrics import Counter
+
+# How redacted pages are stored in the output PDF. Pages are always flattened
+# bitmaps; only the pixel format and compression change:
+#   bilevel  1-bit, CCITT G4 (what fax/scan pipelines use for text)
+#   gray     8-bit greyscale JPEG
+#   jpeg     RGB JPEG (the previous behaviour)
+#   auto     pick one of the above per page from its content
+PAGE_ENCODING = os.environ.get("DOCSANCT_PAGE_ENCODING", "auto")
+JPEG_QUALITY = int(os.environ.get("DOCSANCT_JPEG_QUALITY", "75"))   # Pillow's default
+# auto: a page is bilevel when at least this share of its pixels is already
+# near-black or near-white (anti-aliased text edges make up the rest)...
+BILEVEL_MIN_EXTREMES = float(os.environ.get("DOCSANCT_BILEVEL_MIN_EXTREMES", "0.97"))
+# ...and colour when more than this share of pixels has visible chroma
+COLOR_MIN_PIXELS = float(os.environ.get("DOCSANCT_COLOR_MIN_PIXELS", "0.005"))
+COLOR_CHROMA = 24   # max - min channel spread that counts as colour
+
+ENCODINGS = ("bilevel", "gray", "jpeg")
+
+PAGES_ENCODED = Counter(
+    "docsanct_pages_encoded_total", "Output PDF pages by the encoding chosen for them.", ["encoding"])
+
+
+def _sample(img):
+    # Both tests are pixel-share statistics, so every 4th pixel of every 4th
+    # row (nearest-neighbour, no averaging that would blur text edges into
+    # greys) estimates them at 1/16 of the cost
+    if min(img.size) < 16:
+        return img
+    return img.resize((img.width // 4, img.height // 4), Image.NEAREST)
+
+
+def _is_colour(sample):
+    rgb = np.asarray(sample.convert("RGB"))
+    spread = rgb.max(axis=2).astype(np.int16) - rgb.min(axis=2)
+    return float((spread > COLOR_CHROMA).mean()) > COLOR_MIN_PIXELS
+
+
+def _extremes_share(sample):
+    hist = sample.convert("L").histogram()
+    return (sum(hist[:64]) + sum(hist[192:])) / (sample.width * sample.height)
+
+
+def choose_encoding(img):
+    """Encoding auto mode would use for *img*: "bilevel", "gray" or "jpeg"."""
+    if img.mode == "1":
+        return "bilevel"
+    sample = _sample(img)
+    if img.mode not in ("L", "LA") and _is_colour(sample):
+        return "jpeg"
+    if _extremes_share(sample) >= BILEVEL_MIN_EXTREMES:
+        return "bilevel"
+    return "gray"
+
+
+def encode_page(img, encoding=None, quality=None):
+    """
+    Convert *img* for its PDF page. Returns (image, save params, encoding);
+    the params go to `Image.save(..., "PDF", **params)`.
+    """
+    encoding = encoding or PAGE_ENCODING
+    quality = quality or JPEG_QUALITY
+    if encoding == "auto":
+        encoding = choose_encoding(img)
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown page encoding: {encoding!r} (choose from auto, {', '.join(ENCODINGS)})")
+    if encoding == "bilevel":
+        if img.mode != "1":
+            # Hard threshold, no dithering: redaction boxes stay solid black
+            img = img.convert("L").point(lambda v: 255 if v >= 128 else 0, mode="1")
+        params = {}
+    elif encoding == "gray":
+        img = img if img.mode == "L" else img.convert("L")
+        params = {"quality": quality}
+    else:
+        img = img if img.mode in ("RGB", "CMYK") else img.convert("RGB")
+        params = {"quality": quality}
+    PAGES_ENCODED.labels(encoding).inc()
+    return img, params, encoding
@@ -0,0 +1,96 @@
+# ── Standard library ────────────────────────────────────────────
+import io          # One-page PDFs built in memory
+import os          # Env-var configuration
+
+# ── PDF rasterisation (poppler via pdf2image) ──────────────────
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PyPDF2 import PdfReader, PdfWriter
+
+from ai.page_encoder import encode_page
+from ai.metrics import stage_timer
+
+# Pages rendered per pdftoppm call. Peak memory is bounded by this window,
+# not by the length of the document.
+PAGE_WINDOW = int(os.environ.get("DOCSANCT_PAGE_WINDOW", "1"))
+PDF_DPI = int(os.environ.get("DOCSANCT_PDF_DPI", "200"))   # pdf2image's default
+
+
+def pdf_page_count(pdf_path):
+    return int(pdfinfo_from_path(pdf_path)["Pages"])
+
+
+def iter_pdf_windows(pdf_path, window=None, dpi=None):
+    """
+    Yield lists of (page_number, PIL image) covering at most *window* pages
+    each, rendering only that page range. Page numbers start at 1.
+    """
+    window = max(1, window or PAGE_WINDOW)
+    dpi = dpi or PDF_DPI
+    total = pdf_page_count(pdf_path)
+    for first in range(1, total + 1, window):
+        last = min(first + window - 1, total)
+        imgs = convert_from_path(pdf_path, dpi=dpi, first_page=first, last_page=last)
+        yield [(first + offset, img) for offset, img in enumerate(imgs)]
+
+
+def iter_pdf_pages(pdf_path, window=None, dpi=None):
+    """Yield (page_number, PIL image) one page at a time."""
+    for page_window in iter_pdf_windows(pdf_path, window=window, dpi=dpi):
+        yield from page_window
+
+
+def render_pdf_page(pdf_path, page_number, dpi=None):
+    """Render a single (1-based) page."""
+    return convert_from_path(pdf_path, dpi=dpi or PDF_DPI, first_page=page_number, last_page=page_number)[0]
+
+
+class EncryptedPdfWriter:
+    """
+    Assembles image pages straight into an encrypted, metadata-free PDF in
+    one pass: no temp file, and the finished document is never re-parsed.
+    Each page is encoded as soon as it is appended (Pillow writes it as a
+    one-page PDF in memory, whose page PyPDF2 adopts), so only compressed
+    page streams are held until the document is encrypted and written on
+    a clean exit. *dest* is a path or a writable binary file object.
+
+        with EncryptedPdfWriter(path, password) as sink:
+            for img in pages:
+                sink.append(img)
+    """
+
+    def __init__(self, dest, password, encoding=None):
+        self.dest = dest
+        self.password = password
+        self.encoding = encoding
+        self.writer = PdfWriter()
+        self.pages = 0
+        self.encodings = []
+
+    def append(self, img):
+        img, params, encoding = encode_page(img, self.encoding)
+        buf = io.BytesIO()
+        img.save(buf, "PDF", **params)
+        self.writer.add_page(PdfReader(buf).pages[0])
+        self.encodings.append(encoding)
+        self.pages += 1
+
+    def close(self):
+        with stage_timer("encrypt"):
+            # Remove metadata and encrypt
+            self.writer.add_metadata({})
+            self.writer.encrypt(self.password)
+            if hasattr(self.dest, "write"):
+                self.writer.write(self.dest)
+            else:
+                with open(self.dest, "wb") as f:
+                    self.writer.write(f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Nothing touches *dest* until the last page is in, so a failed page
+        # leaves no half-written output behind
+        if exc_type is None:
+            self.close()
+        return False
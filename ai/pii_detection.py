@@ -6,7 +6,8 @@ import io          # In‑memory byte streams (e.g. image buffers)
 import requests    # Simple HTTP requests for downloading assets
 import re          # Regular expression operations
 import json        # Functions for working with JSON data (parse, serialize)
-import pprint 
+import math        # Outward rounding when rescaling boxes
+import logging   # Pipeline tracing (configured by the app)
 
 # ── Numerical computing ─────────────────────────────────────────
 import numpy as np  # Core array maths (fast, vectorised operations)
@@ -17,34 +18,20 @@ from PIL import (
     ImageColor    # Utility for converting color names/formats to Pillow color values
 )
 
-# ── Deep‑learning stack ─────────────────────────────────────────
-import torch  # Tensor library + GPU acceleration
-from transformers import (
-    Qwen2_5_VLForConditionalGeneration,  # Multimodal LLM (image+text)
-    AutoProcessor,                       # Paired tokenizer/feature‑extractor
-)
-
-# ── Imaging & visualisation ─────────────────────────────────────
-import matplotlib.pyplot as plt          # Quick plots in notebooks
-import matplotlib.patches as patches     # Bounding‑box overlays, etc.
-
-# ── Project‑specific helpers ────────────────────────────────────
-from qwen_vl_utils import process_vision_info  # Post‑process Qwen outputs
+# ── Detector backends ──────────────────────────────────────────
+# torch / transformers / qwen_vl_utils are only imported by the backend that
+# actually needs them, the first time it is used (see ai/detector_backend.py).
+from ai.detector_backend import get_backend, MODEL_ID
+from ai.detection_cache import get_detection_cache, detection_key
+from ai.pii_matcher import LabelFilter
+from ai.redaction_render import render_redactions
+from ai.metrics import stage_timer, PAGES_PROCESSED, BUDGET_RETRIES, VLM_TILES
 
-# ── Notebook conveniences ──────────────────────────────────────
-import IPython.display as ipd             # Inline display (images, audio, HTML)
+PII_LABEL_FILTER = LabelFilter()
 
-device = "cuda" if torch.cuda.is_available() else "cpu"
-model_id = "Qwen/Qwen2.5-VL-3B-Instruct"
-
-model = Qwen2_5_VLForConditionalGeneration.from_pretrained(
-    model_id,
-    torch_dtype="auto",     # automatically uses FP16 on GPU, FP32 on CPU
-    device_map="auto"       # dispatches layers to the available device(s)
-)
-processor = AutoProcessor.from_pretrained(model_id)
+logger = logging.getLogger(__name__)
 
-print(f"Model loaded on: {model.device}")
+model_id = MODEL_ID
 
 
 def _repair_newlines_inside_strings(txt: str) -> str:
@@ -64,8 +51,9 @@ def extract_json(code_block: str, parse: bool = True):
       • the raw JSON string   (parse=False, default)
       • the parsed Python obj (parse=True)
     """
-    # Look for triple-backtick blocks, optionally tagged with a language (e.g. ```json)
-    block_re = re.compile(r"```(?:\w+)?\s*(.*?)\s*```", re.DOTALL)
+    # Look for triple-backtick blocks, optionally tagged with a language (e.g. ```json).
+    # Generation stops at the closing JSON bracket, so the closing fence may be missing
+    block_re = re.compile(r"```(?:\w+)?\s*(.*?)\s*(?:```|$)", re.DOTALL)
     m = block_re.search(code_block)
     payload = (m.group(1) if m else code_block).strip()
     if parse:
@@ -110,29 +98,13 @@ def draw_bboxes(
     text_color="white",
     text_bg="red",
 ):
-    # Create a drawing object for the image
-    draw = ImageDraw.Draw(img)
-    try:
-        # Try to load a TrueType font
-        font = ImageFont.truetype("DejaVuSans.ttf", font_size)
-    except OSError:
-        # If TrueType font is not found, load the default font
-        font = ImageFont.load_default(font_size)
-
-    # Iterate through each detected object
-    for det in detections:
-        # Extract bounding box coordinates
-        x1, y1, x2, y2 = det["bbox_2d"]
-        # Get the label of the detected object, default to empty string if not present
-        label = str(det.get("label", ""))
-
-    # Draw a filled black rectangle (redaction box) on the image
-    draw.rectangle([x1, y1, x2, y2], fill="black")
-
-    # Return the modified image with bounding boxes and labels
-    return img
+    # Black out every detection with the shared renderer (ai/redaction_render.py):
+    # boxes are clamped and coalesced, then filled as array slices. The style
+    # arguments are kept for callers but labels are never drawn on redactions.
+    return render_redactions(img, [det["bbox_2d"] for det in detections])
 
 def display_image(img, title="Image"):
+  import matplotlib.pyplot as plt  # Quick plots in notebooks (imported on demand)
   # Display the image
   plt.figure(figsize=(8, 8))
   plt.imshow(img)
@@ -142,37 +114,297 @@ def display_image(img, title="Image"):
 
 ## Removed hardcoded image URL and related code. Only uploaded images are processed via API/batch.
 
-def inference(model, msgs):
-  # Build the full textual prompt that Qwen-VL expects
-  text_prompt = processor.apply_chat_template(
-    msgs,
-    tokenize=False, 
-    add_generation_prompt=True
-  )
-  # Extract vision-modalities from msgs and convert them to model-ready tensors
-  image_inputs, video_inputs = process_vision_info(msgs)
-
-  # ── Pack text + vision into model-ready tensors ──────────────────────────────
-  inputs = processor(
-      text=[text_prompt],      # 1-element batch containing the chat prompt string
-      images=image_inputs,     # list of raw PIL images (pre-processed inside processor)
-      videos=video_inputs,     # list of raw video clips (if any)
-      padding=True,            # pad sequences so text/vision tokens line up in a batch
-      return_tensors="pt",     # return a dict of PyTorch tensors (input_ids, pixel_values, …)
-  ).to(model.device)           # move every tensor—text & vision—to the model’s GPU/CPU
-
-  # ── Run inference (no gradients, pure generation) ───────────────────────────
-  with torch.no_grad():                     # disable autograd to save memory
-      generated_ids = model.generate(       # autoregressive decoding
-          **inputs,                         # unpack dict into generate(...)
-          max_new_tokens=1000               # cap the response to max_new_tokens
-      )
-  # Extract the newly generated tokens (skip the prompt length)
-  output = processor.batch_decode(
-      generated_ids[:, inputs.input_ids.shape[-1]:],
-      skip_special_tokens=False
-  )[0]
-  print(f"RAW output:\n {output} \n")
+# Pages per batched generate() call in the PDF path
+VLM_BATCH_SIZE = int(os.environ.get("DOCSANCT_VLM_BATCH_SIZE", "4"))
+
+# Generation limit per page. With the adaptive budget on, each page gets a
+# smaller limit estimated from how much ink (≈ text) it carries; a reply cut
+# off by that budget is regenerated with the full MAX_NEW_TOKENS.
+MAX_NEW_TOKENS = int(os.environ.get("DOCSANCT_MAX_NEW_TOKENS", "1000"))
+ADAPTIVE_BUDGET = os.environ.get("DOCSANCT_TOKEN_BUDGET", "1") == "1"
+TOKEN_BUDGET_MIN = int(os.environ.get("DOCSANCT_TOKEN_BUDGET_MIN", "192"))
+TOKENS_PER_INK = float(os.environ.get("DOCSANCT_TOKENS_PER_INK", "6000"))
+
+# Cap on the pixels of each image handed to the VLM (0 = no cap). Vision
+# tokens, and so prefill time, grow with pixel count: Qwen2.5-VL spends one
+# token per 28x28 patch, ~4900 for an A4 page at 200 DPI. Capped images are
+# resized to multiples of 28 (so the processor doesn't resize them again) and
+# returned boxes are mapped back to the original page. Rasterisation DPI is
+# set separately, by DOCSANCT_PDF_DPI.
+VLM_MAX_PIXELS = int(os.environ.get("DOCSANCT_VLM_MAX_PIXELS", "0"))
+VLM_PATCH = 28
+
+def vlm_input_image(img, max_pixels=None):
+    """
+    *img* resized to fit *max_pixels* (default VLM_MAX_PIXELS), plus the
+    (x, y) factors mapping coordinates on the resized image back onto *img*.
+    """
+    max_pixels = VLM_MAX_PIXELS if max_pixels is None else max_pixels
+    if not max_pixels or img.width * img.height <= max_pixels:
+        return img, (1.0, 1.0)
+    factor = (max_pixels / (img.width * img.height)) ** 0.5
+    width = max(VLM_PATCH, int(img.width * factor) // VLM_PATCH * VLM_PATCH)
+    height = max(VLM_PATCH, int(img.height * factor) // VLM_PATCH * VLM_PATCH)
+    return img.resize((width, height), Image.LANCZOS), (img.width / width, img.height / height)
+
+def _vlm_input_messages(msgs, max_pixels=None):
+    """Copy of *msgs* with every image passed through vlm_input_image, plus the scale of the first."""
+    scale = (1.0, 1.0)
+    capped = []
+    for message in msgs:
+        content = message.get("content")
+        if isinstance(content, list):
+            items = []
+            for item in content:
+                if isinstance(item, dict) and item.get("type") == "image" and isinstance(item.get("image"), Image.Image):
+                    img, item_scale = vlm_input_image(item["image"], max_pixels)
+                    if scale == (1.0, 1.0):
+                        scale = item_scale
+                    item = {**item, "image": img}
+                items.append(item)
+            message = {**message, "content": items}
+        capped.append(message)
+    return capped, scale
+
+def scale_detections(detections, scale):
+    """Map bbox_2d from VLM input coordinates back to the page, rounding outwards."""
+    sx, sy = scale
+    if (sx, sy) == (1.0, 1.0):
+        return detections
+    scaled = []
+    for det in detections:
+        box = det.get("bbox_2d")
+        if isinstance(box, (list, tuple)) and len(box) == 4:
+            x1, y1, x2, y2 = box
+            det = {**det, "bbox_2d": [
+                math.floor(min(x1, x2) * sx), math.floor(min(y1, y2) * sy),
+                math.ceil(max(x1, x2) * sx), math.ceil(max(y1, y2) * sy),
+            ]}
+        scaled.append(det)
+    return scaled
+
+# Tiled detection for oversized scans (engineering drawings, A3): pages whose
+# longer side exceeds TILE_SIZE pixels are split into overlapping square
+# tiles, detected as one batch, and the boxes are mapped back and merged.
+# Cost per tile stays bounded while small print keeps its resolution. The
+# overlap should exceed the tallest line of text, so every line lies whole
+# inside at least one tile. 0 = off.
+TILE_SIZE = int(os.environ.get("DOCSANCT_TILE_SIZE", "0"))
+TILE_OVERLAP = int(os.environ.get("DOCSANCT_TILE_OVERLAP", "128"))
+# Boxes from neighbouring tiles covering at least this share of the smaller
+# one are the same detection seen twice at a seam
+TILE_MERGE_OVERLAP = float(os.environ.get("DOCSANCT_TILE_MERGE_OVERLAP", "0.5"))
+
+def _tile_starts(length, tile, overlap):
+    if length <= tile:
+        return [0]
+    count = math.ceil((length - overlap) / (tile - overlap))
+    # Spread evenly so the last tile ends at the edge; overlaps only grow
+    return [round(i * (length - tile) / (count - 1)) for i in range(count)]
+
+def tile_boxes(size, tile_size=None, overlap=None):
+    """(x1, y1, x2, y2) tiles covering an image of *size*; one tile when it already fits."""
+    tile_size = TILE_SIZE if tile_size is None else tile_size
+    overlap = TILE_OVERLAP if overlap is None else overlap
+    width, height = size
+    if not tile_size or max(width, height) <= tile_size:
+        return [(0, 0, width, height)]
+    if not 0 <= overlap < tile_size:
+        raise ValueError(f"Tile overlap must be in [0, {tile_size}), got {overlap}")
+    return [(x, y, min(x + tile_size, width), min(y + tile_size, height))
+            for y in _tile_starts(height, tile_size, overlap)
+            for x in _tile_starts(width, tile_size, overlap)]
+
+def _with_image(msgs, img):
+    """Copy of *msgs* with its (first) page image replaced by *img*."""
+    replaced = []
+    for message in msgs:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = [{**item, "image": img}
+                       if isinstance(item, dict) and item.get("type") == "image" and isinstance(item.get("image"), Image.Image)
+                       else item for item in content]
+            message = {**message, "content": content}
+        replaced.append(message)
+    return replaced
+
+def _offset_detections(detections, tile):
+    x0, y0, x1, y1 = tile
+    moved = []
+    for det in detections:
+        box = det.get("bbox_2d")
+        if isinstance(box, (list, tuple)) and len(box) == 4:
+            # Clamp to the tile first: a box the model draws past the tile edge
+            # belongs to a neighbouring tile, which reports it itself
+            bx1, bx2 = sorted((min(max(box[0], 0), x1 - x0), min(max(box[2], 0), x1 - x0)))
+            by1, by2 = sorted((min(max(box[1], 0), y1 - y0), min(max(box[3], 0), y1 - y0)))
+            if bx1 == bx2 or by1 == by2:
+                continue   # entirely outside the tile
+            det = {**det, "bbox_2d": [bx1 + x0, by1 + y0, bx2 + x0, by2 + y0]}
+        moved.append(det)
+    return moved
+
+def merge_tile_detections(detections, min_overlap=None):
+    """
+    Non-max suppression across tiles, largest box first: a box overlapping a
+    kept one by at least *min_overlap* of the smaller box's area is a seam
+    duplicate. Rather than being dropped it is folded into the kept box (their
+    union), so a line clipped by one tile and whole in the next is still
+    covered end to end.
+    """
+    min_overlap = TILE_MERGE_OVERLAP if min_overlap is None else min_overlap
+    def area(b):
+        return max(0, b[2] - b[0]) * max(0, b[3] - b[1])
+    boxed, other_dets = [], []
+    for det in detections:
+        box = det.get("bbox_2d")
+        (boxed if isinstance(box, list) and len(box) == 4 else other_dets).append(det)
+    kept = []
+    for det in sorted(boxed, key=lambda d: area(d["bbox_2d"]), reverse=True):
+        box = det["bbox_2d"]
+        for k, other in enumerate(kept):
+            ob = other["bbox_2d"]
+            inter = area([max(box[0], ob[0]), max(box[1], ob[1]), min(box[2], ob[2]), min(box[3], ob[3])])
+            smaller = min(area(box), area(ob))
+            if inter and inter >= min_overlap * smaller:
+                kept[k] = {**other, "bbox_2d": [min(box[0], ob[0]), min(box[1], ob[1]),
+                                                max(box[2], ob[2]), max(box[3], ob[3])]}
+                break
+        else:
+            kept.append(det)
+    return kept + other_dets
+
+def inference_tiled(backend, msgs_list, batch_size=None, cache=None, tile_size=None, overlap=None):
+    """
+    inference_batch with oversized page images split per tile_boxes. All tiles
+    of all pages go to the detector together (so they share generate batches,
+    the detection cache and the VLM_MAX_PIXELS cap); results are aligned with
+    *msgs_list* and in page coordinates, with seam duplicates merged.
+    """
+    flat = []
+    spans = []   # (start, tiles) into flat, per conversation
+    for msgs in msgs_list:
+        img = _msgs_image(msgs)
+        tiles = tile_boxes(img.size, tile_size, overlap) if img is not None else [None]
+        spans.append((len(flat), tiles))
+        if len(tiles) == 1:
+            flat.append(msgs)
+        else:
+            flat.extend(_with_image(msgs, img.crop(tile)) for tile in tiles)
+    tiled = [len(tiles) for _, tiles in spans if len(tiles) > 1]
+    if tiled:
+        # Only tiles of split pages: pages sent whole aren't tiles
+        VLM_TILES.inc(sum(tiled))
+        logger.info("Tiled detection: %d of %d pages as %d tiles", len(tiled), len(msgs_list), sum(tiled))
+    detected = inference_batch(backend, flat, batch_size, cache)
+    results = []
+    for start, tiles in spans:
+        if len(tiles) == 1:
+            results.append(detected[start])
+            continue
+        with stage_timer("merge_tiles"):
+            boxes = [det for tile, dets in zip(tiles, detected[start:start + len(tiles)])
+                     for det in _offset_detections(dets, tile)]
+            results.append(merge_tile_detections(boxes))
+    return results
+
+def _msgs_image(msgs):
+    for message in msgs:
+        for item in message.get("content", []):
+            if isinstance(item, dict) and item.get("type") == "image" and isinstance(item.get("image"), Image.Image):
+                return item["image"]
+    return None
+
+def token_budget(msgs, max_new_tokens=None):
+    """
+    Token limit for one conversation: TOKEN_BUDGET_MIN plus TOKENS_PER_INK per
+    unit of ink coverage (fraction of dark pixels) of its page image, capped at
+    *max_new_tokens*. A blank page needs room for a handful of boxes; a dense
+    form, for dozens.
+    """
+    max_new_tokens = max_new_tokens or MAX_NEW_TOKENS
+    img = _msgs_image(msgs)
+    if img is None:
+        return max_new_tokens
+    # An 8x-reduced greyscale copy is plenty to estimate coverage
+    small = img.convert("L").reduce(8) if min(img.size) >= 64 else img.convert("L")
+    ink = float((np.asarray(small) < 128).mean())
+    return int(min(max_new_tokens, TOKEN_BUDGET_MIN + ink * TOKENS_PER_INK))
+
+def inference(backend, msgs, cache=None):
+  # Tiles of an oversized image share generate batches; one image is one call
+  return inference_tiled(backend, [msgs], cache=cache)[0]
+
+def inference_batch(backend, msgs_list, batch_size=None, cache=None):
+    """
+    Run detection for several conversations (e.g. one per PDF page), packing up
+    to *batch_size* of them into each padded generate call. The result list is
+    aligned with *msgs_list*: entry i holds the filtered boxes for msgs_list[i].
+
+    Requests already in the detection cache (same pixels, prompt and model)
+    skip the VLM. *cache* defaults to the shared on-disk cache; pass False to
+    bypass it. The cache holds every box the model returned; the PII label
+    filter is applied afterwards, so a changed label set takes effect on
+    cached pages too.
+
+    Images larger than VLM_MAX_PIXELS are downscaled before detection (and
+    before cache lookup, so the cache holds boxes for what the VLM saw); the
+    returned boxes are always in the original images' coordinates.
+    """
+    batch_size = max(1, batch_size or VLM_BATCH_SIZE)
+    msgs_list, scales = zip(*(_vlm_input_messages(msgs) for msgs in msgs_list)) if msgs_list else ((), ())
+    if cache is None:
+        cache = get_detection_cache()
+    results = [None] * len(msgs_list)
+    keys = [None] * len(msgs_list)
+    pending = []
+    duplicates = {}   # index -> earlier pending index with the same key
+    first_pending = {}
+    for i, msgs in enumerate(msgs_list):
+        if cache:
+            keys[i] = detection_key(msgs, backend.cache_id)
+            if keys[i] in first_pending:
+                # Identical page earlier in this same request: detect it only once
+                duplicates[i] = first_pending[keys[i]]
+                continue
+            results[i] = cache.get(keys[i])
+        if results[i] is None:
+            pending.append(i)
+            first_pending[keys[i]] = i
+    if cache and len(pending) < len(msgs_list):
+        logger.info("Detection cache: %d/%d pages reused", len(msgs_list) - len(pending), len(msgs_list))
+
+    for start in range(0, len(pending), batch_size):
+        chunk = pending[start:start + batch_size]
+        chunk_msgs = [msgs_list[i] for i in chunk]
+        budgets = [token_budget(msgs) for msgs in chunk_msgs] if ADAPTIVE_BUDGET else None
+        # Ask the detector backend for its raw replies (the backend owns prompt
+        # templating, vision preprocessing and generation)
+        with stage_timer("detect"):
+            outputs = backend.generate_batch(chunk_msgs, max_new_tokens=MAX_NEW_TOKENS, budgets=budgets)
+        for n, (i, output) in enumerate(zip(chunk, outputs)):
+            try:
+                with stage_timer("parse"):
+                    results[i] = parse_raw_detections(output)
+            except json.JSONDecodeError:
+                if budgets is None or budgets[n] >= MAX_NEW_TOKENS:
+                    raise
+                # Cut off by the adaptive budget mid-reply: never drop boxes,
+                # regenerate this page with the full limit instead
+                BUDGET_RETRIES.inc()
+                logger.info("Reply truncated at a %d-token budget; regenerating with %d", budgets[n], MAX_NEW_TOKENS)
+                with stage_timer("detect"):
+                    output = backend.generate(msgs_list[i], max_new_tokens=MAX_NEW_TOKENS)
+                results[i] = parse_raw_detections(output)
+            if cache:
+                cache.put(keys[i], results[i])
+    for i, j in duplicates.items():
+        results[i] = results[j]
+    return [scale_detections(PII_LABEL_FILTER.filter(result), scale) for result, scale in zip(results, scales)]
+
+def parse_raw_detections(output):
+  """Every detection in a raw model reply, before label filtering."""
+  logger.debug("RAW output:\n %s", output)
 
   # The above output will be in the following format
   # ```json
@@ -190,78 +422,164 @@ def inference(model, msgs):
       bounding_boxes = [bounding_boxes]
   elif not isinstance(bounding_boxes, list):
       bounding_boxes = []
-  # Filter for all relevant PII classes
-  pii_labels = {
-      'Names', 'address', 'date', 'signature', 'registration_number', 'other_sensitive_info',
-      'Bank Details', 'email address', 'phone number', 'credit card number', 'social security number',
-      'date of birth', 'patient_name', 'doctor_name', 'patient_disease', 'medical_condition',
-      'xray_scan_picture', 'sickness', 'medical_record_number', 'insurance_number', 'hospital_name',
-      'hospital_address', 'prescription', 'treatment_details', 'contact_info'
-  }
-  filtered_bboxes = [det for det in bounding_boxes if str(det.get('label', '')).strip().lower().replace(' ', '_') in {lbl.lower().replace(' ', '_') for lbl in pii_labels}]
-  print("Parsed bounding_boxes (filtered for PII):\n")
-  pprint.pprint(filtered_bboxes, indent=4)
+  return bounding_boxes
+
+def parse_detections(output):
+  # Filter for all relevant PII classes (labels normalised once, up front)
+  filtered_bboxes = PII_LABEL_FILTER.filter(parse_raw_detections(output))
+  logger.debug("Parsed bounding_boxes (filtered for PII): %s", filtered_bboxes)
   return filtered_bboxes
 
 ## Removed global test code and references to 'img'. Only functions for API/batch use remain.
-from pdf2image import convert_from_path
-from PyPDF2 import PdfReader, PdfWriter
-
-def redact_pdf_with_vlm(pdf_path, output_path, password="redacted123"):
-    # Convert PDF pages to images
-    pages = convert_from_path(pdf_path)
-    redacted_imgs = []
-    for page_img in pages:
-        # Run VLM model redaction (replace with your actual logic)
-        msgs = [
-            {
-                "role": "system",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": (
-                            "You are a document redaction detector. The format of your output must be a valid JSON object "
-                            "{'bbox_2d': [x1, y1, x2, y2], 'label': 'class'} "
-                            "where 'class' is from : 'Names', 'address', 'date', 'signature','registration_number','other_sensitive_info', 'Bank Details', 'email address',"
-                            "'phone number','credit card number','social security number','date of birth','address'."
-                        )
-                    }
-                ],
-            },
-            {
-                "role": "user",
-                "content": [
-                    {"type": "image", "image": page_img},
-                    {
-                        "type": "text",
-                        "text": (
-                            "Detect and return bounding boxes for every instance of private information in this image. "
-                            "This includes all 'Names', 'addresses', 'signatures', 'dates', 'registration numbers', 'Bank Details', 'email address', "
-                            "'phone number', 'credit card number', 'social security number', 'date of birth', 'address', and any other sensitive info. "
-                            "Do not skip any field. Return a list of all bounding boxes and their labels in valid JSON."
-                        )
-                    }
-                ],
-            }
-        ]
-        bounding_boxes = inference(model, msgs)
-        img_redacted = draw_bboxes(page_img.copy(), bounding_boxes)
-        redacted_imgs.append(img_redacted)
-    temp_pdf_path = output_path + ".temp.pdf"
-    redacted_imgs[0].save(temp_pdf_path, save_all=True, append_images=redacted_imgs[1:])
-    # Remove metadata and encrypt
-    reader = PdfReader(temp_pdf_path)
-    writer = PdfWriter()
-    for page in reader.pages:
-        writer.add_page(page)
-    writer.add_metadata({})
-    writer.encrypt(password)
-    with open(output_path, "wb") as f:
-        writer.write(f)
-    os.remove(temp_pdf_path)
-    print(f"Redacted, encrypted PDF saved to: {output_path}")
-
-def redact_image_with_vlm(img, output_path):
+from ai.pdf_stream import iter_pdf_windows, pdf_page_count, EncryptedPdfWriter
+from ai.text_layer import TEXT_LAYER_ENABLED, pages_with_images, text_layer_pages
+
+def pdf_page_messages(page_img):
+    """Chat messages asking the VLM for PII boxes on one PDF page."""
+    return [
+        {
+            "role": "system",
+            "content": [
+                {
+                    "type": "text",
+                    "text": (
+                        "You are a document redaction detector. The format of your output must be a valid JSON object "
+                        "{'bbox_2d': [x1, y1, x2, y2], 'label': 'class'} "
+                        "where 'class' is from : 'Names', 'address', 'date', 'signature','registration_number','other_sensitive_info', 'Bank Details', 'email address',"
+                        "'phone number','credit card number','social security number','date of birth','address'."
+                    )
+                }
+            ],
+        },
+        {
+            "role": "user",
+            "content": [
+                {"type": "image", "image": page_img},
+                {
+                    "type": "text",
+                    "text": (
+                        "Detect and return bounding boxes for every instance of private information in this image. "
+                        "This includes all 'Names', 'addresses', 'signatures', 'dates', 'registration numbers', 'Bank Details', 'email address', "
+                        "'phone number', 'credit card number', 'social security number', 'date of birth', 'address', and any other sensitive info. "
+                        "Do not skip any field. Return a list of all bounding boxes and their labels in valid JSON."
+                    )
+                }
+            ],
+        }
+    ]
+
+# Optional OCR/regex tier in front of the VLM (see redact_pdf_with_vlm)
+PREFILTER_ENABLED = os.environ.get("DOCSANCT_PREFILTER", "0") == "1"
+PREFILTER_THRESHOLD = int(os.environ.get("DOCSANCT_PREFILTER_THRESHOLD", "1"))
+
+def prefilter_page(page_img, threshold=None):
+    """
+    Cheap first detection tier: Tesseract OCR plus the regex patterns from
+    ai/redact_by_ocr.py. Returns (needs_vlm, candidate_count); pages with
+    fewer than *threshold* candidate tokens don't need the VLM.
+    """
+    # Imported here: the OCR module pulls in tesseract/cv2, which the plain
+    # VLM path doesn't need
+    from ai.redact_by_ocr import ocr_page, count_pii_candidates
+    threshold = PREFILTER_THRESHOLD if threshold is None else threshold
+    candidates = count_pii_candidates(ocr_page(page_img))
+    return candidates >= threshold, candidates
+
+def text_layer_prefilter(page, threshold=None):
+    """
+    The prefilter for a born-digital page, fed from its text layer instead
+    of OCR: the same patterns, counted over the page's exact words. Returns
+    (needs_vlm, candidate_count). The text layer only decides whether the
+    page goes to the VLM; the VLM still decides what to black out, since the
+    patterns match labels and value shapes, not the names and addresses
+    that follow a label.
+    """
+    from ai.redact_by_ocr import count_pii_candidates
+    threshold = PREFILTER_THRESHOLD if threshold is None else threshold
+    candidates = count_pii_candidates(page[2])
+    return candidates >= threshold, candidates
+
+def redact_pdf_with_vlm(pdf_path, output_path, password="redacted123", backend=None, batch_size=None, progress=None,
+                        prefilter=None, prefilter_threshold=None, text_layer=None):
+    """
+    Redact every page of *pdf_path* with the VLM and write an encrypted,
+    image-only PDF to *output_path*. *progress*, if given, is called as
+    progress(pages_done, pages_total) after each page.
+
+    With *prefilter* (default $DOCSANCT_PREFILTER), pages are OCR'd first
+    and only those with at least *prefilter_threshold* candidate PII tokens
+    go to the VLM. With *text_layer* (default $DOCSANCT_TEXT_LAYER) as well,
+    pages that have a text layer and no embedded images get the same test
+    from their words instead of OCR; pages that pass go to the VLM as usual,
+    the rest are left unredacted. Without *prefilter* every page goes to the
+    VLM, text layer or not. Returns one record per page saying which tier
+    decided:
+    {"page": n, "tier": "text" | "ocr" | "vlm", "candidates": count or None, "boxes": n}.
+    """
+    backend = backend or get_backend()
+    batch_size = max(1, batch_size or VLM_BATCH_SIZE)
+    prefilter = PREFILTER_ENABLED if prefilter is None else prefilter
+    text_layer = TEXT_LAYER_ENABLED if text_layer is None else text_layer
+    # The text layer only feeds the prefilter; don't read it for nothing
+    text_layer = text_layer and prefilter
+    image_pages = pages_with_images(pdf_path) if text_layer else set()
+    page_records = []
+    pages_total = pdf_page_count(pdf_path) if progress else None
+    # Render, detect, redact and append one window of pages at a time; the
+    # window doubles as the detection batch. Page images are freed window by
+    # window, but every compressed page stays in the sink's PdfWriter until
+    # it encrypts and writes the output on close, so memory grows with the
+    # length of the document (by its output size, not its pixels).
+    with EncryptedPdfWriter(output_path, password) as sink:
+        page_windows = iter_pdf_windows(pdf_path, window=batch_size)
+        while True:
+            with stage_timer("rasterize"):
+                page_window = next(page_windows, None)
+            if page_window is None:
+                break
+            records = []
+            text_pages = {}
+            if text_layer:
+                text_pages = text_layer_pages(pdf_path, page_window[0][0], page_window[-1][0], image_pages)
+            for page_num, page_img in page_window:
+                record = {"page": page_num, "tier": "vlm", "candidates": None}
+                if prefilter and page_num in text_pages:
+                    with stage_timer("text_layer"):
+                        needs_vlm, record["candidates"] = text_layer_prefilter(text_pages[page_num], prefilter_threshold)
+                    if not needs_vlm:
+                        record["tier"] = "text"
+                elif prefilter:
+                    with stage_timer("prefilter"):
+                        needs_vlm, record["candidates"] = prefilter_page(page_img, prefilter_threshold)
+                    if not needs_vlm:
+                        record["tier"] = "ocr"
+                records.append(record)
+            vlm_imgs = [page_img for (_, page_img), record in zip(page_window, records) if record["tier"] == "vlm"]
+            vlm_boxes = iter(inference_tiled(backend, [pdf_page_messages(page_img) for page_img in vlm_imgs], batch_size))
+            for (page_num, page_img), record in zip(page_window, records):
+                if record["tier"] == "vlm":
+                    bounding_boxes = next(vlm_boxes)
+                else:
+                    bounding_boxes = []
+                record["boxes"] = len(bounding_boxes)
+                with stage_timer("draw"):
+                    page_redacted = draw_bboxes(page_img, bounding_boxes)
+                with stage_timer("assemble"):
+                    sink.append(page_redacted)
+                PAGES_PROCESSED.labels(record["tier"]).inc()
+                if progress:
+                    progress(sink.pages, pages_total)
+            page_records.extend(records)
+        if not sink.pages:
+            raise ValueError(f"No pages rendered from PDF: {pdf_path}")
+    if prefilter:
+        skipped = sum(record["tier"] != "vlm" for record in page_records)
+        logger.info("Tiered detection: %d/%d pages decided without the VLM", skipped, len(page_records))
+    logger.info("Redacted, encrypted PDF saved to: %s", output_path)
+    return page_records
+
+def redact_image_with_vlm(img, output_path, backend=None):
+    backend = backend or get_backend()
     msgs = [
         {
             "role": "system",
@@ -296,7 +614,10 @@ def redact_image_with_vlm(img, output_path):
             ],
         }
     ]
-    bounding_boxes = inference(model, msgs)
-    img_redacted = draw_bboxes(img.copy(), bounding_boxes)
-    img_redacted.save(output_path)
-    print(f"Redacted image saved to: {output_path}")
\ No newline at end of file
+    bounding_boxes = inference(backend, msgs)
+    with stage_timer("draw"):
+        img_redacted = draw_bboxes(img, bounding_boxes)
+    with stage_timer("save"):
+        img_redacted.save(output_path)
+    PAGES_PROCESSED.labels("vlm").inc()
+    logger.info("Redacted image saved to: %s", output_path)
\ No newline at end of file
@@ -0,0 +1,122 @@
+# ── Standard library ────────────────────────────────────────────
+import os          # Env-var configuration
+import re          # Pattern compilation
+import json        # Optional pattern/label override file
+from bisect import bisect_right
+
+# PII patterns (expand as needed)
+PII_PATTERNS = [
+    r"account\s*number", r"acc\s*no", r"bank", r"ifsc", r"signature", r"address", r"name", r"email", r"phone", r"contact", r"code", r"pan", r"aadhaar", r"ssn", r"dob", r"date of birth"
+]
+
+# Value-shaped hints (emails, long digit runs, dates). Used to decide whether
+# a page (OCR'd or read from its text layer) is worth sending to the VLM.
+PII_VALUE_PATTERNS = [
+    r"[\w.+-]+@[\w-]+\.[\w.]+", r"\d{4,}", r"\d{1,4}[/.-]\d{1,2}[/.-]\d{2,4}"
+]
+
+# VLM labels that count as PII
+PII_LABELS = {
+    'Names', 'address', 'date', 'signature', 'registration_number', 'other_sensitive_info',
+    'Bank Details', 'email address', 'phone number', 'credit card number', 'social security number',
+    'date of birth', 'patient_name', 'doctor_name', 'patient_disease', 'medical_condition',
+    'xray_scan_picture', 'sickness', 'medical_record_number', 'insurance_number', 'hospital_name',
+    'hospital_address', 'prescription', 'treatment_details', 'contact_info'
+}
+
+# Optional JSON file overriding any of the above:
+# {"patterns": [...], "value_patterns": [...], "labels": [...]}
+PII_CONFIG_PATH = os.environ.get("DOCSANCT_PII_CONFIG")
+if PII_CONFIG_PATH:
+    with open(PII_CONFIG_PATH) as f:
+        _config = json.load(f)
+    PII_PATTERNS = _config.get("patterns", PII_PATTERNS)
+    PII_VALUE_PATTERNS = _config.get("value_patterns", PII_VALUE_PATTERNS)
+    PII_LABELS = set(_config.get("labels", PII_LABELS))
+
+
+def normalize_label(label):
+    return str(label).strip().lower().replace(' ', '_')
+
+
+class LabelFilter:
+    """Membership test for VLM labels, normalised once up front."""
+
+    def __init__(self, labels=None):
+        self.labels = frozenset(normalize_label(lbl) for lbl in (PII_LABELS if labels is None else labels))
+
+    def __contains__(self, label):
+        return normalize_label(label) in self.labels
+
+    def filter(self, detections):
+        return [det for det in detections if det.get('label', '') in self]
+
+
+def _group_lines(results):
+    """
+    Split tokens (in reading order) into lines. Uses the OCR 'line' key when
+    present; otherwise a token starts a new line when its vertical centre
+    falls outside the previous token's box.
+    """
+    lines = []
+    prev = None
+    for item in results:
+        if prev is None:
+            new_line = True
+        elif 'line' in item and 'line' in prev:
+            new_line = item['line'] != prev['line']
+        else:
+            cy = (item['bbox'][1] + item['bbox'][3]) / 2
+            new_line = not (prev['bbox'][1] <= cy <= prev['bbox'][3])
+        if new_line:
+            lines.append([])
+        lines[-1].append(item)
+        prev = item
+    return lines
+
+
+class PIIMatcher:
+    """
+    All patterns compiled into one case-insensitive alternation and run once
+    per text line, instead of once per pattern per token. Matches are mapped
+    back to the tokens (and so word boxes) they overlap, which also lets
+    multi-word patterns such as "account number" span tokens.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.regex = re.compile("|".join(f"(?:{p})" for p in self.patterns), re.IGNORECASE)
+
+    def matching_tokens(self, results):
+        """Tokens from *results* overlapped by any match, in their original order."""
+        matched = []
+        for line in _group_lines(results):
+            starts, ends = [], []
+            pos = 0
+            for item in line:
+                starts.append(pos)
+                pos += len(item['text'])
+                ends.append(pos)
+                pos += 1   # joining space
+            text = " ".join(item['text'] for item in line)
+            hit = [False] * len(line)
+            for m in self.regex.finditer(text):
+                # First token ending after the match start, through the last
+                # token starting before the match end
+                i = bisect_right(ends, m.start())
+                while i < len(line) and starts[i] < max(m.end(), m.start() + 1):
+                    hit[i] = True
+                    i += 1
+            matched.extend(item for item, is_hit in zip(line, hit) if is_hit)
+        return matched
+
+
+_matchers = {}
+
+
+def get_matcher(patterns):
+    """Compiled matcher for a pattern list, built once per distinct list."""
+    key = tuple(patterns)
+    if key not in _matchers:
+        _matchers[key] = PIIMatcher(key)
+    return _matchers[key]
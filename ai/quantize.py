@@ -0,0 +1,114 @@
+# ── Standard library ────────────────────────────────────────────
+import os          # Cache directory + env-var configuration
+import time        # Conversion timing
+import hashlib     # Cache file names
+import logging     # Conversion / cache tracing
+import tempfile    # Atomic writes (write temp file, then rename)
+import argparse    # One-time conversion CLI
+
+# torch is imported inside the functions, so importing this module (the
+# detector backend does) stays cheap.
+
+logger = logging.getLogger(__name__)
+
+# Quantized CPU inference for the detector. "int8" runs the language model's
+# linear layers with int8 weights and dynamically quantized activations
+# (torch dynamic quantization); "" keeps the checkpoint's dtype, FP32 on CPU.
+# The vision tower stays FP32 unless DOCSANCT_QUANTIZE_VISION=1: it is a
+# small share of the weights and the one that places the boxes.
+QUANTIZE = os.environ.get("DOCSANCT_QUANTIZE", "").lower()
+QUANTIZE_VISION = os.environ.get("DOCSANCT_QUANTIZE_VISION", "0") == "1"
+QUANT_CACHE_DIR = os.environ.get(
+    "DOCSANCT_QUANT_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "docsanct", "quantized"),
+)
+
+QUANTIZE_MODES = ("int8",)
+
+
+def _check_mode(mode):
+    if mode not in QUANTIZE_MODES:
+        raise ValueError(f"Unknown quantization mode: {mode!r} (choose from {', '.join(QUANTIZE_MODES)})")
+
+
+def quantized_cache_path(model_id, mode, quantize_vision=None):
+    """
+    Where the converted model for *model_id* is cached. The name covers
+    everything the pickled model depends on, so upgrading torch or
+    transformers converts again instead of unpickling a stale module.
+    """
+    import torch
+    import transformers
+    quantize_vision = QUANTIZE_VISION if quantize_vision is None else quantize_vision
+    key = f"{model_id}|{mode}|vision={int(quantize_vision)}|torch={torch.__version__}|transformers={transformers.__version__}"
+    name = f"{model_id.replace('/', '--')}-{mode}-{hashlib.sha256(key.encode()).hexdigest()[:16]}.pt"
+    return os.path.join(QUANT_CACHE_DIR, name)
+
+
+def quantize_model(model, mode="int8", quantize_vision=None):
+    """*model* with its linear layers dynamically quantized to int8 (in place)."""
+    import torch
+    from torch.ao.quantization import quantize_dynamic, default_dynamic_qconfig
+    _check_mode(mode)
+    quantize_vision = QUANTIZE_VISION if quantize_vision is None else quantize_vision
+    spec = {
+        name: default_dynamic_qconfig
+        for name, module in model.named_modules()
+        if isinstance(module, torch.nn.Linear) and (quantize_vision or "visual" not in name.split("."))
+    }
+    logger.info("Quantizing %d linear layers to %s", len(spec), mode)
+    return quantize_dynamic(model, qconfig_spec=spec, dtype=torch.qint8, inplace=True)
+
+
+def load_quantized(model_id, mode, load_fp32, quantize_vision=None):
+    """
+    The quantized model for *model_id*: unpickled from the on-disk cache when
+    a matching conversion exists, else built with *load_fp32()* (the FP32
+    model on CPU), quantized once and cached. Cache hits skip both the FP32
+    load and the conversion.
+    """
+    import torch
+    _check_mode(mode)
+    path = quantized_cache_path(model_id, mode, quantize_vision)
+    if os.path.exists(path):
+        start = time.perf_counter()
+        try:
+            # Only files this module wrote are loaded, hence weights_only=False
+            model = torch.load(path, weights_only=False)
+            logger.info("Loaded %s model from %s in %.1fs", mode, path, time.perf_counter() - start)
+            return model.eval()
+        except Exception:
+            logger.warning("Quantized model cache %s unreadable; converting again", path, exc_info=True)
+    start = time.perf_counter()
+    model = quantize_model(load_fp32().eval(), mode, quantize_vision)
+    logger.info("Converted %s to %s in %.1fs", model_id, mode, time.perf_counter() - start)
+    os.makedirs(QUANT_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=QUANT_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            torch.save(model, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    logger.info("Cached %s model at %s", mode, path)
+    return model
+
+
+def main():
+    # One-time conversion, e.g. while building the deploy image, so the
+    # first request doesn't pay for it:
+    #     python -m ai.quantize --mode int8
+    from ai.detector_backend import MODEL_ID, QwenVLBackend
+    parser = argparse.ArgumentParser(description="Convert the detector model and cache the result.")
+    parser.add_argument("--model-id", default=MODEL_ID)
+    parser.add_argument("--mode", default=QUANTIZE or "int8", choices=QUANTIZE_MODES)
+    args = parser.parse_args()
+    logging.basicConfig(level=os.environ.get("DOCSANCT_LOG_LEVEL", "INFO").upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    QwenVLBackend(args.model_id, quantize=args.mode).load()
+    print(quantized_cache_path(args.model_id, args.mode))
+
+
+if __name__ == "__main__":
+    main()
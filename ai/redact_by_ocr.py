@@ -4,14 +4,21 @@ from PIL import Image
 import requests
 import matplotlib.pyplot as plt
 import pytesseract
-from pdf2image import convert_from_path
+from ai.pdf_stream import iter_pdf_pages, pdf_page_count, render_pdf_page, EncryptedPdfWriter, PDF_DPI
+from ai.text_layer import TEXT_LAYER_ENABLED, pages_with_images, text_layer_pages, scale_words
+from ai.pii_matcher import PII_PATTERNS, PII_VALUE_PATTERNS, get_matcher
+from ai.redaction_render import render_redactions
 import os
 import re
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from PyPDF2 import PdfReader, PdfWriter
 
-# OCR for a single image (returns text and bounding boxes)
-def ocr_image(image_path):
-    img = Image.open(image_path)
+logger = logging.getLogger(__name__)
+
+# OCR one PIL image into [{'text': ..., 'bbox': [x1, y1, x2, y2]}, ...]
+def ocr_page(img):
     data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT)
     results = []
     for i in range(len(data['text'])):
@@ -20,27 +27,166 @@ def ocr_image(image_path):
             x, y, w, h = data['left'][i], data['top'][i], data['width'][i], data['height'][i]
             results.append({
                 'text': text,
-                'bbox': [x, y, x + w, y + h]
+                'bbox': [x, y, x + w, y + h],
+                # Tesseract's line identity, so matching can run per line
+                'line': (data['block_num'][i], data['par_num'][i], data['line_num'][i])
             })
     return results
 
+# OCR for a single image (returns text and bounding boxes)
+def ocr_image(image_path):
+    img = Image.open(image_path)
+    return ocr_page(img)
+
+# OCR one PDF page. With text_layer, a page that has a text layer and no
+# images is read from it directly, without rendering or Tesseract; word boxes
+# are scaled to the pixel grid the page is later rendered at.
+def ocr_pdf_page(pdf_path, page_num, text_layer=False, has_images=True):
+    if text_layer and not has_images:
+        text_pages = text_layer_pages(pdf_path, page_num, page_num, set())
+        if page_num in text_pages:
+            scale = PDF_DPI / 72.0
+            return scale_words(text_pages[page_num][2], scale, scale)
+    return ocr_page(render_pdf_page(pdf_path, page_num))
+
+# OCR a PDF page by page in this process; only the page being read is held
+# in memory. text_layer defaults to $DOCSANCT_TEXT_LAYER.
+def iter_ocr_pdf(pdf_path, text_layer=None):
+    text_layer = TEXT_LAYER_ENABLED if text_layer is None else text_layer
+    if not text_layer:
+        for page_num, page_img in iter_pdf_pages(pdf_path):
+            yield ocr_page(page_img)
+        return
+    image_pages = pages_with_images(pdf_path)
+    for page_num in range(1, pdf_page_count(pdf_path) + 1):
+        yield ocr_pdf_page(pdf_path, page_num, True, page_num in image_pages)
+
+# ── Parallel OCR ────────────────────────────────────────────────
+# Tesseract uses one core per call, so pages (and files) are spread over a
+# process pool. Each task renders its own page inside the worker: page
+# bitmaps never cross process boundaries and a worker holds one page at a
+# time. Workers are recycled every OCR_MAX_TASKS_PER_CHILD tasks to bound
+# their memory over long batches. DOCSANCT_OCR_WORKERS=1 runs serially,
+# in-process, for debugging.
+def _available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+OCR_WORKERS = int(os.environ.get("DOCSANCT_OCR_WORKERS", "0")) or _available_cores()
+OCR_MAX_TASKS_PER_CHILD = int(os.environ.get("DOCSANCT_OCR_MAX_TASKS_PER_CHILD", "100"))
+
+# One unit of OCR work: (path, page_num, text_layer, has_images); page_num is
+# None for image files
+def _ocr_task(task):
+    path, page_num, text_layer, has_images = task
+    try:
+        if page_num is None:
+            return ocr_image(path)
+        return ocr_pdf_page(path, page_num, text_layer, has_images)
+    except Exception as e:
+        # Re-raise as a plain error naming the file/page: some library
+        # exceptions (e.g. pytesseract's) can't be unpickled by the parent,
+        # which would otherwise surface as an opaque BrokenProcessPool
+        where = path if page_num is None else f"{path} page {page_num}"
+        raise RuntimeError(f"OCR failed for {where}: {e!r}") from None
+
+def _pdf_tasks(pdf_path, text_layer):
+    image_pages = pages_with_images(pdf_path) if text_layer else set()
+    return [
+        (pdf_path, page_num, text_layer, page_num in image_pages)
+        for page_num in range(1, pdf_page_count(pdf_path) + 1)
+    ]
+
+# Run OCR tasks on the pool; results come back in task order
+def run_ocr_tasks(tasks, workers=None):
+    workers = min(OCR_WORKERS if workers is None else workers, len(tasks))
+    if workers <= 1:
+        return [_ocr_task(task) for task in tasks]
+    logger.info("OCR: %d task(s) on %d worker processes", len(tasks), workers)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        max_tasks_per_child=OCR_MAX_TASKS_PER_CHILD,
+    ) as pool:
+        return list(pool.map(_ocr_task, tasks))
+
 # OCR for a PDF (returns list of results per page)
-def ocr_pdf(pdf_path):
-    pages = convert_from_path(pdf_path)
-    all_results = []
-    for page_num, page_img in enumerate(pages):
-        data = pytesseract.image_to_data(page_img, output_type=pytesseract.Output.DICT)
-        page_results = []
-        for i in range(len(data['text'])):
-            text = data['text'][i]
-            if text.strip():
-                x, y, w, h = data['left'][i], data['top'][i], data['width'][i], data['height'][i]
-                page_results.append({
-                    'text': text,
-                    'bbox': [x, y, x + w, y + h]
-                })
-        all_results.append(page_results)
-    return all_results
+def ocr_pdf(pdf_path, workers=None, text_layer=None):
+    text_layer = TEXT_LAYER_ENABLED if text_layer is None else text_layer
+    return run_ocr_tasks(_pdf_tasks(pdf_path, text_layer), workers)
+
+# OCR many PDFs and images on one shared pool, yielding (path, result, error)
+# for each file as soon as all of its pages are done, in completion order.
+# result is a list of per-page results for a PDF, a token list for an image.
+# A failing page fails only its own file (result None, error set): the other
+# files' pages keep running.
+def iter_ocr_files(paths, workers=None, text_layer=None):
+    text_layer = TEXT_LAYER_ENABLED if text_layer is None else text_layer
+    files = []   # (path, tasks) per file whose tasks could be listed
+    for path in paths:
+        try:
+            tasks = _pdf_tasks(path, text_layer) if path.lower().endswith('.pdf') else [(path, None, text_layer, True)]
+        except Exception as e:
+            yield path, None, e
+            continue
+        files.append((path, tasks))
+    task_count = sum(len(tasks) for _, tasks in files)
+    workers = min(OCR_WORKERS if workers is None else workers, task_count)
+    if workers <= 1:
+        for path, tasks in files:
+            try:
+                results = [_ocr_task(task) for task in tasks]
+            except Exception as e:
+                yield path, None, e
+                continue
+            yield path, _file_result(path, results), None
+        return
+    logger.info("OCR: %d task(s) from %d file(s) on %d worker processes", task_count, len(files), workers)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        max_tasks_per_child=OCR_MAX_TASKS_PER_CHILD,
+    ) as pool:
+        futures = {}   # future -> (file index, page slot)
+        for n, (_, tasks) in enumerate(files):
+            for slot, task in enumerate(tasks):
+                futures[pool.submit(_ocr_task, task)] = (n, slot)
+        pages = [[None] * len(tasks) for _, tasks in files]
+        remaining = [len(tasks) for _, tasks in files]
+        for future in as_completed(futures):
+            n, slot = futures[future]
+            if remaining[n] is None:
+                continue   # file already reported as failed
+            path = files[n][0]
+            try:
+                pages[n][slot] = future.result()
+            except Exception as e:
+                remaining[n] = None
+                for other, (m, _) in futures.items():
+                    if m == n:
+                        other.cancel()
+                yield path, None, e
+                continue
+            remaining[n] -= 1
+            if not remaining[n]:
+                yield path, _file_result(path, pages[n]), None
+                pages[n] = None
+
+def _file_result(path, results):
+    return results if path.lower().endswith('.pdf') else results[0]
+
+# OCR many PDFs and images on one shared pool. Returns one entry per path, in
+# order: a list of per-page results for a PDF, a token list for an image.
+# Raises the first file's error if any file fails.
+def ocr_files(paths, workers=None, text_layer=None):
+    done = {}
+    for path, result, error in iter_ocr_files(paths, workers, text_layer):
+        if error is not None:
+            raise error
+        done[path] = result
+    return [done[path] for path in paths]
 
 PDF_DIR = "/home/edwardeughenetimothy/Documents/RAW_DATA/REDACT_PDFs"
 IMG_DIR = "/home/edwardeughenetimothy/Documents/RAW_DATA/REDACT_PICs"
@@ -51,33 +197,30 @@ IMG_EXTS = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff'}
 
 os.makedirs(REDACTED_DIR, exist_ok=True)
 
-# Dummy redaction function (replace with your actual logic)
+# Black out bboxes with the shared renderer used by the VLM path too
 def redact_image(img, bboxes):
-    from PIL import ImageDraw
-    draw = ImageDraw.Draw(img)
-    for bbox in bboxes:
-        draw.rectangle(bbox, fill="black")
-    return img
-
-# PII patterns (expand as needed)
-PII_PATTERNS = [
-    r"account\s*number", r"acc\s*no", r"bank", r"ifsc", r"signature", r"address", r"name", r"email", r"phone", r"contact", r"code", r"pan", r"aadhaar", r"ssn", r"dob", r"date of birth"
-]
-
-# Filter OCR results for PII
-def filter_pii(results):
-    filtered = []
-    for item in results:
-        text = item['text'].lower()
-        if any(re.search(pattern, text) for pattern in PII_PATTERNS):
-            filtered.append(item)
-    return filtered
-
-# Remove metadata from image
+    return render_redactions(img, bboxes)
+
+# Filter OCR results for PII. Patterns (PII_PATTERNS / PII_VALUE_PATTERNS)
+# live in ai/pii_matcher.py and run as one compiled pass per text line.
+def filter_pii(results, patterns=None):
+    return get_matcher(PII_PATTERNS if patterns is None else patterns).matching_tokens(results)
+
+# OCR/text-layer tokens that look like PII (keyword or value-shaped)
+def filter_pii_candidates(results):
+    return filter_pii(results, PII_PATTERNS + PII_VALUE_PATTERNS)
+
+def count_pii_candidates(results):
+    return len(filter_pii_candidates(results))
+
+# Remove metadata from image. copy() duplicates the pixel buffer in C (no
+# per-pixel Python objects) and returns a plain Image, so format-specific
+# extras (PNG text chunks, cached EXIF) don't come along; info - EXIF, ICC
+# profile, XMP, DPI, comments - is then dropped. Palette and transparency
+# describe the pixels themselves and are kept.
 def remove_image_metadata(img):
-    data = list(img.getdata())
-    img_no_meta = Image.new(img.mode, img.size)
-    img_no_meta.putdata(data)
+    img_no_meta = img.copy()
+    img_no_meta.info = {k: v for k, v in img.info.items() if k == "transparency"}
     return img_no_meta
 
 # Remove metadata from PDF and encrypt
@@ -107,44 +250,55 @@ def save_redacted_image(img_path, bboxes):
 
 # Save redacted PDFs
 def save_redacted_pdf(pdf_path, all_bboxes, password="redacted123"):
-    pages = convert_from_path(pdf_path)
-    redacted_imgs = []
-    for page_img, bboxes in zip(pages, all_bboxes):
-        filtered_bboxes = [item['bbox'] for item in filter_pii(bboxes)]
-        img_redacted = redact_image(page_img, filtered_bboxes)
-        img_redacted = remove_image_metadata(img_redacted)
-        redacted_imgs.append(img_redacted)
     fname = os.path.basename(pdf_path)
-    temp_pdf_path = os.path.join(REDACTED_DIR, f"temp_redacted_{os.path.splitext(fname)[0]}.pdf")
     out_path = os.path.join(REDACTED_DIR, f"redacted_{os.path.splitext(fname)[0]}.pdf")
-    redacted_imgs[0].save(temp_pdf_path, save_all=True, append_images=redacted_imgs[1:])
-    remove_metadata_and_encrypt_pdf(temp_pdf_path, out_path, password)
-    os.remove(temp_pdf_path)
-
-# Process all PDFs in the directory
-def process_pdfs(pdf_dir):
-    for fname in os.listdir(pdf_dir):
-        if fname.lower().endswith('.pdf'):
-            pdf_path = os.path.join(pdf_dir, fname)
-            print(f"Processing PDF: {pdf_path}")
-            results = ocr_pdf(pdf_path)
-            for page_num, page_results in enumerate(results):
-                print(f"  Page {page_num+1} results:")
-                for item in page_results:
-                    print(f"    Text: {item['text']}, BBox: {item['bbox']}")
+    # Render and redact one page at a time, appending each to the encrypted,
+    # metadata-free output as it finishes
+    with EncryptedPdfWriter(out_path, password) as sink:
+        for (page_num, page_img), bboxes in zip(iter_pdf_pages(pdf_path), all_bboxes):
+            filtered_bboxes = [item['bbox'] for item in filter_pii(bboxes)]
+            img_redacted = redact_image(page_img, filtered_bboxes)
+            img_redacted = remove_image_metadata(img_redacted)
+            sink.append(img_redacted)
+    print(f"Saved encrypted PDF: {out_path}")
+
+# Process all PDFs in the directory (OCR for every page of every file shares
+# one process pool; see iter_ocr_files)
+def process_pdfs(pdf_dir, workers=None):
+    pdf_paths = [os.path.join(pdf_dir, fname) for fname in os.listdir(pdf_dir) if fname.lower().endswith('.pdf')]
+    # Each PDF is saved as soon as its pages are OCR'd; one that fails is
+    # logged and skipped instead of aborting the whole directory
+    for pdf_path, results, error in iter_ocr_files(pdf_paths, workers):
+        if error is not None:
+            logger.error("Skipping PDF %s: %s", pdf_path, error)
+            continue
+        print(f"Processing PDF: {pdf_path}")
+        for page_num, page_results in enumerate(results):
+            print(f"  Page {page_num+1} results:")
+            for item in page_results:
+                print(f"    Text: {item['text']}, BBox: {item['bbox']}")
+        try:
             save_redacted_pdf(pdf_path, results)
+        except Exception:
+            logger.exception("Could not save redacted PDF for %s", pdf_path)
 
 # Process all images in the directory
-def process_images(img_dir):
-    for fname in os.listdir(img_dir):
-        ext = os.path.splitext(fname)[1].lower()
-        if ext in IMG_EXTS:
-            img_path = os.path.join(img_dir, fname)
-            print(f"Processing Image: {img_path}")
-            results = ocr_image(img_path)
-            for item in results:
-                print(f"  Text: {item['text']}, BBox: {item['bbox']}")
+def process_images(img_dir, workers=None):
+    img_paths = [
+        os.path.join(img_dir, fname) for fname in os.listdir(img_dir)
+        if os.path.splitext(fname)[1].lower() in IMG_EXTS
+    ]
+    for img_path, results, error in iter_ocr_files(img_paths, workers):
+        if error is not None:
+            logger.error("Skipping image %s: %s", img_path, error)
+            continue
+        print(f"Processing Image: {img_path}")
+        for item in results:
+            print(f"  Text: {item['text']}, BBox: {item['bbox']}")
+        try:
             save_redacted_image(img_path, results)
+        except Exception:
+            logger.exception("Could not save redacted image for %s", img_path)
 
 # Example usage:
 if __name__ == "__main__":
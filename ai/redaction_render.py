@@ -0,0 +1,140 @@
+# ── Standard library ────────────────────────────────────────────
+import os          # Env-var configuration
+
+# ── Numerical computing ─────────────────────────────────────────
+import numpy as np  # Vectorised box normalisation
+
+# Boxes closer than this many pixels are merged into one region, which also
+# covers the gap between them
+MERGE_GAP = int(os.environ.get("DOCSANCT_REDACT_MERGE_GAP", "0"))
+
+# Fill values for modes whose "black" isn't all zeros (alpha / K channel last)
+_BLACK = {"RGBA": (0, 0, 0, 255), "LA": (0, 255), "CMYK": (0, 0, 0, 255)}
+
+
+def normalize_boxes(boxes, width, height):
+    """
+    Snap [x1, y1, x2, y2] boxes (any corner order, inclusive like
+    ImageDraw.rectangle) to clamped, half-open pixel rectangles. Returns an
+    (n, 4) int64 array; boxes with nothing on the page are dropped.
+    """
+    b = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    x1 = np.floor(np.minimum(b[:, 0], b[:, 2]))
+    y1 = np.floor(np.minimum(b[:, 1], b[:, 3]))
+    x2 = np.ceil(np.maximum(b[:, 0], b[:, 2])) + 1
+    y2 = np.ceil(np.maximum(b[:, 1], b[:, 3])) + 1
+    rects = np.stack([
+        np.clip(x1, 0, width), np.clip(y1, 0, height),
+        np.clip(x2, 0, width), np.clip(y2, 0, height),
+    ], axis=1).astype(np.int64)
+    keep = (rects[:, 0] < rects[:, 2]) & (rects[:, 1] < rects[:, 3])
+    return rects[keep]
+
+
+def _components(n, left, right):
+    """Connected-component label (the smallest member) of each of *n* nodes joined by *left*[k]-*right*[k] edges."""
+    root = np.arange(n)
+    while len(left):
+        # Hook both ends' roots to the smaller one, then jump every node to its root
+        rl, rr = root[left], root[right]
+        if (rl == rr).all():
+            break
+        low = np.minimum(rl, rr)
+        np.minimum.at(root, rl, low)
+        np.minimum.at(root, rr, low)
+        while True:
+            jumped = root[root]
+            if (jumped == root).all():
+                break
+            root = jumped
+    return root
+
+
+def coalesce_boxes(boxes, width, height, gap=None):
+    """
+    Normalise *boxes* and merge those that overlap or lie within *gap*
+    pixels of each other. Returns a list of (x1, y1, x2, y2) regions.
+
+    Sorted by y, each box is compared only with the boxes that start above
+    its bottom edge (a text line, in practice), and truly intersecting pairs
+    are joined into connected groups. A group becomes one region only if
+    its bounding rectangle is fully covered by its boxes (each grown by
+    *gap*); otherwise its boxes are kept as they are. Boxes inside another
+    are dropped. So the regions cover exactly the boxes plus, with *gap* >
+    0, the gaps between them: never a pixel outside both.
+    """
+    gap = MERGE_GAP if gap is None else gap
+    rects = normalize_boxes(boxes, width, height)
+    if len(rects) == 0:
+        return []
+    # Sort by y (then the rest, so duplicates end up adjacent) and dedupe
+    rects = rects[np.lexsort((rects[:, 3], rects[:, 2], rects[:, 0], rects[:, 1]))]
+    rects = rects[np.concatenate([[True], (rects[1:] != rects[:-1]).any(axis=1)])]
+    x1, y1, x2, y2 = rects.T
+
+    # Sweep (y), vectorised over offsets: box i can only meet boxes i+1 ..
+    # end[i] - 1, the ones starting above its bottom edge (+ gap)
+    end = np.searchsorted(y1, y2 + gap, side="left")
+    left, right = [], []
+    i = np.arange(len(rects))
+    for d in range(1, int((end - i).max())):
+        i = i[i + d < end[i]]
+        j = i + d
+        hit = (x1[j] < x2[i] + gap) & (x1[i] < x2[j] + gap)
+        left.append(i[hit])
+        right.append(j[hit])
+
+    left = np.concatenate(left) if left else np.zeros(0, dtype=np.int64)
+    right = np.concatenate(right) if right else np.zeros(0, dtype=np.int64)
+
+    # A box inside another one is never painted on its own; a contained box
+    # always intersects its container, so the pairs hold every such case
+    def inside(a, b):
+        return (x1[b] <= x1[a]) & (y1[b] <= y1[a]) & (x2[a] <= x2[b]) & (y2[a] <= y2[b])
+    nested = np.zeros(len(rects), dtype=bool)
+    nested[left[inside(left, right)]] = True
+    nested[right[inside(right, left)]] = True
+
+    root = _components(len(rects), left, right)
+    root[nested] = -1
+    size = np.bincount(root[~nested], minlength=len(rects))
+
+    # Lone boxes are regions as they are; only groups need the coverage check
+    regions = list(map(tuple, rects[~nested & (size[np.maximum(root, 0)] == 1)].tolist()))
+    groups = {}
+    for k in np.flatnonzero(~nested & (size[np.maximum(root, 0)] > 1)).tolist():
+        groups.setdefault(int(root[k]), []).append(rects[k].tolist())
+    for group in groups.values():
+        g = np.asarray(group)
+        gx1, gy1 = g[:, 0].min(), g[:, 1].min()
+        gx2, gy2 = g[:, 2].max(), g[:, 3].max()
+        covered = np.zeros((gy2 - gy1, gx2 - gx1), dtype=bool)
+        for bx1, by1, bx2, by2 in group:
+            covered[max(by1 - gap - gy1, 0):by2 + gap - gy1, max(bx1 - gap - gx1, 0):bx2 + gap - gx1] = True
+        if covered.all():
+            group = [[int(gx1), int(gy1), int(gx2), int(gy2)]]
+        regions.extend(map(tuple, group))
+    return regions
+
+
+def render_redactions(img, boxes, gap=None):
+    """
+    Return a redacted copy of *img* with *boxes* blacked out (*img* itself
+    is left untouched, so callers needn't copy it first). Boxes are
+    coalesced first, so duplicate and nested word boxes are painted once.
+
+    Regions are filled with Image.paste rather than NumPy slices: Pillow
+    keeps RGB pages 4 bytes per pixel internally, so a NumPy round trip
+    costs two full-page conversions, which was slower than the fills it
+    saves (see benchmarks/bench_render.py).
+    """
+    regions = coalesce_boxes(boxes, img.width, img.height, gap)
+    if img.mode in ("P", "PA"):
+        # Palette index 0 isn't necessarily black; flatten to RGB
+        img = img.convert("RGB")
+    else:
+        img = img.copy()
+    fill = _BLACK.get(img.mode, 0)
+    for region in regions:
+        img.paste(fill, region)
+    return img
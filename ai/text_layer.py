@@ -0,0 +1,82 @@
+# ── Standard library ────────────────────────────────────────────
+import os          # Env-var configuration
+import re          # Parse pdftotext's bbox XHTML
+import html        # Unescape word text (&amp; etc.)
+import subprocess  # poppler CLI tools (already required by pdf2image)
+
+# Born-digital PDFs carry an exact text layer. Reading words and glyph boxes
+# from it (poppler's `pdftotext -bbox`) is orders of magnitude cheaper than
+# OCR or the VLM, so pages that have text and no embedded images can be
+# screened from the text layer alone. Only used together with the prefilter.
+TEXT_LAYER_ENABLED = os.environ.get("DOCSANCT_TEXT_LAYER", "0") == "1"
+
+_PAGE_RE = re.compile(r'<page width="([\d.]+)" height="([\d.]+)">(.*?)</page>', re.DOTALL)
+_WORD_RE = re.compile(
+    r'<word xMin="([\d.-]+)" yMin="([\d.-]+)" xMax="([\d.-]+)" yMax="([\d.-]+)">(.*?)</word>',
+    re.DOTALL,
+)
+
+
+def extract_words(pdf_path, first_page, last_page):
+    """
+    Words of pages first_page..last_page (1-based, inclusive) from the PDF's
+    text layer. Returns {page_number: (width_pt, height_pt, words)} where each
+    word is {'text': ..., 'bbox': [x1, y1, x2, y2]} in PDF points, origin at
+    the top-left like the rendered page.
+    """
+    out = subprocess.run(
+        ["pdftotext", "-bbox", "-f", str(first_page), "-l", str(last_page), pdf_path, "-"],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    pages = {}
+    for offset, m in enumerate(_PAGE_RE.finditer(out)):
+        words = []
+        for x1, y1, x2, y2, text in _WORD_RE.findall(m.group(3)):
+            text = html.unescape(text)
+            if text.strip():
+                words.append({'text': text, 'bbox': [float(x1), float(y1), float(x2), float(y2)]})
+        pages[first_page + offset] = (float(m.group(1)), float(m.group(2)), words)
+    return pages
+
+
+def pages_with_images(pdf_path):
+    """Page numbers that draw at least one embedded image (`pdfimages -list`)."""
+    out = subprocess.run(
+        ["pdfimages", "-list", pdf_path],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    pages = set()
+    # Two header lines, then one row per image whose first column is the page
+    for line in out.splitlines()[2:]:
+        fields = line.split()
+        if fields and fields[0].isdigit():
+            pages.add(int(fields[0]))
+    return pages
+
+
+def scale_words(words, sx, sy):
+    """Map word boxes from PDF points to pixels of a page rendered at sx/sy px per pt."""
+    return [
+        {
+            'text': word['text'],
+            'bbox': [
+                int(word['bbox'][0] * sx), int(word['bbox'][1] * sy),
+                int(round(word['bbox'][2] * sx + 0.5)), int(round(word['bbox'][3] * sy + 0.5)),
+            ],
+        }
+        for word in words
+    ]
+
+
+def text_layer_pages(pdf_path, first_page, last_page, image_pages):
+    """
+    The subset of pages first_page..last_page that can skip rasterised
+    detection: they have text and draw no images. Returns the same mapping
+    as `extract_words`, restricted to those pages.
+    """
+    pages = extract_words(pdf_path, first_page, last_page)
+    return {
+        page_num: page
+        for page_num, page in pages.items()
+        if page[2] and page_num not in image_pages
+    }
@@ -1,47 +1,191 @@
-from fastapi import FastAPI, UploadFile, File
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
 import os
+import uuid
+import time
 import shutil
-from batch.batch_processing import batch_process_files, compress_to_zip
+import logging
+from batch.batch_processing import batch_process_files, compress_to_zip, process_and_redact_file, iter_zip_stream
+from ai.detector_backend import get_backend, warmup
+from ai.detection_cache import get_detection_cache
+from ai.inference_scheduler import scheduled_backend
+from batch.job_queue import JobQueue, COMPLETED
+from ai.metrics import render_metrics, stage_timer, CONTENT_TYPE, REQUEST_SECONDS, JOB_QUEUE_DEPTH
+from backend.redacted_files.process_memory import memory_report, update_memory_metrics
 
 app = FastAPI()
 
 UPLOAD_DIR = "/home/edwardeughenetimothy/Documents/RAW_DATA"
 REDACTED_DIR = "/home/edwardeughenetimothy/DocSanct-AI-Powered-Redaction-System/backend/redacted_files"
 ZIP_OUTPUT = os.path.join(REDACTED_DIR, "redacted_documents.zip")
+# Load the detector at startup instead of on the first /redact call
+WARMUP_ON_STARTUP = os.environ.get("DOCSANCT_WARMUP", "0") == "1"
 
-@app.post("/redact")
-def redact_files(documents: list[UploadFile] = File(...)):
-    print("/redact endpoint called. Number of files received:", len(documents))
-    try:
-        # Save uploaded files to appropriate directories
-        pdf_dir = os.path.join(UPLOAD_DIR, "REDACT_PDFs")
-        img_dir = os.path.join(UPLOAD_DIR, "REDACT_PICs")
-        os.makedirs(pdf_dir, exist_ok=True)
-        os.makedirs(img_dir, exist_ok=True)
-        uploaded_paths = []
+# Pipeline tracing goes through logging; raise to DEBUG for raw model output
+logging.basicConfig(
+    level=os.environ.get("DOCSANCT_LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Background redaction jobs (see /jobs endpoints). Job state is saved next
+# to each job's outputs, so with several workers (preload_server) a status
+# or result poll can land on any of them
+jobs = JobQueue(state_dir=os.path.join(REDACTED_DIR, "jobs"))
+JOB_QUEUE_DEPTH.set_function(jobs.depth)
+
+@app.on_event("startup")
+def load_detector():
+    if WARMUP_ON_STARTUP:
+        logger.info("Warming up detector backend...")
+        warmup()
+    jobs.start()
+
+@app.get("/health")
+def health():
+    backend = get_backend()
+    cache = get_detection_cache()
+    return {
+        "status": "ok",
+        "backend": backend.name,
+        "model_loaded": backend.loaded,
+        "detection_cache": cache.stats() if cache else None,
+    }
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition of the pipeline metrics."""
+    update_memory_metrics()
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+@app.get("/memory")
+def memory():
+    """Unique vs shared memory of this worker (and its siblings under the preload server), in bytes."""
+    return memory_report()
+
+def _save_uploads(documents, upload_dir):
+    os.makedirs(upload_dir, exist_ok=True)
+    uploaded_paths = []
+    with stage_timer("upload"):
         for file in documents:
-            ext = os.path.splitext(file.filename)[1].lower()
-            if ext == ".pdf":
-                out_path = os.path.join(pdf_dir, file.filename)
-            else:
-                out_path = os.path.join(img_dir, file.filename)
-            print(f"Saving file: {file.filename} to {out_path}")
+            out_path = os.path.join(upload_dir, os.path.basename(file.filename))
+            logger.info("Saving file: %s to %s", file.filename, out_path)
             with open(out_path, "wb") as f:
                 shutil.copyfileobj(file.file, f)
             uploaded_paths.append(out_path)
-        print("Running batch redaction only on uploaded files...")
-        from batch.batch_processing import process_and_redact_file, compress_to_zip
-        processed_files = [process_and_redact_file(path) for path in uploaded_paths]
-        print("Files processed:", processed_files)
-        print("Compressing to zip...")
-        compress_to_zip(processed_files, ZIP_OUTPUT)
-        print("Returning zip file:", ZIP_OUTPUT)
-        # Return the zip file
-        return FileResponse(ZIP_OUTPUT, media_type="application/zip", filename="redacted.zip")
+    return uploaded_paths
+
+def _tenant(request, key):
+    # Fairness key for the inference scheduler: an explicit X-Tenant header
+    # (the Django frontend sends the user or session), else the request or
+    # job's own key. Not the caller's address: behind the frontend proxy that
+    # is the same for everyone
+    return request.headers.get("X-Tenant") or key
+
+def _redacted_files(uploaded_paths, out_dir, backend=None):
+    """Redact uploads one by one, yielding (path, arcname) as each finishes."""
+    errors = []
+    for path in uploaded_paths:
+        try:
+            out_path = process_and_redact_file(path, backend=backend, out_dir=out_dir)
+        except Exception as e:
+            logger.exception("Redaction error for %s: %s", path, e)
+            errors.append(f"{os.path.basename(path)}: {e}")
+            continue
+        if not os.path.exists(out_path):
+            # Nothing went wrong, the file just isn't one we redact
+            logger.warning("Unsupported file type: %s", path)
+            errors.append(f"{os.path.basename(path)}: Unsupported file type")
+            continue
+        yield out_path, os.path.basename(out_path)
+    if errors:
+        # Headers are long gone by now; report failures inside the archive
+        errors_path = os.path.join(out_dir, "REDACTION_ERRORS.txt")
+        with open(errors_path, "w") as f:
+            f.write("\n".join(errors) + "\n")
+        yield errors_path, "REDACTION_ERRORS.txt"
+
+@app.post("/redact")
+def redact_files(request: Request, documents: list[UploadFile] = File(...)):
+    logger.info("/redact endpoint called. Number of files received: %d", len(documents))
+    started = time.perf_counter()
+    # Per-request upload and output directories: concurrent requests never
+    # see (or overwrite) each other's files or archives
+    request_key = uuid.uuid4().hex
+    upload_dir = os.path.join(UPLOAD_DIR, "requests", request_key)
+    out_dir = os.path.join(REDACTED_DIR, "requests", request_key)
+    try:
+        uploaded_paths = _save_uploads(documents, upload_dir)
+        os.makedirs(out_dir, exist_ok=True)
     except Exception as e:
-        import traceback
-        print("Redaction error:", e)
-        traceback.print_exc()
-        return {"error": str(e)}, 500
+        logger.exception("Redaction error: %s", e)
+        _cleanup(upload_dir, out_dir)
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    def stream():
+        # Files are redacted lazily as the archive is streamed, so the client
+        # receives the first entry while later files are still in progress
+        try:
+            # Pages are detected through the shared scheduler, batched with
+            # other in-flight requests
+            backend = scheduled_backend(_tenant(request, request_key))
+            yield from iter_zip_stream(_redacted_files(uploaded_paths, out_dir, backend))
+        finally:
+            _cleanup(upload_dir, out_dir)
+            REQUEST_SECONDS.labels("/redact").observe(time.perf_counter() - started)
+
+    logger.info("Streaming redacted zip...")
+    return StreamingResponse(
+        stream(),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="redacted.zip"'},
+        background=BackgroundTask(_cleanup, upload_dir, out_dir),
+    )
+
+def _cleanup(*dirs):
+    for path in dirs:
+        shutil.rmtree(path, ignore_errors=True)
+
+@app.post("/jobs", status_code=202)
+def submit_job(request: Request, documents: list[UploadFile] = File(...)):
+    """Queue uploaded files for redaction and return immediately with a job ID."""
+    logger.info("/jobs endpoint called. Number of files received: %d", len(documents))
+    # Each job gets its own upload and output directories so concurrent jobs
+    # with identically named files never collide
+    started = time.perf_counter()
+    job_key = uuid.uuid4().hex
+    upload_dir = os.path.join(UPLOAD_DIR, "jobs", job_key)
+    out_dir = os.path.join(REDACTED_DIR, "jobs", job_key)
+    try:
+        uploaded_paths = _save_uploads(documents, upload_dir)
+    except Exception:
+        # Don't leave a half-written upload behind
+        _cleanup(upload_dir)
+        raise
+    job = jobs.submit(uploaded_paths, out_dir, backend=scheduled_backend(_tenant(request, job_key)), upload_dir=upload_dir,
+                      job_id=job_key)
+    REQUEST_SECONDS.labels("/jobs").observe(time.perf_counter() - started)
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "result_url": f"/jobs/{job.id}/result",
+    }
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/result")
+def job_result(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    if job.status != COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return FileResponse(job.result_path, media_type="application/zip", filename="redacted.zip")
@@ -0,0 +1,176 @@
+"""
+Multi-worker serving with one copy of the detector weights.
+
+    python -m backend.redacted_files.preload_server --workers 4 --port 8001
+
+The parent process imports the app and loads the model once, then binds the
+port and forks the uvicorn workers. The workers inherit the weights as
+copy-on-write pages: tensor storage is never written during inference, so
+those pages stay shared and each extra worker costs only its own Python
+heap, activations and buffers. (Plain `uvicorn --workers N` spawns fresh
+interpreters, and each loads a full copy.) Workers that exit are re-forked
+from the parent, again without reloading.
+
+Fork-after-load needs the model on the CPU: a CUDA context does not survive
+fork(). On GPU nodes run one worker per device instead. With
+DOCSANCT_QUANTIZE the converted model must already be cached (run
+`python -m ai.quantize`): converting in the parent would start torch's
+thread pool before the fork.
+
+Background jobs (/jobs) save their state under REDACTED_DIR/jobs/<id>, so
+status and result requests work whichever worker they reach; the job runs
+on the worker that accepted it.
+
+Per-process memory (unique vs shared, from /proc/<pid>/smaps_rollup) is
+logged after start-up and every --report-interval seconds, and served by each
+worker at GET /memory and in /metrics.
+"""
+import gc
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+import argparse
+
+from backend.redacted_files.process_memory import memory_report
+
+logger = logging.getLogger(__name__)
+
+
+def _log_memory():
+    report = memory_report()
+    mb = 1024 * 1024
+    for p in report["processes"]:
+        logger.info("  pid %-7d %-6s  rss %7.0f MB  pss %7.0f MB  unique %7.0f MB  shared %7.0f MB",
+                    p["pid"], p["role"], p["rss"] / mb, p["pss"] / mb, p["unique"] / mb, p["shared"] / mb)
+    logger.info("  total pss %.0f MB (rss would sum to %.0f MB)", report["total_pss"] / mb, report["total_rss"] / mb)
+
+
+def _check_cpu(backend):
+    model = getattr(backend, "model", None)
+    device = getattr(model, "device", None)
+    if device is not None and getattr(device, "type", "cpu") != "cpu":
+        raise RuntimeError(f"Model is on {device}: fork-after-load only works for CPU models; "
+                           "run one uvicorn process per GPU instead")
+
+
+def _check_quantized(backend):
+    # Converting runs torch kernels in the parent, which starts torch's
+    # OpenMP pool; a forked child inheriting that pool can hang in its first
+    # parallel op. A cached conversion is only unpickled, so require one
+    quantize = getattr(backend, "quantize", None)
+    if not quantize:
+        return
+    from ai.quantize import quantized_cache_path
+    path = quantized_cache_path(backend.model_id, quantize, getattr(backend, "quantize_vision", None))
+    if not os.path.exists(path):
+        raise RuntimeError(f"DOCSANCT_QUANTIZE={quantize} needs the converted model cached before forking "
+                           f"(not found: {path}); run `python -m ai.quantize --mode {quantize}` first")
+
+
+def _serve(app, sock, args):
+    # Worker process: plain uvicorn on the inherited listening socket
+    import uvicorn
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level=args.log_level, timeout_keep_alive=args.keep_alive)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(app, sock, args):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _serve(app, sock, args)
+        except BaseException:
+            logger.exception("Worker %d crashed", os.getpid())
+            code = 1
+        finally:
+            # Skip the parent's atexit handlers and buffered state
+            os._exit(code)
+    logger.info("Forked worker %d", pid)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("DOCSANCT_WORKERS", "2")))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--log-level", default=os.environ.get("DOCSANCT_LOG_LEVEL", "INFO").lower())
+    parser.add_argument("--report-interval", type=float, default=0,
+                        help="log per-process memory every N seconds (0 = only after start-up)")
+    args = parser.parse_args()
+
+    os.environ["DOCSANCT_PRELOAD_PARENT"] = str(os.getpid())
+    # Importing the app configures logging; the detector is loaded here, once
+    from backend.redacted_files.back_end import app
+    from ai.detector_backend import get_backend
+    backend = get_backend()
+    _check_quantized(backend)
+    logger.info("Loading detector backend %r before forking %d workers...", backend.name, args.workers)
+    # load(), not warmup(): the parent never runs inference, so no compute
+    # thread pools exist to be broken by fork. Workers warm up at startup
+    # with DOCSANCT_WARMUP=1, else on their first request
+    backend.load()
+    _check_cpu(backend)
+    # Move everything allocated so far out of the cyclic GC's reach: a
+    # collection in a worker would otherwise write to (and so un-share) the
+    # headers of every inherited object
+    gc.collect()
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET6 if ":" in args.host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(args.backlog)
+    sock.set_inheritable(True)
+
+    workers = set()
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(args.workers):
+        workers.add(_spawn(app, sock, args))
+    logger.info("Serving on %s:%d with %d workers", args.host, args.port, args.workers)
+
+    next_report = time.monotonic() + 10   # once workers have imported and warmed up
+    reported = False
+    while workers:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            workers.discard(pid)
+            if not stopping:
+                logger.warning("Worker %d exited (code %d); forking a replacement", pid, os.waitstatus_to_exitcode(status))
+                workers.add(_spawn(app, sock, args))
+            continue
+        if not stopping and time.monotonic() >= next_report and (args.report_interval or not reported):
+            logger.info("Memory per process:")
+            _log_memory()
+            reported = True
+            next_report = time.monotonic() + (args.report_interval or 0)
+        time.sleep(0.5)
+    sock.close()
+    logger.info("All workers stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
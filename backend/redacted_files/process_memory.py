@@ -0,0 +1,77 @@
+"""
+Unique vs shared memory per server process, from /proc/<pid>/smaps_rollup.
+Under the preload server (see preload_server.py) the report covers the
+parent holding the model and every worker forked from it.
+"""
+import os
+
+from ai.metrics import Gauge
+
+PROCESS_MEMORY = Gauge(
+    "docsanct_process_memory_bytes",
+    "Memory of this server process: rss, pss (shared pages split between their users), unique and shared.",
+    ["kind"])
+
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Swap")
+
+
+def process_memory(pid="self"):
+    """
+    {"rss", "pss", "unique", "shared"} in bytes for *pid*. Unique pages
+    (Private_*) are freed if the process exits; shared ones are also mapped
+    by another process, e.g. inherited model weights. None off Linux.
+    """
+    fields = dict.fromkeys(SMAPS_FIELDS, 0)
+    try:
+        path = f"/proc/{pid}/smaps_rollup"
+        if not os.path.exists(path):
+            path = f"/proc/{pid}/smaps"   # kernels before 4.14: sum every mapping
+        with open(path) as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in fields:
+                    fields[name] += int(value.split()[0]) * 1024
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        return None
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "unique": fields["Private_Clean"] + fields["Private_Dirty"],
+        "shared": fields["Shared_Clean"] + fields["Shared_Dirty"],
+    }
+
+
+def _children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+def memory_report():
+    """
+    Memory of this process and, under the preload server, of the parent and
+    every sibling worker. The PSS total is the real footprint of the group;
+    the RSS total is what it would be if nothing were shared.
+    """
+    parent = int(os.environ.get("DOCSANCT_PRELOAD_PARENT", "0"))
+    pids = [parent] + _children(parent) if parent else [os.getpid()]
+    processes = []
+    for pid in pids:
+        memory = process_memory(pid)
+        if memory is not None:
+            role = "parent" if pid == parent else "worker"
+            processes.append({"pid": pid, "role": role, "self": pid == os.getpid(), **memory})
+    return {
+        "processes": processes,
+        "total_pss": sum(p["pss"] for p in processes),
+        "total_rss": sum(p["rss"] for p in processes),
+    }
+
+
+def update_memory_metrics():
+    """Refresh the docsanct_process_memory_bytes gauges for this process (call before rendering /metrics)."""
+    memory = process_memory()
+    for kind, value in (memory or {}).items():
+        PROCESS_MEMORY.labels(kind).set(value)
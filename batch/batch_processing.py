@@ -1,7 +1,11 @@
+import io
 import os
 import shutil
+import logging
 import zipfile
-from ai.pii_detection import redact_pdf_with_vlm, inference, draw_bboxes, model
+from ai.pii_detection import redact_pdf_with_vlm, inference, draw_bboxes
+from ai.detector_backend import get_backend
+from ai.metrics import stage_timer, FILE_SECONDS, FILES_PROCESSED, PAGES_PROCESSED
 from PIL import Image
 
 UPLOAD_DIR = "/home/edwardeughenetimothy/Documents/RAW_DATA"
@@ -11,17 +15,35 @@ ZIP_OUTPUT = os.path.join(REDACTED_DIR, "redacted_documents.zip")
 IMG_EXTS = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff'}
 PDF_EXT = '.pdf'
 
+logger = logging.getLogger(__name__)
+
 os.makedirs(REDACTED_DIR, exist_ok=True)
 
-def process_and_redact_file(file_path):
+def process_and_redact_file(file_path, backend=None, out_dir=None, progress=None):
+    """Redact one upload, recording its wall time and outcome in the metrics."""
+    ext = os.path.splitext(file_path)[1].lower()
+    kind = "image" if ext in IMG_EXTS else "pdf" if ext == PDF_EXT else "unsupported"
+    try:
+        with FILE_SECONDS.labels(kind).time():
+            out_path = _redact_file(file_path, backend, out_dir, progress)
+    except Exception:
+        FILES_PROCESSED.labels(kind, "failed").inc()
+        raise
+    FILES_PROCESSED.labels(kind, "skipped" if kind == "unsupported" else "ok").inc()
+    return out_path
+
+def _redact_file(file_path, backend, out_dir, progress):
+    backend = backend or get_backend()
     ext = os.path.splitext(file_path)[1].lower()
     fname = os.path.basename(file_path)
-    out_path = os.path.join(REDACTED_DIR, f"redacted_{fname}")
-    print(f"Processing file: {file_path} (ext: {ext})")
+    out_path = os.path.join(out_dir or REDACTED_DIR, f"redacted_{fname}")
+    logger.info("Processing file: %s (ext: %s)", file_path, ext)
     if ext in IMG_EXTS:
-        print(f"Opening image: {file_path}")
-        img = Image.open(file_path)
-        print("Preparing VLM messages...")
+        logger.info("Opening image: %s", file_path)
+        with stage_timer("decode"):
+            img = Image.open(file_path)
+            img.load()
+        logger.debug("Preparing VLM messages...")
         msgs = [
             {
                 "role": "system",
@@ -56,43 +78,111 @@ def process_and_redact_file(file_path):
                 ],
             }
         ]
-        print("Running VLM inference...")
-        bounding_boxes = inference(model, msgs)
-        print("Bounding boxes:", bounding_boxes)
-        print("Drawing bboxes and saving redacted image...")
-        img_redacted = draw_bboxes(img.copy(), bounding_boxes)
-        img_redacted.save(out_path)
+        logger.debug("Running VLM inference...")
+        bounding_boxes = inference(backend, msgs)
+        logger.debug("Bounding boxes: %s", bounding_boxes)
+        with stage_timer("draw"):
+            img_redacted = draw_bboxes(img, bounding_boxes)
+        with stage_timer("save"):
+            img_redacted.save(out_path)
+        PAGES_PROCESSED.labels("vlm").inc()
+        if progress:
+            progress(1, 1)
     elif ext == PDF_EXT:
-        print(f"Redacting PDF: {file_path}")
-        redact_pdf_with_vlm(file_path, out_path, password="redacted123")
+        logger.info("Redacting PDF: %s", file_path)
+        redact_pdf_with_vlm(file_path, out_path, password="redacted123", backend=backend, progress=progress)
     else:
-        print(f"Unsupported file type: {file_path}")
-    print(f"Processed and saved: {out_path}")
+        logger.warning("Unsupported file type: %s", file_path)
+    logger.info("Processed and saved: %s", out_path)
     return out_path
 
-def batch_process_files(upload_dir):
+def batch_process_files(upload_dir, backend=None):
+    backend = backend or get_backend()
     processed_files = []
     for subdir in ["REDACT_PDFs", "REDACT_PICs"]:
         dir_path = os.path.join(upload_dir, subdir)
-        print(f"Checking directory: {dir_path}")
+        logger.info("Checking directory: %s", dir_path)
         if not os.path.exists(dir_path):
-            print(f"Directory does not exist: {dir_path}")
+            logger.warning("Directory does not exist: %s", dir_path)
             continue
         files = os.listdir(dir_path)
         if not files:
-            print(f"No files found in: {dir_path}")
+            logger.info("No files found in: %s", dir_path)
             continue
         for fname in files:
             file_path = os.path.join(dir_path, fname)
-            print(f"Processing file in batch: {file_path}")
-            processed = process_and_redact_file(file_path)
+            logger.info("Processing file in batch: %s", file_path)
+            processed = process_and_redact_file(file_path, backend=backend)
             processed_files.append(processed)
     return processed_files
 
+# Already-compressed formats are stored as-is; deflating them again costs CPU
+# for no size gain
+STORED_EXTS = {'.pdf', '.jpg', '.jpeg', '.png', '.zip'}
+ZIP_CHUNK_SIZE = 1 << 16
+
+def _zip_compress_type(path):
+    ext = os.path.splitext(path)[1].lower()
+    return zipfile.ZIP_STORED if ext in STORED_EXTS else zipfile.ZIP_DEFLATED
+
 def compress_to_zip(file_list, zip_path):
-    with zipfile.ZipFile(zip_path, 'w') as zipf:
+    with stage_timer("zip"), zipfile.ZipFile(zip_path, 'w') as zipf:
         for file in file_list:
-            zipf.write(file, os.path.basename(file))
-    print(f"All redacted files compressed to: {zip_path}")
+            zipf.write(file, os.path.basename(file), compress_type=_zip_compress_type(file))
+    logger.info("All redacted files compressed to: %s", zip_path)
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """
+    Write-only, non-seekable sink for ZipFile. Being unseekable makes
+    ZipFile write sizes/CRCs in data descriptors after each entry instead
+    of seeking back, so the archive can be emitted front to back.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def iter_zip_stream(file_iter):
+    """
+    Yield a ZIP archive as byte chunks while it is being built. *file_iter*
+    yields (path, arcname) pairs and may be lazy (e.g. files are redacted as
+    the archive streams), so the first bytes go out as soon as the first
+    file is ready and nothing is staged on disk.
+    """
+    buf = _ZipStreamBuffer()
+    with zipfile.ZipFile(buf, 'w') as zipf:
+        for path, arcname in file_iter:
+            zinfo = zipfile.ZipInfo.from_file(path, arcname)
+            zinfo.compress_type = _zip_compress_type(path)
+            with open(path, 'rb') as src, zipf.open(zinfo, 'w') as dst:
+                while True:
+                    chunk = src.read(ZIP_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    data = buf.drain()
+                    if data:
+                        yield data
+            data = buf.drain()
+            if data:
+                yield data
+    # Central directory, written on close
+    yield buf.drain()
 
 ## Removed local test code. Redaction now only runs via FastAPI endpoint and processes uploaded files.
@@ -0,0 +1,254 @@
+"""
+Resumable batch redaction over a directory tree.
+
+    python -m batch.batch_runner INPUT_DIR OUTPUT_DIR            # one pass, then exit
+    python -m batch.batch_runner INPUT_DIR OUTPUT_DIR --watch    # keep picking up new files
+
+Every supported file under INPUT_DIR is redacted into the same relative
+location under OUTPUT_DIR. Progress is recorded in a manifest (by default
+OUTPUT_DIR/manifest.jsonl): per file, its content hash, status and output
+path. A rerun skips files that completed with the same content, so an
+interrupted run resumes where it stopped and nightly runs only do new or
+changed work. Files that failed are retried once their content changes, or
+on every run with --retry-failed.
+"""
+import os
+import sys
+import json
+import time
+import fcntl
+import signal
+import hashlib
+import logging
+import argparse
+
+from batch.batch_processing import process_and_redact_file, IMG_EXTS, PDF_EXT
+
+MANIFEST_NAME = "manifest.jsonl"
+HASH_CHUNK_SIZE = 1 << 20
+# Watch mode: seconds between scans, and how long a file must sit unmodified
+# before it is picked up (so half-copied uploads are left alone)
+WATCH_INTERVAL = float(os.environ.get("DOCSANCT_WATCH_INTERVAL", "10"))
+SETTLE_SECONDS = float(os.environ.get("DOCSANCT_WATCH_SETTLE", "5"))
+
+RUNNING, COMPLETED, FAILED = "running", "completed", "failed"
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Manifest:
+    """
+    Per-file state of a batch run, keyed by path relative to the input
+    directory. Stored as an append-only JSON-lines log (the latest record
+    for a path wins), so recording a status change costs one small write
+    however many files the run has, and a crash mid-write loses at most the
+    torn last line. The log is compacted to one line per file on open.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock_file = open(path + ".lock", "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            raise RuntimeError(f"Manifest {path} is in use by another batch run")
+        self._load()
+        self._compact()
+        self._log = open(path, "a")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Skipping torn manifest line in %s", self.path)
+                    continue
+                self.entries[entry["path"]] = entry
+
+    def _compact(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def get(self, rel_path):
+        return self.entries.get(rel_path)
+
+    def update(self, rel_path, **fields):
+        entry = {**self.entries.get(rel_path, {"path": rel_path}), **fields, "updated": time.time()}
+        self.entries[rel_path] = entry
+        self._log.write(json.dumps(entry) + "\n")
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        return entry
+
+    def close(self):
+        self._log.close()
+        self._lock_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_input_files(input_dir, exclude_dir=None):
+    """Supported files under *input_dir*, as paths relative to it, in a stable order."""
+    exclude_dir = os.path.realpath(exclude_dir) if exclude_dir else None
+    for root, dirs, files in os.walk(input_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.realpath(os.path.join(root, d)) != exclude_dir)
+        for fname in sorted(files):
+            ext = os.path.splitext(fname)[1].lower()
+            if ext in IMG_EXTS or ext == PDF_EXT:
+                yield os.path.relpath(os.path.join(root, fname), input_dir)
+
+
+class BatchRunner:
+    """
+    Redacts every new or changed file under *input_dir* into *output_dir*,
+    recording each step in *manifest*. Content is re-hashed only when a
+    file's size or mtime differs from what the manifest saw last time.
+    """
+
+    def __init__(self, input_dir, output_dir, manifest, backend=None, process_file=process_and_redact_file,
+                 retry_failed=False, settle_seconds=0):
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.manifest = manifest
+        self.backend = backend
+        self.process_file = process_file
+        self.retry_failed = retry_failed
+        self.settle_seconds = settle_seconds
+
+    def _content_hash(self, rel_path, stat):
+        entry = self.manifest.get(rel_path)
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return entry["sha256"]
+        return file_sha256(os.path.join(self.input_dir, rel_path))
+
+    def _needs_run(self, entry, sha256):
+        if not entry or entry.get("sha256") != sha256:
+            return True
+        if entry["status"] == COMPLETED:
+            # Output deleted since: redo it
+            return not os.path.exists(os.path.join(self.output_dir, entry["output"]))
+        if entry["status"] == FAILED:
+            return self.retry_failed
+        # running: a previous run stopped before finishing this file
+        return True
+
+    def pending(self):
+        """(rel_path, sha256, stat) of files that need redacting, in order."""
+        now = time.time()
+        for rel_path in iter_input_files(self.input_dir, exclude_dir=self.output_dir):
+            try:
+                stat = os.stat(os.path.join(self.input_dir, rel_path))
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime < self.settle_seconds:
+                continue
+            sha256 = self._content_hash(rel_path, stat)
+            if self._needs_run(self.manifest.get(rel_path), sha256):
+                yield rel_path, sha256, stat
+
+    def run_once(self, stop=lambda: False):
+        """Redact everything pending, until *stop()* is true; returns (completed, failed) counts."""
+        completed = failed = 0
+        for rel_path, sha256, stat in self.pending():
+            if stop():
+                break
+            src = os.path.join(self.input_dir, rel_path)
+            out_dir = os.path.join(self.output_dir, os.path.dirname(rel_path))
+            os.makedirs(out_dir, exist_ok=True)
+            self.manifest.update(rel_path, sha256=sha256, size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+                                 status=RUNNING, output=None, error=None, pages=None, seconds=None)
+            progress = {}
+            start = time.perf_counter()
+            try:
+                out_path = self.process_file(src, backend=self.backend, out_dir=out_dir,
+                                             progress=lambda done, total: progress.update(pages=done))
+            except Exception as e:
+                logger.exception("Failed to redact %s", src)
+                self.manifest.update(rel_path, status=FAILED, error=f"{type(e).__name__}: {e}",
+                                     seconds=round(time.perf_counter() - start, 3))
+                failed += 1
+                continue
+            self.manifest.update(rel_path, status=COMPLETED, output=os.path.relpath(out_path, self.output_dir),
+                                 pages=progress.get("pages"), seconds=round(time.perf_counter() - start, 3))
+            completed += 1
+            logger.info("Redacted %s -> %s", rel_path, out_path)
+        return completed, failed
+
+    def summary(self):
+        counts = {}
+        for entry in self.manifest.entries.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return counts
+
+    def watch(self, interval=WATCH_INTERVAL, stop=lambda: False):
+        """Scan every *interval* seconds until *stop()* is true."""
+        while not stop():
+            completed, failed = self.run_once(stop)
+            if completed or failed:
+                logger.info("Watch pass: %d redacted, %d failed", completed, failed)
+            deadline = time.monotonic() + interval
+            while not stop() and time.monotonic() < deadline:
+                time.sleep(min(1.0, interval))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--manifest", help=f"manifest path (default OUTPUT_DIR/{MANIFEST_NAME})")
+    parser.add_argument("--backend", help="detector backend name (default $DOCSANCT_BACKEND)")
+    parser.add_argument("--retry-failed", action="store_true", help="retry files that failed before, even if unchanged")
+    parser.add_argument("--watch", action="store_true", help="keep scanning INPUT_DIR for new or changed files")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL, help="seconds between watch scans")
+    parser.add_argument("--settle", type=float, default=SETTLE_SECONDS,
+                        help="watch mode: skip files modified less than this many seconds ago")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=os.environ.get("DOCSANCT_LOG_LEVEL", "INFO").upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    from ai.detector_backend import get_backend
+    os.makedirs(args.output_dir, exist_ok=True)
+    stopping = []
+    # SIGTERM finishes the current file, then stops; Ctrl-C stops at once and
+    # that file is redone next run. Either way the manifest says where to resume
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    with Manifest(args.manifest or os.path.join(args.output_dir, MANIFEST_NAME)) as manifest:
+        runner = BatchRunner(args.input_dir, args.output_dir, manifest, backend=get_backend(args.backend),
+                             retry_failed=args.retry_failed, settle_seconds=args.settle if args.watch else 0)
+        try:
+            if args.watch:
+                logger.info("Watching %s every %.0fs", args.input_dir, args.interval)
+                runner.watch(args.interval, stop=lambda: bool(stopping))
+            else:
+                completed, failed = runner.run_once(stop=lambda: bool(stopping))
+                logger.info("Batch run: %d redacted, %d failed", completed, failed)
+        except KeyboardInterrupt:
+            logger.info("Interrupted; rerun to resume")
+        logger.info("Manifest: %s", ", ".join(f"{n} {status}" for status, n in sorted(runner.summary().items())))
+        return 1 if runner.summary().get(FAILED) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import uuid
+import queue
+import shutil
+import logging
+import threading
+from batch.batch_processing import process_and_redact_file, compress_to_zip
+
+# Redaction jobs run on a small in-process worker pool. There is no external
+# broker: jobs live in memory and are lost on restart. With a state_dir,
+# each job's status is also written to <state_dir>/<job id>/job.json, so
+# other processes serving the same API (preload_server workers) can
+# answer for it.
+JOB_WORKERS = int(os.environ.get("DOCSANCT_JOB_WORKERS", "1"))
+# Finished jobs, and their redacted outputs, are kept this many seconds for
+# the client to collect, then deleted. Uploads are deleted as soon as the
+# job finishes.
+JOB_TTL = float(os.environ.get("DOCSANCT_JOB_TTL", "3600"))
+JOB_PURGE_INTERVAL = 60
+# Progress updates rewrite a job's state file at most this often (seconds)
+JOB_SAVE_INTERVAL = 1.0
+STATE_FILE = "job.json"
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, COMPLETED, FAILED = "queued", "running", "completed", "failed"
+
+
+class Job:
+    def __init__(self, paths, out_dir, backend=None, upload_dir=None, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.status = QUEUED
+        self.out_dir = out_dir
+        self.upload_dir = upload_dir   # deleted once the job finishes
+        self.backend = backend   # None: the default detector backend
+        self.result_path = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        # Per-file progress; pages_total is filled in once the file is opened
+        self.files = [
+            {
+                "name": os.path.basename(path),
+                "path": path,
+                "status": QUEUED,
+                "pages_done": 0,
+                "pages_total": None,
+                "output": None,
+                "error": None,
+            }
+            for path in paths
+        ]
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "files_done": sum(f["status"] in (COMPLETED, FAILED) for f in self.files),
+            "files_total": len(self.files),
+            "files": [
+                {k: v for k, v in f.items() if k not in ("path", "output")}
+                for f in self.files
+            ],
+        }
+
+    def to_state(self):
+        return {**self.to_dict(), "out_dir": self.out_dir, "result_path": self.result_path}
+
+    @classmethod
+    def from_state(cls, state):
+        """A read-only copy of a job saved by another process."""
+        job = cls([], state["out_dir"], job_id=state["job_id"])
+        for key in ("status", "error", "created", "started", "finished", "result_path"):
+            setattr(job, key, state[key])
+        job.files = state["files"]
+        return job
+
+
+class JobQueue:
+    """
+    FIFO queue of redaction jobs drained by *workers* threads. Each job
+    redacts its files in order, records per-file and per-page progress and
+    finally zips the outputs into its own directory. Jobs finished more
+    than *ttl* seconds ago are forgotten and their output directory removed.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, process_file=process_and_redact_file, ttl=JOB_TTL, state_dir=None):
+        self.workers = max(1, workers)
+        self.process_file = process_file
+        self.ttl = ttl
+        self.state_dir = state_dir
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                t = threading.Thread(target=self._worker, name=f"redaction-worker-{len(self._threads)}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, paths, out_dir, backend=None, upload_dir=None, job_id=None):
+        job = Job(paths, out_dir, backend, upload_dir, job_id)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._save(job)
+        self._queue.put(job)
+        self.start()
+        logger.info("Job %s queued with %d file(s)", job.id, len(paths))
+        return job
+
+    def get(self, job_id):
+        """The job, from memory if this process runs it, else from its state file."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.state_dir and job_id.isalnum():
+            try:
+                with open(os.path.join(self.state_dir, job_id, STATE_FILE)) as f:
+                    job = Job.from_state(json.load(f))
+            except (OSError, ValueError, KeyError):
+                return None
+        return job
+
+    def _save(self, job):
+        if not self.state_dir:
+            return
+        path = os.path.join(self.state_dir, job.id, STATE_FILE)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written whole and renamed into place, so readers never see half a file
+        with open(path + ".tmp", "w") as f:
+            json.dump(job.to_state(), f)
+        os.replace(path + ".tmp", path)
+
+    def depth(self):
+        """Jobs waiting for a worker (not counting the ones running)."""
+        return self._queue.qsize()
+
+    def purge(self, now=None):
+        """Drop jobs finished more than ttl seconds ago, with their outputs."""
+        cutoff = (time.time() if now is None else now) - self.ttl
+        with self._lock:
+            expired = [job for job in self._jobs.values() if job.finished is not None and job.finished < cutoff]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            shutil.rmtree(job.out_dir, ignore_errors=True)
+            if self.state_dir:
+                shutil.rmtree(os.path.join(self.state_dir, job.id), ignore_errors=True)
+            logger.info("Job %s expired; outputs removed", job.id)
+        return len(expired) + self._purge_saved(cutoff)
+
+    def _purge_saved(self, cutoff):
+        # Jobs saved by other processes, which may since have exited
+        if not self.state_dir or not os.path.isdir(self.state_dir):
+            return 0
+        purged = 0
+        for job_id in os.listdir(self.state_dir):
+            job = self.get(job_id)
+            if job is not None and job.finished is not None and job.finished < cutoff:
+                shutil.rmtree(job.out_dir, ignore_errors=True)
+                shutil.rmtree(os.path.join(self.state_dir, job_id), ignore_errors=True)
+                logger.info("Job %s expired; outputs removed", job_id)
+                purged += 1
+        return purged
+
+    def _worker(self):
+        while True:
+            try:
+                job = self._queue.get(timeout=JOB_PURGE_INTERVAL)
+            except queue.Empty:
+                self.purge()
+                continue
+            try:
+                self._run(job)
+            finally:
+                self._queue.task_done()
+            self.purge()
+
+    def _run(self, job):
+        job.status = RUNNING
+        job.started = time.time()
+        logger.info("Job %s started", job.id)
+        os.makedirs(job.out_dir, exist_ok=True)
+        outputs = []
+        saved = [0.0]
+        for entry in job.files:
+            entry["status"] = RUNNING
+            self._save(job)
+
+            def progress(pages_done, pages_total, entry=entry):
+                entry["pages_done"] = pages_done
+                entry["pages_total"] = pages_total
+                if time.monotonic() - saved[0] >= JOB_SAVE_INTERVAL:
+                    saved[0] = time.monotonic()
+                    self._save(job)
+
+            try:
+                out_path = self.process_file(entry["path"], backend=job.backend, out_dir=job.out_dir,
+                                             progress=progress)
+                if not os.path.exists(out_path):
+                    raise ValueError(f"Unsupported file type: {entry['name']}")
+                entry["output"] = out_path
+                entry["status"] = COMPLETED
+                outputs.append(out_path)
+            except Exception as e:
+                logger.exception("Job %s: failed on %s: %s", job.id, entry['name'], e)
+                entry["error"] = str(e)
+                entry["status"] = FAILED
+        try:
+            if not outputs:
+                raise RuntimeError("No file could be redacted")
+            result_path = os.path.join(job.out_dir, "redacted.zip")
+            compress_to_zip(outputs, result_path)
+            job.result_path = result_path
+            job.status = COMPLETED
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        if job.upload_dir:
+            shutil.rmtree(job.upload_dir, ignore_errors=True)
+        job.finished = time.time()
+        self._save(job)
+        logger.info("Job %s %s in %.1fs", job.id, job.status, job.finished - job.started)
@@ -0,0 +1,97 @@
+"""
+Output page encoding: PDF bytes and encode time per page for each
+DOCSANCT_PAGE_ENCODING, against the previous RGB-JPEG output, on redacted
+synthetic pages of three kinds (text scan, greyscale with a photo, colour).
+
+Also checks that every encoding keeps the redaction boxes solid black.
+
+    python -m benchmarks.bench_encoder --dpi 200 --pages 3
+"""
+import io
+import os
+import time
+import argparse
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+from ai.page_encoder import encode_page, choose_encoding, ENCODINGS
+from ai.pdf_stream import EncryptedPdfWriter
+from ai.redaction_render import render_redactions
+from benchmarks.bench_resolution import make_page
+
+
+def with_photo(page, seed, colour):
+    """Paste a smooth, noisy 'photo' into the lower half of *page*."""
+    rng = np.random.default_rng(seed)
+    w, h = page.width * 2 // 3, page.height // 4
+    y, x = np.mgrid[0:h, 0:w]
+    base = np.stack([x / w * 200, y / h * 200, (x + y) / (w + h) * 255], axis=2) if colour else \
+        np.repeat((x / w * 200)[..., None], 3, axis=2)
+    photo = np.clip(base + rng.normal(0, 12, base.shape if colour else (h, w, 1)), 0, 255).astype(np.uint8)
+    page = page.copy()
+    page.paste(Image.fromarray(photo), (page.width // 6, page.height * 5 // 8))
+    return page
+
+
+def make_pages(kind, dpi, count):
+    pages = []
+    for seed in range(count):
+        page, truth = make_page(dpi, seed)
+        if kind != "text":
+            page = with_photo(page, seed, colour=kind == "colour")
+        pages.append((render_redactions(page, truth), truth))
+    return pages
+
+
+def legacy_pdf(pages, path):
+    # What the pipeline wrote before: RGB pages at Pillow's default JPEG quality
+    for n, img in enumerate(pages):
+        img.convert("RGB").save(path, "PDF", append=n > 0)
+
+
+def check_boxes_black(img, truth):
+    gray = np.asarray(img.convert("L"))
+    for x1, y1, x2, y2 in truth:
+        # JPEG ringing can lift the outermost pixels slightly; test the interior
+        inner = gray[y1 + 2:y2 - 1, x1 + 2:x2 - 1]
+        assert inner.size == 0 or inner.max() < 40, "redaction box no longer solid black"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in ("text", "gray", "colour"):
+            pages = make_pages(kind, args.dpi, args.pages)
+            imgs = [img for img, _ in pages]
+            print(f"{kind} pages at {args.dpi} DPI (auto picks: {', '.join(choose_encoding(img) for img in imgs)})")
+            path = os.path.join(tmp, "legacy.pdf")
+            start = time.perf_counter()
+            legacy_pdf(imgs, path)
+            legacy_s = time.perf_counter() - start
+            legacy_size = os.path.getsize(path)
+            print(f"  {'previous (RGB)':<16} {legacy_size / args.pages / 1024:8.1f} KiB/page  {legacy_s / args.pages * 1000:7.1f} ms/page")
+            for encoding in ("auto",) + ENCODINGS:
+                path = os.path.join(tmp, f"{encoding}.pdf")
+                start = time.perf_counter()
+                with EncryptedPdfWriter(path, "redacted123", encoding=encoding) as sink:
+                    for img in imgs:
+                        sink.append(img)
+                seconds = time.perf_counter() - start
+                size = os.path.getsize(path)
+                print(f"  {encoding:<16} {size / args.pages / 1024:8.1f} KiB/page  {seconds / args.pages * 1000:7.1f} ms/page"
+                      f"  {legacy_size / size:5.1f}x smaller")
+                for img, truth in pages:
+                    encoded, params, _ = encode_page(img, encoding)
+                    buf = io.BytesIO()
+                    encoded.save(buf, "PNG" if encoded.mode == "1" else "JPEG", **params)
+                    check_boxes_black(Image.open(buf), truth)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Metadata stripping: the old per-pixel `list(img.getdata())` + `putdata`
+round trip vs `remove_image_metadata`'s buffer copy.
+
+Each variant runs in a fresh process so peak RSS is attributable to it.
+Also checks that nothing survives: the stripped image carries no info
+and re-saving it as PNG/JPEG writes no EXIF, ICC, XMP or text chunks.
+
+    python -m benchmarks.bench_metadata --dpi 300
+"""
+import io
+import argparse
+import resource
+import time
+import multiprocessing as mp
+from PIL import Image, PngImagePlugin
+
+from ai.redact_by_ocr import remove_image_metadata
+
+A4_INCHES = (8.27, 11.69)
+
+
+def legacy_remove_image_metadata(img):
+    # The implementation remove_image_metadata replaced
+    data = list(img.getdata())
+    img_no_meta = Image.new(img.mode, img.size)
+    img_no_meta.putdata(data)
+    return img_no_meta
+
+
+def make_page(dpi):
+    size = (int(A4_INCHES[0] * dpi), int(A4_INCHES[1] * dpi))
+    return Image.new("RGB", size, "white")
+
+
+def make_tagged_image(size=(64, 64)):
+    """A JPEG and a PNG image loaded back with EXIF, ICC, XMP and text metadata."""
+    exif = Image.Exif()
+    exif[0x010F] = "SecretCam"          # Make
+    exif[0x013B] = "Jane Doe"           # Artist
+    icc = b"\0" * 128                   # opaque ICC profile bytes
+    xmp = b"<x:xmpmeta><dc:creator>Jane Doe</dc:creator></x:xmpmeta>"
+
+    buf = io.BytesIO()
+    Image.new("RGB", size, "gray").save(buf, "JPEG", exif=exif, icc_profile=icc, comment=b"Jane Doe")
+    jpeg = Image.open(io.BytesIO(buf.getvalue()))
+
+    buf = io.BytesIO()
+    info = PngImagePlugin.PngInfo()
+    info.add_text("Author", "Jane Doe")
+    info.add_itxt("XML:com.adobe.xmp", xmp.decode())
+    Image.new("RGB", size, "gray").save(buf, "PNG", pnginfo=info, exif=exif, icc_profile=icc)
+    png = Image.open(io.BytesIO(buf.getvalue()))
+    png.load()
+    return [jpeg, png]
+
+
+def check_no_metadata():
+    for img in make_tagged_image():
+        assert img.info, f"{img.format} fixture has no metadata to strip"
+        stripped = remove_image_metadata(img)
+        assert not stripped.info, f"{img.format}: info survived: {sorted(stripped.info)}"
+        assert not stripped.getexif(), f"{img.format}: EXIF survived"
+        for fmt in ("PNG", "JPEG"):
+            buf = io.BytesIO()
+            stripped.save(buf, fmt)
+            reloaded = Image.open(io.BytesIO(buf.getvalue()))
+            reloaded.load()
+            leaked = {k for k in reloaded.info if k not in ("jfif", "jfif_version", "jfif_unit", "jfif_density", "dpi")}
+            assert not leaked, f"{img.format} -> {fmt}: metadata written back: {sorted(leaked)}"
+            assert b"Jane Doe" not in buf.getvalue(), f"{img.format} -> {fmt}: tag text found in output"
+    print("metadata check: OK (no EXIF/ICC/XMP/text survives)")
+
+
+def _run_variant(name, dpi, queue):
+    img = make_page(dpi)
+    fn = legacy_remove_image_metadata if name == "legacy" else remove_image_metadata
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    fn(img)
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put({"variant": name, "seconds": elapsed, "peak_rss_delta_mb": (rss_after - rss_before) / 1024})
+
+
+def bench(dpi):
+    ctx = mp.get_context("spawn")
+    results = []
+    for name in ("legacy", "current"):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run_variant, args=(name, dpi, queue))
+        proc.start()
+        results.append(queue.get())
+        proc.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dpi", type=int, default=300)
+    args = parser.parse_args()
+    check_no_metadata()
+    print(f"A4 page at {args.dpi} DPI")
+    for r in bench(args.dpi):
+        print(f"  {r['variant']:<8} {r['seconds'] * 1000:9.1f} ms   peak RSS +{r['peak_rss_delta_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
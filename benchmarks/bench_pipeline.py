@@ -0,0 +1,283 @@
+"""
+End-to-end pipeline benchmark with a stub detector: no model download, no
+GPU. Generates synthetic PDFs and images, then times each stage of the
+redaction pipeline in its own process (so peak RSS is attributable to it):
+
+    rasterize  pdf2image pages at --dpi
+    detect     inference_batch with StubBackend (prompting + parsing cost)
+    draw       render_redactions
+    sanitize   remove_image_metadata
+    encrypt    remove_metadata_and_encrypt_pdf
+    assemble_encrypt  EncryptedPdfWriter (single-pass assemble + encrypt)
+    zip        iter_zip_stream over the redacted outputs
+
+plus the public entry points end to end: process_and_redact_file (PDF and
+image), redact_pdf_with_vlm and save_redacted_pdf.
+
+Results are written as JSON; pass a previous run to --compare to print
+per-stage changes, e.g. across commits:
+
+    python -m benchmarks.bench_pipeline --pages 20 --dpi 200 --json before.json
+    git checkout <other commit>
+    python -m benchmarks.bench_pipeline --pages 20 --dpi 200 --json after.json --compare before.json
+
+Stages that need poppler or tesseract are reported with an "error" when the
+binaries are missing, and the rest still run.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import subprocess
+import tempfile
+import multiprocessing as mp
+
+# Children inherit this: every run must actually exercise the detector path
+os.environ["DOCSANCT_CACHE"] = "0"
+
+from PIL import Image, ImageDraw
+
+A4_INCHES = (8.27, 11.69)
+LINES_PER_PAGE = 40
+STAGES = ["rasterize", "detect", "draw", "sanitize", "encrypt", "assemble_encrypt", "zip",
+          "process_pdf", "process_image", "redact_pdf_with_vlm", "save_redacted_pdf"]
+
+
+def page_size(dpi):
+    return int(A4_INCHES[0] * dpi), int(A4_INCHES[1] * dpi)
+
+
+def line_boxes(width, height):
+    """Text-line boxes laid out down the page; also the stub's fixed detections."""
+    pitch = height // (LINES_PER_PAGE + 2)
+    return [[width // 10, pitch * (i + 1), width * 9 // 10, pitch * (i + 1) + pitch * 2 // 3]
+            for i in range(LINES_PER_PAGE)]
+
+
+def make_page(dpi, number=1):
+    width, height = page_size(dpi)
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    for i, (x1, y1, x2, y2) in enumerate(line_boxes(width, height)):
+        draw.text((x1, y1), f"Page {number} line {i}: Patient Name Jane Doe, Phone 555-0100-{i:04d}", fill="black")
+    return img
+
+
+def make_pdf(path, pages, dpi):
+    first = make_page(dpi, 1)
+    first.save(path, "PDF", resolution=dpi, save_all=True,
+               append_images=(make_page(dpi, n) for n in range(2, pages + 1)))
+    return path
+
+
+def stub_detections(dpi):
+    return [{"bbox_2d": box, "label": "patient_name"} for box in line_boxes(*page_size(dpi))]
+
+
+def ocr_results(dpi):
+    return [{"text": "Name", "bbox": box} for box in line_boxes(*page_size(dpi))]
+
+
+def stub_backend(dpi):
+    from ai.detector_backend import StubBackend
+    return StubBackend(stub_detections(dpi))
+
+
+# ── Stages: each returns (callable to time, pages it processes) ──────────────
+# Setup (synthetic inputs, imports) happens before the clock starts.
+
+def stage_rasterize(args, tmp):
+    from ai.pdf_stream import iter_pdf_pages
+    pdf = make_pdf(os.path.join(tmp, "in.pdf"), args.pages, args.dpi)
+
+    def run():
+        for _ in iter_pdf_pages(pdf, dpi=args.dpi):
+            pass
+    return run, args.pages
+
+
+def stage_detect(args, tmp):
+    from ai.pii_detection import inference_batch, pdf_page_messages
+    backend = stub_backend(args.dpi)
+    pages = [make_page(args.dpi, n) for n in range(1, args.pages + 1)]
+    return lambda: inference_batch(backend, [pdf_page_messages(img) for img in pages], cache=False), args.pages
+
+
+def stage_draw(args, tmp):
+    from ai.redaction_render import render_redactions
+    pages = [make_page(args.dpi, n) for n in range(1, args.pages + 1)]
+    boxes = line_boxes(*page_size(args.dpi))
+
+    def run():
+        for img in pages:
+            render_redactions(img, boxes)
+    return run, args.pages
+
+
+def stage_sanitize(args, tmp):
+    from ai.redact_by_ocr import remove_image_metadata
+    pages = [make_page(args.dpi, n) for n in range(1, args.pages + 1)]
+
+    def run():
+        for img in pages:
+            remove_image_metadata(img)
+    return run, args.pages
+
+
+def stage_encrypt(args, tmp):
+    from ai.redact_by_ocr import remove_metadata_and_encrypt_pdf
+    pdf = make_pdf(os.path.join(tmp, "in.pdf"), args.pages, args.dpi)
+    return lambda: remove_metadata_and_encrypt_pdf(pdf, os.path.join(tmp, "out.pdf"), "redacted123"), args.pages
+
+
+def stage_assemble_encrypt(args, tmp):
+    from ai.pdf_stream import EncryptedPdfWriter
+    pages = [make_page(args.dpi, n) for n in range(1, args.pages + 1)]
+
+    def run():
+        with EncryptedPdfWriter(os.path.join(tmp, "out.pdf"), "redacted123") as sink:
+            for img in pages:
+                sink.append(img)
+    return run, args.pages
+
+
+def stage_zip(args, tmp):
+    from batch.batch_processing import iter_zip_stream
+    files = [make_pdf(os.path.join(tmp, f"doc{n}.pdf"), args.pages, args.dpi) for n in range(args.files)]
+
+    def run():
+        for _ in iter_zip_stream((path, os.path.basename(path)) for path in files):
+            pass
+    return run, args.pages * args.files
+
+
+def stage_process_pdf(args, tmp):
+    from batch.batch_processing import process_and_redact_file
+    backend = stub_backend(args.dpi)
+    pdf = make_pdf(os.path.join(tmp, "in.pdf"), args.pages, args.dpi)
+    return lambda: process_and_redact_file(pdf, backend=backend, out_dir=tmp), args.pages
+
+
+def stage_process_image(args, tmp):
+    from batch.batch_processing import process_and_redact_file
+    backend = stub_backend(args.dpi)
+    path = os.path.join(tmp, "in.png")
+    make_page(args.dpi).save(path)
+    return lambda: process_and_redact_file(path, backend=backend, out_dir=tmp), 1
+
+
+def stage_redact_pdf_with_vlm(args, tmp):
+    from ai.pii_detection import redact_pdf_with_vlm
+    backend = stub_backend(args.dpi)
+    pdf = make_pdf(os.path.join(tmp, "in.pdf"), args.pages, args.dpi)
+    return lambda: redact_pdf_with_vlm(pdf, os.path.join(tmp, "out.pdf"), backend=backend), args.pages
+
+
+def stage_save_redacted_pdf(args, tmp):
+    import ai.redact_by_ocr as redact_by_ocr
+    # save_redacted_pdf writes next to the module's configured output dir
+    redact_by_ocr.REDACTED_DIR = tmp
+    pdf = make_pdf(os.path.join(tmp, "in.pdf"), args.pages, args.dpi)
+    all_bboxes = [ocr_results(args.dpi)] * args.pages
+    return lambda: redact_by_ocr.save_redacted_pdf(pdf, all_bboxes), args.pages
+
+
+def _rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_stage(name, args, queue):
+    # Stage output (the pipeline's own prints) would drown the report
+    sys.stdout = open(os.devnull, "w")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            run, pages = globals()[f"stage_{name}"](args, tmp)
+            rss_before = _rss_mb()
+            start = time.perf_counter()
+            run()
+            seconds = time.perf_counter() - start
+            queue.put({
+                "seconds": round(seconds, 4),
+                "pages": pages,
+                "pages_per_sec": round(pages / seconds, 2) if seconds else None,
+                "peak_rss_mb": round(_rss_mb(), 1),
+                "peak_rss_delta_mb": round(_rss_mb() - rss_before, 1),
+            })
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def run_stage(name, args):
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_stage, args=(name, args, queue))
+    proc.start()
+    proc.join()
+    if queue.empty():
+        return {"error": f"stage process exited with code {proc.exitcode}"}
+    return queue.get()
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, previous):
+    print(f"\nvs {previous['meta'].get('commit')}:")
+    for name, result in current["stages"].items():
+        old = previous["stages"].get(name, {})
+        if "seconds" not in result or "seconds" not in old:
+            continue
+        change = (result["seconds"] - old["seconds"]) / old["seconds"] * 100 if old["seconds"] else 0.0
+        print(f"  {name:<20} {old['seconds'] * 1000:9.1f} -> {result['seconds'] * 1000:9.1f} ms  ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--files", type=int, default=3, help="documents in the zip stage")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated subset of: " + ", ".join(STAGES))
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="previous --json output to compare against")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pages": args.pages,
+            "dpi": args.dpi,
+            "files": args.files,
+        },
+        "stages": {},
+    }
+    print(f"{args.pages} pages at {args.dpi} DPI, stub detector")
+    for name in args.stages.split(","):
+        result = run_stage(name, args)
+        report["stages"][name] = result
+        if "error" in result:
+            print(f"  {name:<20} skipped: {result['error']}")
+        else:
+            print(f"  {name:<20} {result['seconds'] * 1000:9.1f} ms  {result['pages_per_sec']:8.2f} pages/s"
+                  f"  peak RSS {result['peak_rss_mb']:.0f} MB (+{result['peak_rss_delta_mb']:.0f})")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
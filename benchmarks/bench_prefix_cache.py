@@ -0,0 +1,67 @@
+"""
+Prompt-prefix KV cache: prefill latency per page with the cached system
+prompt vs re-encoding the whole prompt, on the real Qwen backend (runs on
+CPU; use a small --max-pixels to keep it quick).
+
+Each page is detected with max_new_tokens=1, so the time is prefill plus one
+decode step. Before timing, both modes generate --check-tokens tokens
+greedily for the first page and must produce the same reply.
+
+    python -m benchmarks.bench_prefix_cache --pages 4 --max-pixels 200000
+"""
+import os
+import time
+import argparse
+import statistics
+
+os.environ["DOCSANCT_CACHE"] = "0"
+
+import ai.detector_backend as detector_backend
+from ai.pii_detection import pdf_page_messages, vlm_input_image
+from benchmarks.bench_resolution import make_page
+
+
+def timed_pages(backend, msgs_list, enabled, repeat):
+    detector_backend.PREFIX_CACHE_ENABLED = enabled
+    times = []
+    for msgs in msgs_list:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            backend.generate(msgs, max_new_tokens=1)
+            best = min(best, time.perf_counter() - start)
+        times.append(best)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--max-pixels", type=int, default=200000, help="VLM input cap per page (0 = none)")
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--check-tokens", type=int, default=32)
+    args = parser.parse_args()
+
+    backend = detector_backend.QwenVLBackend().warmup()
+    msgs_list = []
+    for seed in range(args.pages):
+        page, _ = make_page(args.dpi, seed)
+        msgs_list.append(pdf_page_messages(vlm_input_image(page, args.max_pixels)[0]))
+
+    replies = {}
+    for enabled in (False, True):
+        detector_backend.PREFIX_CACHE_ENABLED = enabled
+        replies[enabled] = backend.generate(msgs_list[0], max_new_tokens=args.check_tokens)
+    assert replies[True] == replies[False], f"cached prefix changed the reply:\n{replies[False]!r}\n{replies[True]!r}"
+    prefix_tokens = next(iter(backend._prefix_caches.values()))[0].shape[-1]
+
+    uncached = timed_pages(backend, msgs_list, False, args.repeat)
+    cached = timed_pages(backend, msgs_list, True, args.repeat)
+    print(f"{args.pages} pages, prefix of {prefix_tokens} tokens served from cache, replies identical")
+    print(f"  full prefill     {statistics.median(uncached) * 1000:9.1f} ms/page (median)")
+    print(f"  cached prefix    {statistics.median(cached) * 1000:9.1f} ms/page (median)")
+
+
+if __name__ == "__main__":
+    main()
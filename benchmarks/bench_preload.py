@@ -0,0 +1,90 @@
+"""
+Fork-after-load vs load-per-worker: total memory (PSS) of --workers
+processes that each use a --weights-mb block standing in for model weights
+(numpy, read in full by every worker as inference would). No model needed;
+with --backend qwen the real detector is loaded instead.
+
+    python -m benchmarks.bench_preload --workers 4 --weights-mb 512
+
+  per-worker  every worker (spawned) loads its own copy, as `uvicorn --workers`
+  preload     the parent loads once and forks the workers, as preload_server
+"""
+import gc
+import time
+import argparse
+import multiprocessing as mp
+
+import numpy as np
+
+from backend.redacted_files.process_memory import process_memory
+
+MB = 1024 * 1024
+
+
+def load_weights(args):
+    if args.backend == "array":
+        return np.random.default_rng(0).standard_normal(args.weights_mb * MB // 8)
+    from ai.detector_backend import get_backend
+    return get_backend(args.backend).load()
+
+
+def use_weights(weights):
+    # Read every page, as a forward pass would; never write
+    if isinstance(weights, np.ndarray):
+        return float(weights.sum())
+    return float(sum(p.detach().float().sum() for p in weights.model.parameters()))
+
+
+def _worker(args, weights, ready, done):
+    if weights is None:
+        weights = load_weights(args)
+    use_weights(weights)
+    ready.set()
+    done.wait()
+
+
+def measure(args, preload):
+    ctx = mp.get_context("fork" if preload else "spawn")
+    weights = None
+    if preload:
+        weights = load_weights(args)
+        gc.collect()
+        gc.freeze()
+    done = ctx.Event()
+    readies = [ctx.Event() for _ in range(args.workers)]
+    procs = [ctx.Process(target=_worker, args=(args, weights, ready, done)) for ready in readies]
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    for ready in readies:
+        ready.wait()
+    seconds = time.perf_counter() - start
+    memory = [process_memory(proc.pid) for proc in procs]
+    parent = process_memory() if preload else None
+    done.set()
+    for proc in procs:
+        proc.join()
+    if preload:
+        gc.unfreeze()
+    return seconds, memory, parent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--weights-mb", type=int, default=512)
+    parser.add_argument("--backend", default="array", help="array (synthetic weights) or a detector backend name")
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers, weights: {args.backend if args.backend != 'array' else f'{args.weights_mb} MB array'}")
+    for label, preload in (("per-worker", False), ("preload", True)):
+        seconds, memory, parent = measure(args, preload)
+        total_pss = sum(m["pss"] for m in memory) + (parent["pss"] if parent else 0)
+        unique = sum(m["unique"] for m in memory) / len(memory)
+        shared = sum(m["shared"] for m in memory) / len(memory)
+        print(f"  {label:<11} ready in {seconds:6.2f} s  per worker: unique {unique / MB:7.0f} MB, shared {shared / MB:7.0f} MB"
+              f"  total PSS {total_pss / MB:7.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
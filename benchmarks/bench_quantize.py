@@ -0,0 +1,138 @@
+"""
+Quantized CPU inference: load time, detection latency, peak RSS and box
+agreement of each DOCSANCT_QUANTIZE mode against FP32, on a fixed set of
+synthetic pages (same seeds every run). Each mode runs in its own process,
+so RSS is attributable to it; the first int8 run also converts and caches
+the model, so run twice to see the cached load time.
+
+Agreement is measured against the FP32 boxes: box F1 at --iou, and the
+IoU of the redacted areas (what ends up blacked out).
+
+    python -m benchmarks.bench_quantize --pages 4 --max-pixels 500000
+"""
+import os
+import time
+import json
+import argparse
+import resource
+import multiprocessing as mp
+
+# Measure detection, not cache hits
+os.environ["DOCSANCT_CACHE"] = "0"
+
+import numpy as np
+
+
+def _rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_mode(mode, args, queue):
+    try:
+        import ai.pii_detection as pii_detection
+        from ai.detector_backend import QwenVLBackend
+        from benchmarks.bench_resolution import make_page
+        pii_detection.VLM_MAX_PIXELS = args.max_pixels
+        pages = [make_page(args.dpi, seed)[0] for seed in range(args.pages)]
+        start = time.perf_counter()
+        backend = QwenVLBackend(quantize=mode).warmup()
+        load_s = time.perf_counter() - start
+        times, detections = [], []
+        for page in pages:
+            start = time.perf_counter()
+            detections.append(pii_detection.inference(backend, pii_detection.pdf_page_messages(page), cache=False))
+            times.append(time.perf_counter() - start)
+        queue.put({
+            "load_seconds": round(load_s, 2),
+            "seconds_per_page": round(float(np.median(times)), 3),
+            "peak_rss_mb": round(_rss_mb(), 1),
+            "detections": detections,
+            "size": list(pages[0].size),
+        })
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def run_mode(mode, args):
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_mode, args=(mode, args, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def _iou(a, b):
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def box_f1(reference, candidate, threshold):
+    """Greedy one-to-one matching at IoU >= *threshold*."""
+    ref = [d["bbox_2d"] for d in reference]
+    cand = [d["bbox_2d"] for d in candidate]
+    if not ref and not cand:
+        return 1.0
+    unmatched = list(range(len(cand)))
+    matched = 0
+    for box in ref:
+        best = max(unmatched, key=lambda j: _iou(box, cand[j]), default=None)
+        if best is not None and _iou(box, cand[best]) >= threshold:
+            unmatched.remove(best)
+            matched += 1
+    return 2 * matched / (len(ref) + len(cand))
+
+
+def area_iou(reference, candidate, size):
+    masks = []
+    for dets in (reference, candidate):
+        mask = np.zeros((size[1], size[0]), dtype=bool)
+        for det in dets:
+            x1, y1, x2, y2 = (int(v) for v in det["bbox_2d"])
+            mask[max(0, y1):max(0, y2), max(0, x1):max(0, x2)] = True
+        masks.append(mask)
+    union = (masks[0] | masks[1]).sum()
+    return float((masks[0] & masks[1]).sum() / union) if union else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--max-pixels", type=int, default=500000, help="VLM input cap per page (0 = none)")
+    parser.add_argument("--modes", default="int8", help="comma-separated quantization modes to compare with FP32")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU at which two boxes count as the same detection")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    print(f"{args.pages} pages at {args.dpi} DPI, max_pixels {args.max_pixels or 'off'}")
+    results = {}
+    for mode in [""] + args.modes.split(","):
+        result = run_mode(mode, args)
+        name = mode or "fp32"
+        results[name] = result
+        if "error" in result:
+            print(f"  {name:<6} failed: {result['error']}")
+            continue
+        line = (f"  {name:<6} load {result['load_seconds']:7.1f} s  {result['seconds_per_page']:7.2f} s/page"
+                f"  peak RSS {result['peak_rss_mb']:7.0f} MB")
+        reference = results.get("fp32", {})
+        if mode and "detections" in reference:
+            size = reference["size"]
+            f1 = [box_f1(r, c, args.iou) for r, c in zip(reference["detections"], result["detections"])]
+            overlap = [area_iou(r, c, size) for r, c in zip(reference["detections"], result["detections"])]
+            result["box_f1"] = round(float(np.mean(f1)), 4)
+            result["area_iou"] = round(float(np.mean(overlap)), 4)
+            line += f"  box F1 {result['box_f1']:.3f}  redacted-area IoU {result['area_iou']:.3f}"
+        print(line)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"pages": args.pages, "dpi": args.dpi, "max_pixels": args.max_pixels, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
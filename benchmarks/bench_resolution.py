@@ -0,0 +1,155 @@
+"""
+VLM input resolution: detection time and recall at several
+DOCSANCT_VLM_MAX_PIXELS caps, on synthetic pages with known PII positions.
+
+Recall is the fraction of ground-truth PII boxes at least --coverage covered
+by the (rescaled) detections. Vision tokens are the 28x28 patches Qwen2.5-VL
+sees per page.
+
+    python -m benchmarks.bench_resolution --backend qwen --pages 4 --max-pixels 0,2000000,1000000,500000
+
+With the default --backend oracle no model is needed: the oracle answers
+with the exact ground truth in whatever coordinates the VLM input has, so
+recall must be 1.0 at every cap (it checks the box remapping) and the time is
+preprocessing only.
+"""
+import os
+import sys
+import time
+import json
+import random
+import argparse
+
+# Measure detection, not cache hits
+os.environ["DOCSANCT_CACHE"] = "0"
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from ai.detector_backend import DetectorBackend, get_backend
+from ai.pii_detection import inference_batch, pdf_page_messages, VLM_PATCH
+
+A4_INCHES = (8.27, 11.69)
+FIELDS = [
+    ("Patient Name", lambda r: r.choice(["Jane Doe", "Rahul Sharma", "Maria Garcia", "Wei Zhang"])),
+    ("Phone", lambda r: f"+1 555 {r.randint(100, 999)} {r.randint(1000, 9999)}"),
+    ("Email", lambda r: f"patient{r.randint(10, 99)}@example.com"),
+    ("Date of Birth", lambda r: f"{r.randint(1, 28):02d}/{r.randint(1, 12):02d}/{r.randint(1940, 2010)}"),
+    ("Address", lambda r: f"{r.randint(1, 999)} Main Street, Springfield"),
+    ("Insurance Number", lambda r: f"INS-{r.randint(100000, 999999)}"),
+]
+FILLER = "The patient was seen for a routine follow-up and reported no new symptoms."
+
+
+def make_page(dpi, seed, inches=A4_INCHES):
+    """A form-like page and the pixel boxes of its PII values."""
+    rng = random.Random(seed)
+    width, height = int(inches[0] * dpi), int(inches[1] * dpi)
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default(size=max(10, dpi // 9))
+    line = int(font.size * 1.8)
+    y = line * 2
+    truth = []
+    while y + line < height - line * 2:
+        if rng.random() < 0.4:
+            label, value = rng.choice(FIELDS)
+            x = width // 10
+            draw.text((x, y), f"{label}:", fill="black", font=font)
+            vx = x + int(draw.textlength(f"{label}: ", font=font))
+            value = value(rng)
+            draw.text((vx, y), value, fill="black", font=font)
+            truth.append(list(draw.textbbox((vx, y), value, font=font)))
+        else:
+            draw.text((width // 10, y), FILLER, fill="black", font=font)
+        y += line
+    return img, truth
+
+
+class OracleBackend(DetectorBackend):
+    """Replies with the ground truth, scaled to the size of the image it is shown."""
+
+    name = "oracle"
+
+    def __init__(self, pages):
+        super().__init__("oracle")
+        self.pages = pages   # (page, truth) in request order
+
+    def _generate_batch(self, msgs_list, max_new_tokens, budgets):
+        replies = []
+        for msgs in msgs_list:
+            img = next(item["image"] for m in msgs for item in m["content"] if item.get("type") == "image")
+            page, truth = self.pages.pop(0)
+            sx, sy = img.width / page.width, img.height / page.height
+            dets = [{"bbox_2d": [x1 * sx, y1 * sy, x2 * sx, y2 * sy], "label": "patient_name"}
+                    for x1, y1, x2, y2 in truth]
+            replies.append("```json\n" + json.dumps(dets) + "\n```")
+        return replies
+
+
+def recall(truth, detections, size, coverage):
+    mask = np.zeros((size[1], size[0]), dtype=bool)
+    for det in detections:
+        x1, y1, x2, y2 = (int(v) for v in det["bbox_2d"])
+        mask[max(0, y1):max(0, y2) + 1, max(0, x1):max(0, x2) + 1] = True
+    hit = sum(mask[y1:y2, x1:x2].mean() >= coverage for x1, y1, x2, y2 in truth)
+    return hit, len(truth)
+
+
+def vision_tokens(img, max_pixels):
+    """28x28 patches per page: what vlm_input_image produces, else the processor's own rounding."""
+    w, h = img.size
+    if max_pixels and w * h > max_pixels:
+        f = (max_pixels / (w * h)) ** 0.5
+        return max(1, int(w * f) // VLM_PATCH) * max(1, int(h * f) // VLM_PATCH)
+    return round(w / VLM_PATCH) * round(h / VLM_PATCH)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="oracle", help="oracle (no model) or a detector backend name, e.g. qwen")
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--max-pixels", default="0,4000000,2000000,1000000,500000")
+    parser.add_argument("--coverage", type=float, default=0.9, help="fraction of a PII box that must be covered")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    import ai.pii_detection as pii_detection
+    pages = [make_page(args.dpi, seed) for seed in range(args.pages)]
+    backend = None if args.backend == "oracle" else get_backend(args.backend).warmup()
+    results = []
+    print(f"{args.pages} pages at {args.dpi} DPI, backend {args.backend}")
+    for cap in (int(v) for v in args.max_pixels.split(",")):
+        pii_detection.VLM_MAX_PIXELS = cap
+        run_backend = backend or OracleBackend(list(pages))
+        msgs = [pdf_page_messages(img) for img, _ in pages]
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            start = time.perf_counter()
+            detections = inference_batch(run_backend, msgs, cache=False)
+            seconds = time.perf_counter() - start
+        finally:
+            sys.stdout = stdout
+        hits = total = 0
+        for (img, truth), dets in zip(pages, detections):
+            h, t = recall(truth, dets, img.size, args.coverage)
+            hits, total = hits + h, total + t
+        row = {
+            "max_pixels": cap,
+            "vision_tokens_per_page": vision_tokens(pages[0][0], cap),
+            "seconds_per_page": round(seconds / args.pages, 4),
+            "recall": round(hits / total, 4) if total else None,
+        }
+        results.append(row)
+        print(f"  max_pixels {cap or 'off':>9}  {row['vision_tokens_per_page']:6d} vision tokens"
+              f"  {row['seconds_per_page'] * 1000:9.1f} ms/page  recall {row['recall']:.3f}")
+        if args.backend == "oracle":
+            assert hits == total, f"boxes mis-mapped at max_pixels={cap}: recall {hits}/{total}"
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"backend": args.backend, "dpi": args.dpi, "pages": args.pages, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Cross-request micro-batching: throughput and small-job latency with the
+inference scheduler vs every request driving the detector itself, against a
+simulated detector whose batch call costs --batch-ms plus --row-ms per
+conversation (one device, so calls run one at a time). No model needed.
+
+    python -m benchmarks.bench_scheduler --clients 8 --pages 12 --batch-ms 120 --row-ms 15
+
+  throughput  --clients concurrent requests of --pages pages, one page per
+              detector call (the single-image path)
+  fairness    one large job (--large-pages, submitted --large-chunk pages
+              at a time, e.g. a tiled drawing or a wide page window)
+              plus --clients small jobs of 4 pages arriving just after it;
+              small-job latency with one shared tenant (FIFO) vs per-tenant
+              round-robin
+"""
+import time
+import argparse
+import statistics
+import threading
+
+from ai.detector_backend import DetectorBackend
+from ai.inference_scheduler import InferenceScheduler
+
+
+class SimulatedBackend(DetectorBackend):
+    name = "simulated"
+
+    def __init__(self, batch_ms, row_ms):
+        super().__init__("simulated")
+        self.batch_s, self.row_s = batch_ms / 1000, row_ms / 1000
+        self.device = threading.Lock()
+        self.calls = 0
+
+    def _generate_batch(self, msgs_list, max_new_tokens, budgets):
+        with self.device:
+            self.calls += 1
+            time.sleep(self.batch_s + self.row_s * len(msgs_list))
+        return ["```json\n[]\n```"] * len(msgs_list)
+
+
+def _msgs(n):
+    return [{"role": "user", "content": [{"type": "text", "text": f"page {n}"}]}]
+
+
+def run_clients(jobs):
+    """Run each (backend, pages, chunk) job in its own thread; returns (wall seconds, per-job seconds)."""
+    latencies = [None] * len(jobs)
+
+    def client(i, backend, pages, chunk, delay):
+        time.sleep(delay)
+        start = time.perf_counter()
+        for first in range(0, pages, chunk):
+            backend.generate_batch([_msgs(n) for n in range(first, min(pages, first + chunk))])
+        latencies[i] = time.perf_counter() - start
+
+    threads = [threading.Thread(target=client, args=(i, *job)) for i, job in enumerate(jobs)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--large-pages", type=int, default=64)
+    parser.add_argument("--large-chunk", type=int, default=32)
+    parser.add_argument("--batch-ms", type=float, default=120, help="fixed cost of one detector call")
+    parser.add_argument("--row-ms", type=float, default=15, help="extra cost per conversation in a call")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    total = args.clients * args.pages
+    print(f"throughput: {args.clients} clients x {args.pages} pages")
+    backend = SimulatedBackend(args.batch_ms, args.row_ms)
+    seconds, _ = run_clients([(backend, args.pages, 1, 0)] * args.clients)
+    print(f"  direct      {total / seconds:7.1f} pages/s  {backend.calls} detector calls")
+    backend = SimulatedBackend(args.batch_ms, args.row_ms)
+    scheduler = InferenceScheduler(backend, args.max_batch, args.max_wait_ms)
+    seconds, _ = run_clients([(scheduler.backend_for(f"client{i}"), args.pages, 1, 0) for i in range(args.clients)])
+    scheduler.close()
+    print(f"  scheduled   {total / seconds:7.1f} pages/s  {backend.calls} detector calls")
+
+    print(f"fairness: 1 job of {args.large_pages} pages + {args.clients} jobs of 4 pages")
+    for label, per_tenant in (("one tenant", False), ("per tenant", True)):
+        backend = SimulatedBackend(args.batch_ms, args.row_ms)
+        scheduler = InferenceScheduler(backend, args.max_batch, args.max_wait_ms)
+        tenant = (lambda name: name) if per_tenant else (lambda name: "shared")
+        jobs = [(scheduler.backend_for(tenant("large")), args.large_pages, args.large_chunk, 0)]
+        jobs += [(scheduler.backend_for(tenant(f"small{i}")), 4, 4, 0.05) for i in range(args.clients)]
+        _, latencies = run_clients(jobs)
+        scheduler.close()
+        small = latencies[1:]
+        print(f"  {label:<11} small jobs {statistics.median(small):6.2f} s median, {max(small):6.2f} s max;"
+              f" large job {latencies[0]:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
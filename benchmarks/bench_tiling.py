@@ -0,0 +1,112 @@
+"""
+Tiled detection for oversized scans: vision tokens, detection time and
+recall per page with the whole page shown to the VLM, with it capped by
+DOCSANCT_VLM_MAX_PIXELS, and split into DOCSANCT_TILE_SIZE tiles, on large
+synthetic pages (A3 at --dpi by default) with known PII positions.
+
+    python -m benchmarks.bench_tiling --backend qwen --dpi 300 --tile-sizes 0,1344,896 --max-pixels 2000000
+
+With the default --backend oracle no model is needed: the oracle reports the
+ground truth that falls inside each tile it is shown, clipped at the tile
+edge, so recall must be 1.0 and every PII box must come back exactly once
+(it checks the offsets and the seam merging).
+"""
+import os
+import sys
+import time
+import json
+import argparse
+
+# Measure detection, not cache hits
+os.environ["DOCSANCT_CACHE"] = "0"
+
+from ai.detector_backend import DetectorBackend, get_backend
+from ai.pii_detection import inference_tiled, pdf_page_messages, tile_boxes
+from benchmarks.bench_resolution import make_page, recall, vision_tokens
+
+A3_INCHES = (11.69, 16.54)
+
+
+class TileOracle(DetectorBackend):
+    """Replies with the ground truth inside each tile, in the coordinates of the image it is shown."""
+
+    name = "oracle"
+
+    def __init__(self, requests):
+        super().__init__("oracle")
+        self.requests = requests   # (truth, tile) in request order
+
+    def _generate_batch(self, msgs_list, max_new_tokens, budgets):
+        replies = []
+        for msgs in msgs_list:
+            img = next(item["image"] for m in msgs for item in m["content"] if item.get("type") == "image")
+            truth, (tx1, ty1, tx2, ty2) = self.requests.pop(0)
+            sx, sy = img.width / (tx2 - tx1), img.height / (ty2 - ty1)
+            dets = []
+            for x1, y1, x2, y2 in truth:
+                cx1, cy1, cx2, cy2 = max(x1, tx1), max(y1, ty1), min(x2, tx2), min(y2, ty2)
+                if cx1 < cx2 and cy1 < cy2:
+                    dets.append({"bbox_2d": [(cx1 - tx1) * sx, (cy1 - ty1) * sy, (cx2 - tx1) * sx, (cy2 - ty1) * sy],
+                                 "label": "patient_name"})
+            replies.append("```json\n" + json.dumps(dets) + "\n```")
+        return replies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="oracle", help="oracle (no model) or a detector backend name, e.g. qwen")
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--tile-sizes", default="0,1344,896", help="comma-separated DOCSANCT_TILE_SIZE values (0 = off)")
+    parser.add_argument("--overlap", type=int, default=128)
+    parser.add_argument("--max-pixels", type=int, default=2000000, help="VLM input cap per image (0 = none)")
+    parser.add_argument("--coverage", type=float, default=0.9, help="fraction of a PII box that must be covered")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    import ai.pii_detection as pii_detection
+    pii_detection.VLM_MAX_PIXELS = args.max_pixels
+    pages = [make_page(args.dpi, seed, A3_INCHES) for seed in range(args.pages)]
+    backend = None if args.backend == "oracle" else get_backend(args.backend).warmup()
+    width, height = pages[0][0].size
+    print(f"{args.pages} A3 pages of {width}x{height} px, max_pixels {args.max_pixels or 'off'}, backend {args.backend}")
+    results = []
+    for tile_size in (int(v) for v in args.tile_sizes.split(",")):
+        tiles = tile_boxes((width, height), tile_size, args.overlap)
+        run_backend = backend or TileOracle([(truth, tile) for _, truth in pages
+                                             for tile in tile_boxes((width, height), tile_size, args.overlap)])
+        msgs = [pdf_page_messages(img) for img, _ in pages]
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            start = time.perf_counter()
+            detections = inference_tiled(run_backend, msgs, cache=False, tile_size=tile_size, overlap=args.overlap)
+            seconds = time.perf_counter() - start
+        finally:
+            sys.stdout = stdout
+        hits = total = boxes = 0
+        for (img, truth), dets in zip(pages, detections):
+            h, t = recall(truth, dets, img.size, args.coverage)
+            hits, total, boxes = hits + h, total + t, boxes + len(dets)
+        row = {
+            "tile_size": tile_size,
+            "tiles_per_page": len(tiles),
+            "vision_tokens_per_page": sum(vision_tokens(pages[0][0].crop(tile), args.max_pixels) for tile in tiles),
+            "seconds_per_page": round(seconds / args.pages, 4),
+            "recall": round(hits / total, 4) if total else None,
+            "boxes": boxes,
+            "truth_boxes": total,
+        }
+        results.append(row)
+        print(f"  tile_size {tile_size or 'off':>5}  {row['tiles_per_page']:3d} tiles  {row['vision_tokens_per_page']:6d} vision tokens"
+              f"  {row['seconds_per_page'] * 1000:9.1f} ms/page  recall {row['recall']:.3f}  {boxes} boxes for {total} PII")
+        if args.backend == "oracle":
+            assert hits == total, f"boxes mis-mapped at tile_size={tile_size}: recall {hits}/{total}"
+            assert boxes == total, f"seam duplicates left at tile_size={tile_size}: {boxes} boxes for {total} PII"
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"backend": args.backend, "dpi": args.dpi, "pages": args.pages, "max_pixels": args.max_pixels,
+                       "overlap": args.overlap, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,92 @@
 # frontend/main.py
 
 from django.shortcuts import render
-from django.http import HttpResponse, FileResponse
+from django.http import HttpResponse, StreamingHttpResponse
+import os
+import uuid
 import requests
-import io
+from requests.adapters import HTTPAdapter
 
 FASTAPI_URL = "http://localhost:8001/redact"  # Update with your FastAPI endpoint
 
+# Upstream timeouts in seconds: connect, and max silence between response
+# chunks (redaction of a large PDF can take a while before the first entry)
+CONNECT_TIMEOUT = float(os.environ.get("DOCSANCT_PROXY_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("DOCSANCT_PROXY_READ_TIMEOUT", "600"))
+PROXY_CHUNK_SIZE = 1 << 16
+PROXY_POOL_SIZE = int(os.environ.get("DOCSANCT_PROXY_POOL_SIZE", "10"))
+
+# One keep-alive session per worker process, shared by all requests
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=PROXY_POOL_SIZE))
+session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=PROXY_POOL_SIZE))
+
+def _quote(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\r", "").replace("\n", "")
+
+def iter_multipart(field, uploaded_files, boundary):
+    """
+    Yield a multipart/form-data body chunk by chunk, reading each upload
+    through Django's chunks() (temp file or memory) instead of f.read().
+    requests sends a generator body with chunked transfer encoding.
+    """
+    for f in uploaded_files:
+        yield (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{_quote(f.name)}"\r\n'
+            f"Content-Type: {f.content_type or 'application/octet-stream'}\r\n\r\n"
+        ).encode()
+        for chunk in f.chunks(PROXY_CHUNK_SIZE):
+            yield chunk
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+def _relay(response):
+    try:
+        yield from response.iter_content(PROXY_CHUNK_SIZE)
+    finally:
+        # Hand the connection back to the pool
+        response.close()
+
+def _tenant(request):
+    # Forwarded as X-Tenant so the backend's inference scheduler shares the
+    # detector fairly between users; every request reaches it from this
+    # proxy's address. Without a user or session the backend uses a
+    # per-request key
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    if request.session.session_key:
+        return f"session:{request.session.session_key}"
+    return None
+
 def home(request):
     return render(request, "home.html")
 
 def upload_file(request):
     if request.method == "POST":
         uploaded_files = request.FILES.getlist("documents")
-        files = [("documents", (f.name, f.read(), f.content_type)) for f in uploaded_files]
-        response = requests.post(FASTAPI_URL, files=files)
+        boundary = uuid.uuid4().hex
+        headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        tenant = _tenant(request)
+        if tenant:
+            headers["X-Tenant"] = tenant
+        try:
+            response = session.post(
+                FASTAPI_URL,
+                data=iter_multipart("documents", uploaded_files, boundary),
+                headers=headers,
+                stream=True,
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+            )
+        except requests.RequestException:
+            return HttpResponse("Redaction failed.", status=502)
         if response.status_code == 200:
-            # Stream the redacted zip file to user
-            redacted_file = response.content
-            return FileResponse(io.BytesIO(redacted_file), as_attachment=True, filename="redacted.zip")
+            # Relay the redacted zip to the user as it arrives
+            streamed = StreamingHttpResponse(_relay(response), content_type="application/zip")
+            streamed["Content-Disposition"] = 'attachment; filename="redacted.zip"'
+            return streamed
         else:
+            response.close()
             return HttpResponse("Redaction failed.", status=500)
     return render(request, "upload.html")
 
@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+from batch.batch_runner import BatchRunner, Manifest, COMPLETED, FAILED, RUNNING
+
+
+class FakeRedactor:
+    """Stands in for process_and_redact_file: copies the input, optionally failing on some names."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.calls = []
+
+    def __call__(self, path, backend=None, out_dir=None, progress=None):
+        name = os.path.basename(path)
+        self.calls.append(name)
+        if name in self.fail:
+            raise RuntimeError(f"cannot redact {name}")
+        out_path = os.path.join(out_dir, f"redacted_{name}")
+        with open(path, "rb") as src, open(out_path, "wb") as dst:
+            dst.write(src.read())
+        if progress:
+            progress(1, 1)
+        return out_path
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    inp, out = tmp_path / "in", tmp_path / "out"
+    (inp / "sub").mkdir(parents=True)
+    out.mkdir()
+    for rel in ("a.pdf", "b.png", "sub/c.pdf"):
+        (inp / rel).write_bytes(rel.encode())
+    (inp / "ignored.txt").write_bytes(b"not a document")
+    return inp, out
+
+
+def _run(inp, out, redactor, **kwargs):
+    with Manifest(str(out / "manifest.jsonl")) as manifest:
+        runner = BatchRunner(str(inp), str(out), manifest, process_file=redactor, **kwargs)
+        counts = runner.run_once()
+        return counts, dict(manifest.entries)
+
+
+def test_rerun_skips_completed_files(dirs):
+    inp, out = dirs
+    first = FakeRedactor()
+    counts, entries = _run(inp, out, first)
+    assert counts == (3, 0)
+    assert sorted(first.calls) == ["a.pdf", "b.png", "c.pdf"]
+    assert {e["status"] for e in entries.values()} == {COMPLETED}
+    assert (out / "sub" / "redacted_c.pdf").exists()
+
+    again = FakeRedactor()
+    assert _run(inp, out, again)[0] == (0, 0)
+    assert again.calls == []
+
+
+def test_changed_and_deleted_outputs_are_redone(dirs):
+    inp, out = dirs
+    _run(inp, out, FakeRedactor())
+    (inp / "a.pdf").write_bytes(b"new content")
+    os.remove(out / "redacted_b.png")
+    redo = FakeRedactor()
+    assert _run(inp, out, redo)[0] == (2, 0)
+    assert sorted(redo.calls) == ["a.pdf", "b.png"]
+
+
+def test_interrupted_run_resumes(dirs):
+    inp, out = dirs
+    # A run that stopped mid-file leaves it "running" in the log
+    with Manifest(str(out / "manifest.jsonl")) as manifest:
+        runner = BatchRunner(str(inp), str(out), manifest, process_file=FakeRedactor())
+        rel, sha256, stat = next(runner.pending())
+        manifest.update(rel, sha256=sha256, size=stat.st_size, mtime_ns=stat.st_mtime_ns, status=RUNNING)
+    # plus a torn final line from the crash
+    with open(out / "manifest.jsonl", "a") as f:
+        f.write('{"path": "b.pn')
+    resumed = FakeRedactor()
+    counts, entries = _run(inp, out, resumed)
+    assert counts == (3, 0)
+    assert rel in resumed.calls
+    assert {e["status"] for e in entries.values()} == {COMPLETED}
+
+
+def test_failures_are_retried_only_on_request(dirs):
+    inp, out = dirs
+    counts, entries = _run(inp, out, FakeRedactor(fail={"b.png"}))
+    assert counts == (2, 1)
+    assert entries["b.png"]["status"] == FAILED
+    assert "cannot redact" in entries["b.png"]["error"]
+
+    skipped = FakeRedactor()
+    assert _run(inp, out, skipped)[0] == (0, 0)
+    retried = FakeRedactor()
+    assert _run(inp, out, retried, retry_failed=True)[0] == (1, 0)
+    assert retried.calls == ["b.png"]
+
+
+def test_manifest_is_locked_to_one_run(dirs):
+    _, out = dirs
+    path = str(out / "manifest.jsonl")
+    with Manifest(path):
+        with pytest.raises(RuntimeError):
+            Manifest(path)
+    Manifest(path).close()
@@ -0,0 +1,62 @@
+import json
+
+from PIL import Image
+
+from ai.detection_cache import DetectionCache, detection_key
+from ai.detector_backend import StubBackend
+from ai.pii_detection import inference_batch, pdf_page_messages
+
+BOX = [{"bbox_2d": [1, 2, 3, 4], "label": "address"}]
+
+
+def _page(shade):
+    return pdf_page_messages(Image.new("RGB", (32, 32), (shade, shade, shade)))
+
+
+def test_hit_and_miss(tmp_path):
+    cache = DetectionCache(str(tmp_path), 1 << 20)
+    assert cache.get("a") is None
+    cache.put("a", BOX)
+    assert cache.get("a") == BOX
+    assert (cache.hits, cache.misses) == (1, 1)
+    # Entries survive a restart
+    assert DetectionCache(str(tmp_path), 1 << 20).get("a") == BOX
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    size = len(json.dumps(BOX).encode())
+    cache = DetectionCache(str(tmp_path), 2 * size)
+    cache.put("a", BOX)
+    cache.put("b", BOX)
+    cache.get("a")            # b is now the oldest
+    cache.put("c", BOX)
+    assert cache.evictions == 1
+    assert cache.get("b") is None
+    assert cache.get("a") == BOX and cache.get("c") == BOX
+    assert cache.stats()["bytes"] <= 2 * size
+
+
+def test_key_covers_pixels_and_model():
+    assert detection_key(_page(255), "m") == detection_key(_page(255), "m")
+    assert detection_key(_page(255), "m") != detection_key(_page(0), "m")
+    assert detection_key(_page(255), "m") != detection_key(_page(255), "other")
+
+
+def test_inference_batch_reuses_cached_pages(tmp_path):
+    cache = DetectionCache(str(tmp_path), 1 << 20)
+    backend = StubBackend(BOX)
+    calls = []
+    generate_batch = backend.generate_batch
+    backend.generate_batch = lambda msgs_list, **kw: calls.append(len(msgs_list)) or generate_batch(msgs_list, **kw)
+    assert inference_batch(backend, [_page(255), _page(0)], cache=cache) == [BOX, BOX]
+    assert inference_batch(backend, [_page(0), _page(255), _page(128)], cache=cache) == [BOX, BOX, BOX]
+    assert calls == [2, 1]
+
+
+def test_stubs_with_different_boxes_do_not_share_entries(tmp_path):
+    cache = DetectionCache(str(tmp_path), 1 << 20)
+    other = [{"bbox_2d": [5, 6, 7, 8], "label": "address"}]
+    assert StubBackend(BOX).cache_id == StubBackend(list(BOX)).cache_id
+    assert StubBackend(BOX).cache_id != StubBackend(other).cache_id
+    assert inference_batch(StubBackend(BOX), [_page(255)], cache=cache) == [BOX]
+    assert inference_batch(StubBackend(other), [_page(255)], cache=cache) == [other]
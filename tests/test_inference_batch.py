@@ -0,0 +1,55 @@
+import json
+
+from PIL import Image
+
+from ai.detection_cache import DetectionCache
+from ai.detector_backend import DetectorBackend
+from ai.pii_detection import inference_batch, pdf_page_messages
+
+
+class ShadeBackend(DetectorBackend):
+    """Replies with one box whose x1 is the grey level of the page, so every page has its own answer."""
+
+    name = "shade"
+
+    def __init__(self):
+        super().__init__("shade")
+        self.batches = []
+
+    def _generate_batch(self, msgs_list, max_new_tokens, budgets):
+        self.batches.append(len(msgs_list))
+        return [self._generate(msgs, budget) for msgs, budget in zip(msgs_list, budgets)]
+
+    def _generate(self, msgs, max_new_tokens):
+        img = next(item["image"] for message in msgs for item in message["content"] if item.get("type") == "image")
+        shade = img.getpixel((0, 0))[0]
+        return "```json\n" + json.dumps([{"bbox_2d": [shade, 0, shade + 1, 1], "label": "address"}]) + "\n```"
+
+
+def _pages(shades):
+    return [pdf_page_messages(Image.new("RGB", (32, 32), (shade,) * 3)) for shade in shades]
+
+
+def _shades(results):
+    return [result[0]["bbox_2d"][0] for result in results]
+
+
+def test_results_follow_input_order_across_batches():
+    backend = ShadeBackend()
+    shades = [7, 3, 9, 1, 5, 2, 8]
+    assert _shades(inference_batch(backend, _pages(shades), batch_size=3, cache=False)) == shades
+    assert backend.batches == [3, 3, 1]
+
+
+def test_cached_and_repeated_pages_keep_their_place(tmp_path):
+    backend = ShadeBackend()
+    cache = DetectionCache(str(tmp_path), 1 << 20)
+    inference_batch(backend, _pages([4, 6]), cache=cache)
+    shades = [1, 4, 1, 2, 6, 2, 1]
+    assert _shades(inference_batch(backend, _pages(shades), batch_size=2, cache=cache)) == shades
+    # Only the two new distinct pages reached the detector
+    assert backend.batches == [2, 2]
+
+
+def test_empty_request():
+    assert inference_batch(ShadeBackend(), [], cache=False) == []
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from ai.detector_backend import DetectorBackend
+from ai.inference_scheduler import InferenceScheduler
+
+
+class RecordingBackend(DetectorBackend):
+    """Echoes each conversation back; the first batch blocks until released."""
+
+    name = "recording"
+
+    def __init__(self):
+        super().__init__("recording")
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def _generate_batch(self, msgs_list, max_new_tokens, budgets):
+        self.batches.append(list(msgs_list))
+        self.started.set()
+        self.release.wait(5)
+        if "bad" in msgs_list:
+            raise RuntimeError("bad conversation")
+        return [f"reply:{msgs}" for msgs in msgs_list]
+
+
+def _busy_scheduler(max_batch_size):
+    # Occupy the worker with a first batch, so everything queued next waits
+    # and is batched together once it is released
+    backend = RecordingBackend()
+    scheduler = InferenceScheduler(backend, max_batch_size=max_batch_size, max_wait_ms=0)
+    first = scheduler.submit("first", tenant="warm")
+    assert backend.started.wait(5)
+    return backend, scheduler, first
+
+
+def test_batches_take_tenants_round_robin():
+    backend, scheduler, first = _busy_scheduler(max_batch_size=4)
+    futures = [scheduler.submit(f"a{i}", tenant="a") for i in range(5)]
+    futures += [scheduler.submit(f"b{i}", tenant="b") for i in range(2)]
+    futures += [scheduler.submit("c0", tenant="c")]
+    assert scheduler.depth() == 8
+    backend.release.set()
+    assert first.result(5) == "reply:first"
+    assert [future.result(5) for future in futures] == [
+        "reply:a0", "reply:a1", "reply:a2", "reply:a3", "reply:a4", "reply:b0", "reply:b1", "reply:c0"]
+    # The large tenant doesn't hold back the small ones queued behind it
+    assert backend.batches[1:] == [["a0", "b0", "c0", "a1"], ["b1", "a2", "a3", "a4"]]
+    scheduler.close()
+
+
+def test_failed_batch_is_retried_one_by_one():
+    backend, scheduler, first = _busy_scheduler(max_batch_size=4)
+    futures = [scheduler.submit(msgs, tenant="t") for msgs in ("a", "bad", "b")]
+    backend.release.set()
+    assert futures[0].result(5) == "reply:a"
+    assert futures[2].result(5) == "reply:b"
+    with pytest.raises(RuntimeError, match="bad conversation"):
+        futures[1].result(5)
+    assert backend.batches[1:] == [["a", "bad", "b"], ["a"], ["bad"], ["b"]]
+    scheduler.close()
+
+
+def test_scheduled_backend_keeps_order():
+    backend = RecordingBackend()
+    backend.release.set()
+    scheduler = InferenceScheduler(backend, max_batch_size=2, max_wait_ms=5)
+    replies = scheduler.backend_for("t").generate_batch(["x", "y", "z"])
+    assert replies == ["reply:x", "reply:y", "reply:z"]
+    scheduler.close()
+
+
+def test_closed_scheduler_rejects_work():
+    scheduler = InferenceScheduler(RecordingBackend())
+    scheduler.close()
+    with pytest.raises(RuntimeError):
+        scheduler.submit("x")
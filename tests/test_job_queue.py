@@ -0,0 +1,75 @@
+import os
+import zipfile
+
+from batch.job_queue import JobQueue, COMPLETED, FAILED
+
+
+def fake_process_file(path, backend=None, out_dir=None, progress=None):
+    if "bad" in os.path.basename(path):
+        raise RuntimeError("cannot redact")
+    for page in range(1, 3):
+        progress(page, 2)
+    out_path = os.path.join(out_dir, f"redacted_{os.path.basename(path)}")
+    with open(out_path, "w") as f:
+        f.write("redacted")
+    return out_path
+
+
+def _uploads(tmp_path, *names):
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+    for name in names:
+        (upload_dir / name).write_text("x")
+    return str(upload_dir), [str(upload_dir / name) for name in names]
+
+
+def _run(jobs, *args, **kwargs):
+    job = jobs.submit(*args, **kwargs)
+    jobs._queue.join()
+    return job
+
+
+def test_job_records_progress_and_failures(tmp_path):
+    upload_dir, paths = _uploads(tmp_path, "a.pdf", "bad.pdf")
+    jobs = JobQueue(process_file=fake_process_file)
+    job = _run(jobs, paths, str(tmp_path / "out"), upload_dir=upload_dir)
+    assert job.status == COMPLETED
+    a, bad = job.files
+    assert (a["status"], a["pages_done"], a["pages_total"]) == (COMPLETED, 2, 2)
+    assert bad["status"] == FAILED and "cannot redact" in bad["error"]
+    assert zipfile.ZipFile(job.result_path).namelist() == ["redacted_a.pdf"]
+    # Uploads go as soon as the job finishes
+    assert not os.path.exists(upload_dir)
+
+
+def test_job_with_no_redacted_file_fails(tmp_path):
+    _, paths = _uploads(tmp_path, "bad.pdf")
+    job = _run(JobQueue(process_file=fake_process_file), paths, str(tmp_path / "out"))
+    assert job.status == FAILED and job.result_path is None
+    assert job.to_dict()["files_done"] == 1
+
+
+def test_finished_jobs_expire_with_their_outputs(tmp_path):
+    _, paths = _uploads(tmp_path, "a.pdf")
+    jobs = JobQueue(process_file=fake_process_file, ttl=60)
+    job = _run(jobs, paths, str(tmp_path / "out"))
+    assert jobs.purge(now=job.finished + 30) == 0
+    assert jobs.get(job.id) is job
+    assert jobs.purge(now=job.finished + 61) == 1
+    assert jobs.get(job.id) is None
+    assert not os.path.exists(job.out_dir)
+
+
+def test_state_dir_shares_jobs_between_queues(tmp_path):
+    _, paths = _uploads(tmp_path, "a.pdf")
+    state_dir = str(tmp_path / "state")
+    runner = JobQueue(process_file=fake_process_file, ttl=60, state_dir=state_dir)
+    job = _run(runner, paths, str(tmp_path / "out"), job_id="abc123")
+    # Another process serving the API answers from the state file
+    other = JobQueue(process_file=fake_process_file, ttl=60, state_dir=state_dir)
+    seen = other.get("abc123")
+    assert seen.to_dict() == job.to_dict()
+    assert seen.result_path == job.result_path
+    assert other.get("../abc123") is None
+    assert other.purge(now=job.finished + 61) == 1
+    assert other.get("abc123") is None and not os.path.exists(job.out_dir)
@@ -0,0 +1,48 @@
+from ai.detector_backend import JsonCompletionTracker
+
+
+def _feed(chunks):
+    tracker = JsonCompletionTracker()
+    done = [tracker.feed(chunk) for chunk in chunks]
+    return tracker, done
+
+
+def test_complete_when_top_level_array_closes():
+    reply = '```json\n[{"bbox_2d": [1, 2, 3, 4], "label": "Names"}]\n```'
+    tracker, done = _feed(reply)
+    assert tracker.complete
+    # Not before the closing bracket, and it stays complete afterwards
+    close = reply.rindex("]")
+    assert not any(done[:close]) and all(done[close:])
+
+
+def test_brackets_inside_strings_do_not_count():
+    tracker, _ = _feed(['[{"label": "a]}', 'b", "note": "say \\"]\\" ok"'])
+    assert not tracker.complete and tracker.depth == 2
+    tracker.feed("}]")
+    assert tracker.complete
+
+
+def test_text_before_the_first_bracket_is_ignored():
+    tracker, _ = _feed(['Sure! "quoted" } text ', '[{"a": 1}]'])
+    assert tracker.complete
+
+
+def test_bare_objects_do_not_end_the_reply():
+    # A reply of several top-level objects must not be cut after the first
+    tracker, done = _feed(['```json\n{"bbox_2d": [1, 2, 3, 4], "label": "a"}', '\n{"bbox_2d": [5, 6, 7, 8]'])
+    assert not any(done) and tracker.depth == 1
+    tracker.feed('}\n```')
+    assert not tracker.complete
+
+
+def test_chunking_does_not_matter():
+    reply = '```json\n[{"bbox_2d": [10, 20, 30, 40], "label": "x\\\\"}, {"b": "[{"}]\n```'
+    whole, _ = _feed([reply])
+    pieces, _ = _feed([reply[i:i + 3] for i in range(0, len(reply), 3)])
+    assert whole.complete and pieces.complete
+
+
+def test_incomplete_reply():
+    tracker, _ = _feed(['```json\n[{"bbox_2d": [1, 2, 3, 4]}, '])
+    assert not tracker.complete
@@ -0,0 +1,81 @@
+import io
+
+from PIL import Image, PngImagePlugin
+from PyPDF2 import PdfReader
+
+from ai.redact_by_ocr import remove_image_metadata
+from ai.pdf_stream import EncryptedPdfWriter
+
+# Written by the encoders themselves, not carried over from the input
+ENCODER_KEYS = {"jfif", "jfif_version", "jfif_unit", "jfif_density", "dpi"}
+
+
+def make_tagged_image(size=(64, 64)):
+    """A JPEG and a PNG image loaded back with EXIF, ICC, XMP and text metadata."""
+    exif = Image.Exif()
+    exif[0x010F] = "SecretCam"          # Make
+    exif[0x013B] = "Jane Doe"           # Artist
+    icc = b"\0" * 128                   # opaque ICC profile bytes
+    xmp = "<x:xmpmeta><dc:creator>Jane Doe</dc:creator></x:xmpmeta>"
+
+    buf = io.BytesIO()
+    Image.new("RGB", size, "gray").save(buf, "JPEG", exif=exif, icc_profile=icc, comment=b"Jane Doe")
+    jpeg = Image.open(io.BytesIO(buf.getvalue()))
+
+    buf = io.BytesIO()
+    info = PngImagePlugin.PngInfo()
+    info.add_text("Author", "Jane Doe")
+    info.add_itxt("XML:com.adobe.xmp", xmp)
+    Image.new("RGB", size, "gray").save(buf, "PNG", pnginfo=info, exif=exif, icc_profile=icc)
+    png = Image.open(io.BytesIO(buf.getvalue()))
+    png.load()
+    return [jpeg, png]
+
+
+def test_stripped_images_carry_no_metadata():
+    for img in make_tagged_image():
+        assert img.info, f"{img.format} fixture has no metadata to strip"
+        stripped = remove_image_metadata(img)
+        assert not stripped.info
+        assert not stripped.getexif()
+        assert stripped.tobytes() == img.tobytes()
+
+
+def test_no_metadata_written_back_on_save():
+    for img in make_tagged_image():
+        stripped = remove_image_metadata(img)
+        for fmt in ("PNG", "JPEG"):
+            buf = io.BytesIO()
+            stripped.save(buf, fmt)
+            reloaded = Image.open(io.BytesIO(buf.getvalue()))
+            reloaded.load()
+            assert set(reloaded.info) <= ENCODER_KEYS, f"{img.format} -> {fmt}"
+            assert b"Jane Doe" not in buf.getvalue()
+            assert b"SecretCam" not in buf.getvalue()
+
+
+def test_palette_and_transparency_are_kept():
+    img = Image.new("P", (8, 8), 3)
+    img.putpalette([0, 0, 0, 255, 0, 0, 0, 255, 0, 0, 0, 255] * 64)
+    img.info["transparency"] = 3
+    img.info["comment"] = b"Jane Doe"
+    stripped = remove_image_metadata(img)
+    assert stripped.info == {"transparency": 3}
+    assert stripped.getpalette() == img.getpalette()
+
+
+def test_redacted_pdf_has_no_document_metadata():
+    jpeg, png = make_tagged_image()
+    buf = io.BytesIO()
+    with EncryptedPdfWriter(buf, "secret") as sink:
+        sink.append(jpeg)
+        sink.append(png)
+    data = buf.getvalue()
+    reader = PdfReader(io.BytesIO(data))
+    assert reader.is_encrypted
+    reader.decrypt("secret")
+    assert len(reader.pages) == 2
+    # Only the PDF library's own producer tag; nothing from the pages' sources
+    assert set(reader.metadata or {}) <= {"/Producer"}
+    assert "/Metadata" not in reader.trailer["/Root"]
+    assert b"Jane Doe" not in data
@@ -0,0 +1,43 @@
+import pytest
+
+from ai import redact_by_ocr
+from ai.redact_by_ocr import iter_ocr_files, ocr_files
+
+
+def _fake_ocr(task):
+    path, page_num, _, _ = task
+    if "bad" in path:
+        raise RuntimeError(f"OCR failed for {path}")
+    return [{"text": path, "bbox": [0, 0, 1, 1]}]
+
+
+def test_failing_file_does_not_stop_the_others(monkeypatch):
+    monkeypatch.setattr(redact_by_ocr, "_ocr_task", _fake_ocr)
+    done = {path: (result, error) for path, result, error in
+            iter_ocr_files(["a.png", "bad.png", "b.png"], workers=1)}
+    assert done["a.png"] == ([{"text": "a.png", "bbox": [0, 0, 1, 1]}], None)
+    assert done["b.png"][1] is None
+    assert done["bad.png"][0] is None and "bad.png" in str(done["bad.png"][1])
+
+
+def test_unreadable_pdf_is_reported_per_file(monkeypatch, tmp_path):
+    monkeypatch.setattr(redact_by_ocr, "_ocr_task", _fake_ocr)
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+    done = {path: error for path, _, error in iter_ocr_files([str(broken), "a.png"], workers=1)}
+    assert done[str(broken)] is not None and done["a.png"] is None
+
+
+def test_ocr_files_keeps_input_order_and_raises(monkeypatch):
+    monkeypatch.setattr(redact_by_ocr, "_ocr_task", _fake_ocr)
+    assert [r[0]["text"] for r in ocr_files(["b.png", "a.png"], workers=1)] == ["b.png", "a.png"]
+    with pytest.raises(RuntimeError):
+        ocr_files(["a.png", "bad.png"], workers=1)
+
+
+def test_pool_reports_each_failed_file(tmp_path):
+    missing = [str(tmp_path / "one.png"), str(tmp_path / "two.png")]
+    done = {path: (result, error) for path, result, error in iter_ocr_files(missing, workers=2)}
+    assert set(done) == set(missing)
+    for path, (result, error) in done.items():
+        assert result is None and path in str(error)
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from ai.page_encoder import choose_encoding, encode_page
+
+
+def _text_page(mode="RGB"):
+    img = Image.new(mode, (400, 300), "white")
+    draw = ImageDraw.Draw(img)
+    for y in range(20, 280, 20):
+        draw.rectangle([20, y, 380, y + 8], fill="black")
+    return img
+
+
+def _photo_page(colour):
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(60, 200, (300, 400, 3), dtype=np.uint8)
+    if not colour:
+        pixels[:] = pixels[:, :, :1]
+    return Image.fromarray(pixels)
+
+
+def test_black_and_white_page_is_bilevel():
+    assert choose_encoding(_text_page()) == "bilevel"
+    assert choose_encoding(_text_page().convert("1")) == "bilevel"
+
+
+def test_grey_page_is_gray():
+    assert choose_encoding(_photo_page(colour=False)) == "gray"
+    assert choose_encoding(_photo_page(colour=False).convert("L")) == "gray"
+
+
+def test_colour_page_is_jpeg():
+    assert choose_encoding(_photo_page(colour=True)) == "jpeg"
+    # A few coloured marks on a text page are enough
+    page = _text_page()
+    ImageDraw.Draw(page).rectangle([300, 200, 380, 280], fill="red")
+    assert choose_encoding(page) == "jpeg"
+
+
+def test_encoded_modes():
+    img, params, encoding = encode_page(_text_page(), "auto")
+    assert (encoding, img.mode, params) == ("bilevel", "1", {})
+    img, params, encoding = encode_page(_photo_page(colour=False), "auto", quality=60)
+    assert (encoding, img.mode, params) == ("gray", "L", {"quality": 60})
+    img, _, encoding = encode_page(_photo_page(colour=True).convert("RGBA"), "auto")
+    assert (encoding, img.mode) == ("jpeg", "RGB")
+
+
+def test_bilevel_keeps_redactions_solid():
+    page = _photo_page(colour=False)
+    ImageDraw.Draw(page).rectangle([50, 50, 150, 100], fill="black")
+    img, _, _ = encode_page(page, "bilevel")
+    assert not np.asarray(img)[50:101, 50:151].any()
+
+
+def test_unknown_encoding():
+    with pytest.raises(ValueError):
+        encode_page(_text_page(), "webp")
@@ -0,0 +1,77 @@
+import re
+import random
+
+from ai.pii_matcher import PII_PATTERNS, PII_VALUE_PATTERNS, PIIMatcher, LabelFilter
+
+WORDS = ["Name:", "John", "Smith", "Account", "Number", "acc", "no.", "IFSC", "Bank", "address", "Phone",
+         "contact@example.com", "12345678", "01/02/2024", "DOB", "the", "invoice", "Signature", "username",
+         "pancake", "SSN", "Aadhaar", "total", "Date", "of", "Birth", "code", "Zip"]
+
+
+def legacy_filter_pii(results, patterns):
+    # The per-token loop PIIMatcher replaced
+    return [item for item in results if any(re.search(p, item["text"].lower()) for p in patterns)]
+
+
+def _tokens(rng, lines=40):
+    tokens = []
+    for line in range(lines):
+        x = 0
+        for _ in range(rng.randint(1, 12)):
+            text = rng.choice(WORDS)
+            tokens.append({"text": text, "bbox": [x, line * 20, x + 8 * len(text), line * 20 + 12],
+                           "line": (1, 1, line)})
+            x += 8 * len(text) + 6
+    return tokens
+
+
+def test_matches_every_token_the_per_token_loop_matched():
+    rng = random.Random(0)
+    for patterns in (PII_PATTERNS, PII_PATTERNS + PII_VALUE_PATTERNS):
+        matcher = PIIMatcher(patterns)
+        for _ in range(20):
+            tokens = _tokens(rng)
+            legacy = legacy_filter_pii(tokens, patterns)
+            current = matcher.matching_tokens(tokens)
+            assert all(any(item is m for m in current) for item in legacy)
+            # And only tokens overlapped by a match, in their original order
+            assert current == [item for item in tokens if any(item is m for m in current)]
+
+
+def test_multi_word_pattern_spans_tokens():
+    tokens = [{"text": "Account", "bbox": [0, 0, 50, 10]}, {"text": "Number", "bbox": [55, 0, 100, 10]},
+              {"text": "total", "bbox": [0, 30, 40, 40]}]
+    matched = PIIMatcher([r"account\s*number"]).matching_tokens(tokens)
+    assert [item["text"] for item in matched] == ["Account", "Number"]
+
+
+def test_lines_without_line_ids_are_grouped_by_position():
+    # "date of" ends one line and "birth" starts the next: no match across lines
+    tokens = [{"text": "date", "bbox": [0, 0, 30, 10]}, {"text": "of", "bbox": [35, 0, 45, 10]},
+              {"text": "birth", "bbox": [0, 30, 30, 40]}]
+    assert PIIMatcher([r"date of birth"]).matching_tokens(tokens) == []
+    tokens[2]["bbox"] = [50, 1, 80, 11]
+    assert len(PIIMatcher([r"date of birth"]).matching_tokens(tokens)) == 3
+
+
+def test_label_filter_normalises_labels():
+    labels = LabelFilter({"Bank Details", "email address"})
+    detections = [{"label": "bank_details"}, {"label": " Email Address "}, {"label": "logo"}, {}]
+    assert labels.filter(detections) == detections[:2]
+
+
+def test_changed_label_set_applies_to_cached_pages(tmp_path, monkeypatch):
+    from PIL import Image
+    from ai import pii_detection
+    from ai.detection_cache import DetectionCache
+    from ai.detector_backend import StubBackend
+    from ai.pii_detection import inference_batch, pdf_page_messages
+    backend = StubBackend([{"bbox_2d": [1, 1, 5, 5], "label": "name"},
+                           {"bbox_2d": [6, 6, 9, 9], "label": "Licence Plate"}])
+    msgs = [pdf_page_messages(Image.new("RGB", (32, 32), "white"))]
+    cache = DetectionCache(str(tmp_path), 1 << 20)
+    monkeypatch.setattr(pii_detection, "PII_LABEL_FILTER", LabelFilter(["name"]))
+    assert [d["label"] for d in inference_batch(backend, msgs, cache=cache)[0]] == ["name"]
+    monkeypatch.setattr(pii_detection, "PII_LABEL_FILTER", LabelFilter(["name", "licence plate"]))
+    assert [d["label"] for d in inference_batch(backend, msgs, cache=cache)[0]] == ["name", "Licence Plate"]
+    assert cache.hits == 1
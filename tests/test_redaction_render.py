@@ -0,0 +1,103 @@
+import random
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from ai.redaction_render import coalesce_boxes, render_redactions
+
+
+def make_boxes(width, height, count, seed=0):
+    """Word boxes on text lines, every third one repeated slightly shifted."""
+    rng = random.Random(seed)
+    line_height = max(12, height // 120)
+    boxes = []
+    y = line_height
+    x = 20
+    while len(boxes) < count:
+        w = rng.randint(line_height, line_height * 6)
+        if x + w > width - 20:
+            x = 20
+            y += line_height + line_height // 2
+            if y + line_height > height:
+                y = line_height
+        box = [x, y, x + w, y + line_height]
+        boxes.append(box)
+        if len(boxes) % 3 == 0:
+            d = rng.randint(-3, 3)
+            boxes.append([box[0] + d, box[1] + d, box[2] + d, box[3] + d])
+        x += w + rng.randint(2, line_height)
+    return boxes[:count]
+
+
+def _mask(size, boxes):
+    img = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(img)
+    for box in boxes:
+        draw.rectangle(box, fill=0)
+    return np.asarray(img) == 0
+
+
+def _region_mask(size, regions):
+    mask = np.zeros((size[1], size[0]), dtype=bool)
+    for x1, y1, x2, y2 in regions:
+        mask[y1:y2, x1:x2] = True
+    return mask
+
+
+def _grow(boxes, gap):
+    return [[min(b[0], b[2]) - gap, min(b[1], b[3]) - gap, max(b[0], b[2]) + gap, max(b[1], b[3]) + gap]
+            for b in boxes]
+
+
+def test_regions_cover_exactly_the_boxes():
+    size = (800, 1000)
+    boxes = make_boxes(*size, 1500, seed=1)
+    regions = coalesce_boxes(boxes, *size, gap=0)
+    assert (_region_mask(size, regions) == _mask(size, boxes)).all()
+
+
+def test_random_boxes_never_over_covered():
+    rng = random.Random(7)
+    size = (300, 300)
+    for _ in range(20):
+        boxes = []
+        for _ in range(60):
+            x, y = rng.randint(-20, 290), rng.randint(-20, 290)
+            boxes.append([x, y, x + rng.randint(0, 40), y + rng.randint(0, 15)])
+        for gap in (0, 3):
+            covered = _region_mask(size, coalesce_boxes(boxes, *size, gap=gap))
+            assert not (covered & ~_mask(size, _grow(boxes, gap))).any()
+            assert not (_mask(size, boxes) & ~covered).any()
+
+
+def test_lines_chained_by_overlaps_are_not_merged():
+    # Each box overlaps the next by 1 px, vertically and then diagonally,
+    # but the first and last are far apart: no bounding box over the lot
+    boxes = [[0, 0, 50, 12], [40, 12, 60, 24], [5, 23, 45, 34], [20, 33, 30, 45], [10, 44, 60, 56]]
+    size = (100, 100)
+    regions = coalesce_boxes(boxes, *size, gap=0)
+    assert (0, 0, 61, 57) not in regions
+    assert (_region_mask(size, regions) == _mask(size, boxes)).all()
+
+
+def test_duplicates_and_nested_boxes_are_painted_once():
+    boxes = [[10, 10, 20, 20], [10, 10, 20, 20], [12, 12, 15, 15], [30, 30, 40, 40]]
+    assert sorted(coalesce_boxes(boxes, 100, 100, gap=0)) == [(10, 10, 21, 21), (30, 30, 41, 41)]
+
+
+def test_boxes_forming_a_rectangle_become_one_region():
+    # Two halves of one line, overlapping
+    assert coalesce_boxes([[0, 0, 20, 9], [15, 0, 40, 9]], 100, 100, gap=0) == [(0, 0, 41, 10)]
+    # Side by side, 2 px apart: merged only when that is closer than the gap
+    boxes = [[0, 0, 9, 9], [12, 0, 20, 9]]
+    assert len(coalesce_boxes(boxes, 100, 100, gap=2)) == 2
+    assert coalesce_boxes(boxes, 100, 100, gap=3) == [(0, 0, 21, 10)]
+
+
+def test_render_matches_drawing_every_box():
+    size = (400, 500)
+    boxes = make_boxes(*size, 400, seed=3)
+    page = Image.new("RGB", size, "white")
+    out = render_redactions(page, boxes, gap=0)
+    assert np.asarray(page).min() == 255   # input left untouched
+    assert ((np.asarray(out).max(axis=2) == 0) == _mask(size, boxes)).all()
@@ -0,0 +1,69 @@
+import numpy as np
+
+from ai.pii_detection import tile_boxes, merge_tile_detections, _offset_detections
+
+
+def test_small_image_is_one_tile():
+    assert tile_boxes((800, 600), tile_size=1024, overlap=128) == [(0, 0, 800, 600)]
+    assert tile_boxes((5000, 5000), tile_size=0) == [(0, 0, 5000, 5000)]
+
+
+def test_tiles_cover_the_image_with_the_overlap():
+    size = (3000, 4200)
+    tiles = tile_boxes(size, tile_size=1024, overlap=128)
+    covered = np.zeros((size[1], size[0]), dtype=bool)
+    for x1, y1, x2, y2 in tiles:
+        assert 0 <= x1 < x2 <= size[0] and 0 <= y1 < y2 <= size[1]
+        assert x2 - x1 <= 1024 and y2 - y1 <= 1024
+        covered[y1:y2, x1:x2] = True
+    assert covered.all()
+    xs = sorted({(x1, x2) for x1, _, x2, _ in tiles})
+    assert all(prev[1] - nxt[0] >= 128 for prev, nxt in zip(xs, xs[1:]))
+
+
+def test_bad_overlap_is_rejected():
+    try:
+        tile_boxes((3000, 3000), tile_size=512, overlap=512)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("overlap >= tile size accepted")
+
+
+def test_offset_clamps_to_the_tile():
+    tile = (100, 200, 300, 400)
+    dets = [{"bbox_2d": [10, 10, 50, 30]}, {"bbox_2d": [150, 150, 260, 180]}, {"bbox_2d": [250, 0, 300, 10]},
+            {"label": "no box"}]
+    moved = _offset_detections(dets, tile)
+    assert moved == [{"bbox_2d": [110, 210, 150, 230]}, {"bbox_2d": [250, 350, 300, 380]}, {"label": "no box"}]
+
+
+def test_seam_duplicates_are_folded_into_one_box():
+    # The same line seen by two tiles: clipped in one, whole in the other
+    dets = [{"bbox_2d": [100, 50, 400, 70], "label": "Names"},
+            {"bbox_2d": [300, 50, 420, 70], "label": "Names"},
+            {"bbox_2d": [100, 200, 150, 220], "label": "date"},
+            {"label": "no box"}]
+    merged = merge_tile_detections(dets, min_overlap=0.5)
+    assert merged == [{"bbox_2d": [100, 50, 420, 70], "label": "Names"},
+                      {"bbox_2d": [100, 200, 150, 220], "label": "date"},
+                      {"label": "no box"}]
+
+
+def test_neighbours_that_barely_touch_are_kept_apart():
+    dets = [{"bbox_2d": [0, 0, 100, 20]}, {"bbox_2d": [95, 0, 200, 20]}]
+    merged = merge_tile_detections(dets, min_overlap=0.5)
+    assert sorted(det["bbox_2d"] for det in merged) == [det["bbox_2d"] for det in dets]
+
+
+def test_only_tiles_of_split_pages_are_counted():
+    from PIL import Image
+    from ai.detector_backend import StubBackend
+    from ai.metrics import VLM_TILES
+    from ai.pii_detection import inference_tiled, pdf_page_messages
+    pages = [Image.new("RGB", (2000, 900), "white"), Image.new("RGB", (500, 500), "white")]
+    before = VLM_TILES._default().value
+    results = inference_tiled(StubBackend(), [pdf_page_messages(page) for page in pages], cache=False,
+                              tile_size=1024, overlap=128)
+    assert len(results) == 2
+    assert VLM_TILES._default().value - before == len(tile_boxes((2000, 900), 1024, 128)) == 3
@@ -0,0 +1,77 @@
+import io
+import os
+import zipfile
+
+from batch.batch_processing import iter_zip_stream, ZIP_CHUNK_SIZE
+
+
+def test_streamed_archive_is_valid(tmp_path):
+    files = {
+        "report.pdf": os.urandom(ZIP_CHUNK_SIZE * 2 + 17),   # stored, spans chunks
+        "notes.txt": b"redacted\n" * 5000,                   # deflated
+        "empty.png": b"",
+    }
+    paths = []
+    for name, data in files.items():
+        path = tmp_path / name
+        path.write_bytes(data)
+        paths.append((str(path), name))
+
+    chunks = list(iter_zip_stream(iter(paths)))
+    assert len(chunks) > 1
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == list(files)
+        for name, data in files.items():
+            assert archive.read(name) == data
+        assert archive.getinfo("report.pdf").compress_type == zipfile.ZIP_STORED
+        assert archive.getinfo("notes.txt").compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_files_are_read_lazily(tmp_path):
+    # The first entry is streamed before the next file even exists
+    first = tmp_path / "a.txt"
+    first.write_bytes(b"first")
+    second = tmp_path / "b.txt"
+    seen = []
+
+    def produce():
+        yield str(first), "a.txt"
+        seen.append(len(chunks))
+        second.write_bytes(b"second")
+        yield str(second), "b.txt"
+
+    chunks = []
+    for chunk in iter_zip_stream(produce()):
+        chunks.append(chunk)
+    assert seen[0] > 0
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.read("b.txt") == b"second"
+
+
+def test_empty_archive():
+    with zipfile.ZipFile(io.BytesIO(b"".join(iter_zip_stream(iter([]))))) as archive:
+        assert archive.namelist() == []
+
+
+def test_redacted_files_reports_unsupported_and_failed_files(tmp_path, monkeypatch, caplog):
+    from backend.redacted_files import back_end
+
+    def process(path, backend=None, out_dir=None):
+        name = os.path.basename(path)
+        if name == "broken.pdf":
+            raise RuntimeError("cannot open")
+        out_path = os.path.join(out_dir, f"redacted_{name}")
+        if name != "notes.docx":   # unsupported: no output is written
+            open(out_path, "w").close()
+        return out_path
+
+    monkeypatch.setattr(back_end, "process_and_redact_file", process)
+    paths = [str(tmp_path / name) for name in ("a.pdf", "notes.docx", "broken.pdf")]
+    with caplog.at_level("WARNING", logger=back_end.logger.name):
+        entries = list(back_end._redacted_files(paths, str(tmp_path)))
+    assert [arcname for _, arcname in entries] == ["redacted_a.pdf", "REDACTION_ERRORS.txt"]
+    with open(entries[-1][0]) as f:
+        assert f.read() == "notes.docx: Unsupported file type\nbroken.pdf: cannot open\n"
+    levels = {r.getMessage().split(":")[0]: r.levelname for r in caplog.records}
+    assert levels == {"Unsupported file type": "WARNING", "Redaction error for " + paths[2]: "ERROR"}